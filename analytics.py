@@ -0,0 +1,266 @@
+"""Agregados de desempenho por disciplina, tema e assunto (SQLite local).
+
+As contagens por status ficam materializadas na tabela `rollup` e são
+atualizadas por diferença: cada questão guarda seu último status em
+`questions`, e uma mudança só decrementa o status antigo e incrementa o
+novo. A tabela `daily` acumula revisões por dia para a tendência.
+
+Duas fontes alimentam o banco: record_answer (gravação feita no app) e
+sync_tab (aba lida do Sheets pelo aquecedor, que traz também o que foi
+respondido fora do app). Consultar o painel não toca no Google.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+DEFAULT_PATH = os.environ.get(
+    "STUDY_ANALYTICS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".study_cache", "analytics.sqlite3"),
+)
+
+STATUSES = ("Acertei", "Posso melhorar", "Errei", "Novo")
+LEVELS = {"Disciplina": ("disciplina",), "Tema": ("disciplina", "tema"), "Assunto": ("disciplina", "tema", "assunto")}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    disciplina TEXT NOT NULL, tema TEXT NOT NULL, row_idx INTEGER NOT NULL,
+    assunto TEXT NOT NULL, resultado TEXT NOT NULL, data TEXT NOT NULL,
+    PRIMARY KEY (disciplina, tema, row_idx)
+);
+CREATE TABLE IF NOT EXISTS rollup (
+    disciplina TEXT NOT NULL, tema TEXT NOT NULL, assunto TEXT NOT NULL, resultado TEXT NOT NULL,
+    n INTEGER NOT NULL, last_review TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (disciplina, tema, assunto, resultado)
+);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL, disciplina TEXT NOT NULL, resultado TEXT NOT NULL, n INTEGER NOT NULL,
+    PRIMARY KEY (day, disciplina, resultado)
+);
+CREATE TABLE IF NOT EXISTS synced (
+    disciplina TEXT NOT NULL, tema TEXT NOT NULL, version TEXT, synced_at TEXT NOT NULL,
+    PRIMARY KEY (disciplina, tema)
+);
+"""
+
+
+def normalize_status(value):
+    value = "" if value is None else str(value).strip()
+    return value or "Novo"
+
+
+def normalize_date(value):
+    """Data no formato ISO (YYYY-MM-DD HH:MM:SS) ou '' se não der para ler."""
+    text = "" if value is None else str(value).strip()
+    if not text:
+        return ""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return ""
+
+
+class AnalyticsStore:
+    """Banco de agregados; seguro para a thread do script e a do aquecedor."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    # --- atualização incremental ---
+    def _bump(self, disciplina, tema, assunto, resultado, delta, data=""):
+        self._conn.execute(
+            """INSERT INTO rollup (disciplina, tema, assunto, resultado, n, last_review)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (disciplina, tema, assunto, resultado) DO UPDATE SET
+                   n = n + excluded.n,
+                   last_review = MAX(last_review, excluded.last_review)""",
+            (disciplina, tema, assunto, resultado, delta, data),
+        )
+
+    def _apply(self, disciplina, tema, row_idx, assunto, resultado, data):
+        """Aplica o status atual de uma questão; devolve True se algo mudou."""
+        old = self._conn.execute(
+            "SELECT assunto, resultado, data FROM questions WHERE disciplina=? AND tema=? AND row_idx=?",
+            (disciplina, tema, row_idx),
+        ).fetchone()
+        if assunto is None:
+            assunto = old[0] if old else ""
+        if old == (assunto, resultado, data):
+            return False
+
+        if old is not None:
+            self._bump(disciplina, tema, old[0], old[1], -1)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+            (disciplina, tema, row_idx, assunto, resultado, data),
+        )
+        self._bump(disciplina, tema, assunto, resultado, 1, data)
+
+        if data and resultado != "Novo" and (old is None or old[2] != data):
+            self._conn.execute(
+                """INSERT INTO daily (day, disciplina, resultado, n) VALUES (?, ?, ?, 1)
+                   ON CONFLICT (day, disciplina, resultado) DO UPDATE SET n = n + 1""",
+                (data[:10], disciplina, resultado),
+            )
+        return True
+
+    def record_answer(self, disciplina, tema, row_idx, resultado, data, assunto=None):
+        """Registra uma gravação feita pelo app (sem reler a planilha)."""
+        with self._lock, self._conn:
+            self._apply(disciplina, tema, int(row_idx), assunto,
+                        normalize_status(resultado), normalize_date(data))
+
+    def sync_tab(self, disciplina, tema, df, version=None):
+        """Confere a aba inteira com o banco; só aplica as linhas que mudaram.
+
+        Se `version` for a mesma da última sincronização, nada é lido.
+        Devolve o número de questões alteradas.
+        """
+        with self._lock:
+            if version is not None:
+                row = self._conn.execute(
+                    "SELECT version FROM synced WHERE disciplina=? AND tema=?", (disciplina, tema)
+                ).fetchone()
+                if row is not None and row[0] == str(version):
+                    return 0
+
+            with self._conn:
+                return self._sync_rows(disciplina, tema, df, version)
+
+    def _sync_rows(self, disciplina, tema, df, version):
+        """Corpo do sync_tab; quem chama segura o lock e abre a transação."""
+        assuntos = df['Assunto'].tolist() if 'Assunto' in df.columns else [""] * len(df)
+        resultados = df['Resultado'].tolist() if 'Resultado' in df.columns else [""] * len(df)
+        datas = df['Data'].tolist() if 'Data' in df.columns else [""] * len(df)
+
+        changed = 0
+        for row_idx, (assunto, resultado, data) in enumerate(zip(assuntos, resultados, datas)):
+            changed += self._apply(disciplina, tema, row_idx, str(assunto or ""),
+                                   normalize_status(resultado), normalize_date(data))
+        # Linhas que sumiram da aba saem dos agregados
+        for assunto, resultado in self._conn.execute(
+            "SELECT assunto, resultado FROM questions WHERE disciplina=? AND tema=? AND row_idx>=?",
+            (disciplina, tema, len(df)),
+        ).fetchall():
+            self._bump(disciplina, tema, assunto, resultado, -1)
+            changed += 1
+        self._conn.execute(
+            "DELETE FROM questions WHERE disciplina=? AND tema=? AND row_idx>=?",
+            (disciplina, tema, len(df)),
+        )
+        self._conn.execute("DELETE FROM rollup WHERE n <= 0")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO synced VALUES (?, ?, ?, ?)",
+            (disciplina, tema, None if version is None else str(version),
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        return changed
+
+    def rebuild(self, tabs):
+        """Recria os agregados a partir das abas, mantendo o histórico diário.
+
+        tabs é um iterável de (disciplina, tema, df, versão). A tabela `daily`
+        guarda revisões antigas que as abas não trazem mais (só a última data
+        de cada questão), então é preservada como estava. Devolve o número de
+        questões aplicadas.
+
+        Tudo roda numa transação só, com o lock seguro do começo ao fim:
+        gravações e leituras concorrentes nunca veem as tabelas pela metade.
+        """
+        tabs = list(tabs)
+        with self._lock, self._conn:
+            daily = self._conn.execute("SELECT day, disciplina, resultado, n FROM daily").fetchall()
+            for table in ("questions", "rollup", "synced"):
+                self._conn.execute(f"DELETE FROM {table}")
+            changed = sum(self._sync_rows(disciplina, tema, df, version) for disciplina, tema, df, version in tabs)
+            self._conn.execute("DELETE FROM daily")
+            self._conn.executemany("INSERT INTO daily VALUES (?, ?, ?, ?)", daily)
+        return changed
+
+    # --- consultas ---
+    def weakest(self, level="Tema", disciplina=None, now=None):
+        """Agregados por nível, do mais fraco para o mais forte.
+
+        Índice de fraqueza = (Errei + 0,5 × Posso melhorar) / respondidas.
+        """
+        group = LEVELS[level]
+        where, params = "", []
+        if disciplina:
+            where, params = "WHERE disciplina = ?", [disciplina]
+        cols = ", ".join(group)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT {cols},
+                       SUM(n),
+                       SUM(CASE WHEN resultado='Acertei' THEN n ELSE 0 END),
+                       SUM(CASE WHEN resultado='Posso melhorar' THEN n ELSE 0 END),
+                       SUM(CASE WHEN resultado='Errei' THEN n ELSE 0 END),
+                       SUM(CASE WHEN resultado='Novo' THEN n ELSE 0 END),
+                       MAX(last_review)
+                    FROM rollup {where} GROUP BY {cols}""",
+                params,
+            ).fetchall()
+
+        now = now or datetime.now()
+        result = []
+        for row in rows:
+            keys = row[:len(group)]
+            total, acertei, posso, errei, novo, last_review = row[len(group):]
+            answered = acertei + posso + errei
+            entry = dict(zip(group, keys))
+            age = None
+            if last_review:
+                age = (now - datetime.strptime(last_review, "%Y-%m-%d %H:%M:%S")).days
+            entry.update({
+                "total": total,
+                "respondidas": answered,
+                "acertei": acertei,
+                "posso_melhorar": posso,
+                "errei": errei,
+                "novas": novo,
+                "taxa_erro": round(errei / answered, 3) if answered else None,
+                "fraqueza": round((errei + 0.5 * posso) / answered, 3) if answered else None,
+                "dias_sem_revisar": age,
+            })
+            result.append(entry)
+        result.sort(key=lambda e: (e["fraqueza"] is None, -(e["fraqueza"] or 0), -(e["dias_sem_revisar"] or 0)))
+        return result
+
+    def trend(self, days=30, disciplina=None, today=None):
+        """Revisões por dia (últimos `days` dias) com a taxa de erro do dia."""
+        today = today or datetime.now()
+        since = (today - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        where, params = "WHERE day >= ?", [since]
+        if disciplina:
+            where += " AND disciplina = ?"
+            params.append(disciplina)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT day,
+                       SUM(n),
+                       SUM(CASE WHEN resultado='Errei' THEN n ELSE 0 END),
+                       SUM(CASE WHEN resultado='Posso melhorar' THEN n ELSE 0 END)
+                    FROM daily {where} GROUP BY day ORDER BY day""",
+                params,
+            ).fetchall()
+        return [
+            {"dia": day, "revisões": total, "errei": errei, "posso_melhorar": posso,
+             "taxa_erro": round(errei / total, 3) if total else None}
+            for day, total, errei, posso in rows
+        ]
+
+    def sync_status(self):
+        """Última sincronização de cada aba."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT disciplina, tema, version, synced_at FROM synced ORDER BY disciplina, tema"
+            ).fetchall()
+        return [dict(zip(("disciplina", "tema", "versão", "sincronizado_em"), r)) for r in rows]
@@ -1,40 +1,93 @@
 import streamlit as st
 import pandas as pd
 import os
+import re
 import json
 from datetime import datetime, timedelta
-from thefuzz import fuzz
-import matplotlib.pyplot as plt
 import streamlit.components.v1 as components
-from openai import OpenAI
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+
+# openai, thefuzz, gspread e oauth2client são importados só quando usados
+# (ver get_openai_client, _build_gspread_client e render_essay_mode):
+# o primeiro carregamento de um processo novo não paga por eles.
 
 import time
 import html
+import threading
+import queue
 from functools import wraps
+from collections import deque
 
-# --- COLAR LOGO APÓS OS IMPORTS E ANTES DO RESTO DO CÓDIGO ---
-
-def evaluate_answer_ai(question, user_answer, reference_answer):
-    """Envia a resposta para a IA avaliar como banca do CACD."""
-    try:
-        # Tenta pegar a chave do ambiente ou dos segredos
-        api_key = os.environ.get("openai_api_key")
-        if not api_key and "openai_api_key" in st.secrets:
-            api_key = st.secrets["openai_api_key"]
-
-        if not api_key:
-            return 0, "Erro: Chave da API OpenAI não configurada."
+from batch_grading import (
+    GRADING_BATCH_SIZE, build_batch_prompt, chunked, parse_batch_response, suggest_result,
+)
+from analytics import LEVELS, AnalyticsStore
+from circuit_breaker import breaker_states, get_breaker
+from dedup import THRESHOLD as DEDUP_THRESHOLD, find_clusters, records_from_frame
+from local_grader import fallback_grade, record_tier, tier_stats, timed_local_grade
+from memory_budget import (
+    CACHE_BUDGET_MB, MB, SESSION_BUDGET_MB, LRUBudget, frame_bytes, object_bytes, rss_bytes,
+)
+from paged_loader import PagedWorksheet, TabStream
+from perf_trace import (
+    MAX_RERUNS, TracedProxy, begin_rerun, end_rerun, rerun_in_progress, reruns_to_jsonl,
+    trace_cache, trace_call, traced_io,
+)
+import snapshots
+from sheet_registry import get_registry
 
-        client = OpenAI(api_key=api_key)
+# --- COLAR LOGO APÓS OS IMPORTS E ANTES DO RESTO DO CÓDIGO ---
 
-        prompt = f"""
+# Prazo de cada chamada à IA; sem novas tentativas do SDK, o pior caso de
+# uma correção fica limitado a AI_TIMEOUT_SECONDS (depois vem a nota local)
+AI_TIMEOUT_SECONDS = float(os.environ.get("STUDY_AI_TIMEOUT", 20))
+AI_BATCH_TIMEOUT_SECONDS = float(os.environ.get("STUDY_AI_BATCH_TIMEOUT", 60))
+AI_BREAKER_FAILURES = 3        # Falhas seguidas até pausar as chamadas
+AI_BREAKER_COOLDOWN = 60       # Segundos de pausa antes de testar de novo
+
+@st.cache_resource
+def get_openai_client(api_key, base_url=None):
+    """Cliente OpenAI criado sob demanda e reaproveitado entre reruns."""
+    from openai import OpenAI
+    if base_url:
+        return OpenAI(api_key=api_key, base_url=base_url, timeout=AI_TIMEOUT_SECONDS, max_retries=0)
+    return OpenAI(api_key=api_key, timeout=AI_TIMEOUT_SECONDS, max_retries=0)
+
+def ai_breaker(name):
+    return get_breaker(name, failure_threshold=AI_BREAKER_FAILURES, cooldown_seconds=AI_BREAKER_COOLDOWN)
+
+def use_fake_ai():
+    """STUDY_AI_BACKEND=fake troca a OpenAI pelo servidor local (fake_backend.py)."""
+    return os.environ.get("STUDY_AI_BACKEND") == "fake"
+
+@st.cache_resource
+def get_fake_model_server():
+    from fake_backend import FakeModelServer
+    return FakeModelServer.from_env().start()
+
+def grading_api_config():
+    """Chave e base_url do modelo de correção (base_url None = OpenAI padrão)."""
+    if use_fake_ai():
+        return "fake", get_fake_model_server().base_url
+    # Tenta pegar a chave do ambiente ou dos segredos
+    api_key = os.environ.get("openai_api_key")
+    if not api_key and "openai_api_key" in st.secrets:
+        api_key = st.secrets["openai_api_key"]
+    return api_key, None
+
+ANSWER_SLOT = "\x00RESPOSTA\x00"
+
+def grading_prompt_template(question, reference_answer):
+    """Prompt de correção com pergunta e gabarito já preenchidos.
+
+    A resposta do aluno entra depois, no lugar de ANSWER_SLOT; assim o modelo
+    pode ser montado antes (pré-busca das próximas questões).
+    """
+    return f"""
         Atue como um medidor de desempenho nas perguntas a seguir.
 
         PERGUNTA: {question}
         GABARITO: {reference_answer}
-        RESPOSTA: {user_answer}
+        RESPOSTA: {ANSWER_SLOT}
 
         Tarefa:
         1. Compare a resposta com o gabarito.
@@ -47,44 +100,112 @@ def evaluate_answer_ai(question, user_answer, reference_answer):
         FEEDBACK: [texto]
         """
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=300
-        )
-
-        # --- CORREÇÃO AQUI: Garante que content nunca seja None ---
-        # O 'or ""' transforma None em string vazia, resolvendo o erro do Pyright
-        content = response.choices[0].message.content or ""
-
-        # --- LÓGICA DE EXTRAÇÃO BLINDADA ---
-        import re
-
-        score = 0 
-        feedback = "Sem feedback."
-
-        # Tenta achar "NOTA: 85" ou "NOTA:85" usando Regex
-        match_nota = re.search(r"NOTA:\s*(\d+)", content, re.IGNORECASE)
-        if match_nota:
-            score = int(match_nota.group(1))
-
-        # Tenta achar o feedback com verificações seguras
-        if "FEEDBACK:" in content:
-            parts = content.split("FEEDBACK:")
-            if len(parts) > 1:
-                feedback = parts[1].strip().split("\n")[0]
-        elif "RESULTADO:" in content: 
-            parts = content.split("RESULTADO:")
-            if len(parts) > 1:
-                feedback = parts[1].strip().split("\n")[0]
-
-        score = max(0, min(100, score))
-
-        return score, feedback
+@trace_call("evaluate_answer_ai", kind="openai")
+def evaluate_answer_ai(question, user_answer, reference_answer, prompt_template=None):
+    """Envia a resposta para a IA avaliar como banca do CACD.
+
+    Levanta exceção em erro, prazo estourado ou saída sem NOTA: quem chama
+    (grade_answer) decide a alternativa, em vez de uma nota 0 que parece real.
+    """
+    api_key, base_url = grading_api_config()
+    if not api_key:
+        raise RuntimeError("Chave da API OpenAI não configurada.")
+
+    client = get_openai_client(api_key, base_url)
+
+    if prompt_template is None:
+        prompt_template = grading_prompt_template(question, reference_answer)
+    prompt = prompt_template.replace(ANSWER_SLOT, str(user_answer))
+
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3,
+        max_tokens=300,
+        timeout=AI_TIMEOUT_SECONDS
+    )
 
+    # --- CORREÇÃO AQUI: Garante que content nunca seja None ---
+    # O 'or ""' transforma None em string vazia, resolvendo o erro do Pyright
+    content = response.choices[0].message.content or ""
+
+    # --- LÓGICA DE EXTRAÇÃO BLINDADA ---
+    feedback = "Sem feedback."
+
+    # Tenta achar "NOTA: 85" ou "NOTA:85" usando Regex
+    match_nota = re.search(r"NOTA:\s*(\d+)", content, re.IGNORECASE)
+    if not match_nota:
+        raise ValueError("Resposta da IA sem NOTA.")
+    score = int(match_nota.group(1))
+
+    # Tenta achar o feedback com verificações seguras
+    if "FEEDBACK:" in content:
+        parts = content.split("FEEDBACK:")
+        if len(parts) > 1:
+            feedback = parts[1].strip().split("\n")[0]
+    elif "RESULTADO:" in content: 
+        parts = content.split("RESULTADO:")
+        if len(parts) > 1:
+            feedback = parts[1].strip().split("\n")[0]
+
+    score = max(0, min(100, score))
+
+    return score, feedback
+
+def fallback_result(user_answer, reference_answer, reason):
+    """Nota local provisória quando a IA não está disponível (camada "reserva")."""
+    t0 = time.perf_counter()
+    nota, feedback = fallback_grade(user_answer, reference_answer)
+    record_tier("reserva", (time.perf_counter() - t0) * 1000)
+    return nota, f"{feedback} Motivo: {reason}."
+
+def grade_answer(question, user_answer, reference_answer, prompt_template=None):
+    """Correção em camadas: casos claros localmente, os ambíguos pela IA.
+
+    Devolve (nota, feedback, camada); ver local_grader.py.
+    """
+    decision = timed_local_grade(user_answer, reference_answer)
+    if decision is not None:
+        tier, nota, feedback = decision
+        return nota, feedback, tier
+
+    breaker = ai_breaker("correção")
+    if not breaker.allow():
+        reason = f"IA pausada após falhas seguidas, nova tentativa em {breaker.retry_in():.0f}s"
+        return (*fallback_result(user_answer, reference_answer, reason), "reserva")
+
+    t0 = time.perf_counter()
+    try:
+        nota, feedback = evaluate_answer_ai(question, user_answer, reference_answer, prompt_template=prompt_template)
     except Exception as e:
-        return 0, f"Erro ao conectar com a IA: {str(e)}"
+        breaker.record_failure()
+        reason = f"a IA não respondeu ({type(e).__name__})"
+        return (*fallback_result(user_answer, reference_answer, reason), "reserva")
+    breaker.record_success()
+    record_tier("ia", (time.perf_counter() - t0) * 1000)
+    return nota, feedback, "ia"
+
+@trace_call("evaluate_answers_batch", kind="openai")
+def evaluate_answers_batch(items):
+    """Corrige vários itens ({id, question, reference, answer}) num só pedido.
+
+    Devolve {id: (nota, feedback)}; itens sem resultado válido ficam de fora.
+    """
+    api_key, base_url = grading_api_config()
+    if not api_key:
+        raise RuntimeError("Chave da API OpenAI não configurada.")
+
+    client = get_openai_client(api_key, base_url)
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": build_batch_prompt(items)}],
+        temperature=0.3,
+        max_tokens=100 + 120 * len(items),
+        response_format={"type": "json_object"},
+        timeout=AI_BATCH_TIMEOUT_SECONDS,
+    )
+    content = response.choices[0].message.content or ""
+    return parse_batch_response(content, [item["id"] for item in items])
 
 # --- SILENCIADOR DE ERROS DE COTA ---
 def retry_on_quota(func):
@@ -129,38 +250,79 @@ def get_credentials():
 
     return None
 
-try:
-    key_dict = get_credentials()
-    if key_dict:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-        gc = gspread.authorize(creds)
-    else:
-        # Se não achou em lugar nenhum, mostra erro amigável
+def use_fake_backend():
+    """STUDY_BACKEND=fake troca o Google Sheets pelo backend local (fake_backend.py)."""
+    return os.environ.get("STUDY_BACKEND") == "fake"
+
+def use_sync_worker():
+    """STUDY_SYNC_MODE=worker: o app só lê o espelho local; o I/O fica com sync_worker.py."""
+    return os.environ.get("STUDY_SYNC_MODE") == "worker"
+
+def check_credentials_configured():
+    """Mostra o aviso amigável e interrompe se não houver credenciais (sem rede)."""
+    if use_fake_backend() or use_sync_worker():
+        return
+    try:
+        if get_credentials():
+            return
         st.error("⚠️ Configuração de Segurança não encontrada.")
         st.info("No Replit: Adicione 'gcp_service_account' em Secrets (Cadeado).")
         st.info("No Streamlit Cloud: Adicione em Settings > Secrets.")
-        st.stop()
-except Exception as e:
-    st.error(f"Erro fatal na autenticação: {e}")
+    except Exception as e:
+        st.error(f"Erro fatal na autenticação: {e}")
     st.stop()
 
+@st.cache_resource
+def start_sync_worker():
+    """No modo worker, sobe o sync_worker.py junto com o app (uma vez por processo).
+
+    STUDY_SYNC_AUTOSTART=0 deixa o worker por conta de quem faz o deploy.
+    """
+    if os.environ.get("STUDY_SYNC_AUTOSTART", "1") == "0":
+        return None
+    from sync_worker import start_worker_process
+    return start_worker_process()
+
+@st.cache_resource
+def _build_gspread_client():
+    """Autentica uma única vez por processo, na primeira chamada ao Sheets."""
+    if use_sync_worker():
+        from sync_worker import STARTUP_WAIT_SECONDS, MirrorBackend, SyncStore
+        store = SyncStore()
+        for url in SHEETS_MAPPING.values():
+            store.register(url, "content")
+        store.register(TRILHA_SHEET_URL, "trilha")
+        if start_sync_worker() is not None:
+            store.wait_synced(STARTUP_WAIT_SECONDS)  # Só espera de fato no primeiro uso do espelho
+        return TracedProxy(MirrorBackend(store).client())
+
+    if use_fake_backend():
+        import fake_backend
+        backend = fake_backend.backend_from_env(SHEETS_MAPPING.values(), TRILHA_SHEET_URL)
+        return TracedProxy(backend.client())
+
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    key_dict = get_credentials()
+    if not key_dict:
+        raise RuntimeError("Configuração de Segurança não encontrada.")
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
+    # O proxy registra latência de cada chamada para o painel de desempenho
+    return TracedProxy(gspread.authorize(creds))
+
 # Função auxiliar para garantir que o cliente esteja sempre disponível
 def get_gspread_client():
-    return gc
+    return _build_gspread_client()
+
+# Planilhas e política de cache de cada uma (sheet_registry.py)
+SHEET_REGISTRY = get_registry()
+
 # Mapeamento das Disciplinas
-SHEETS_MAPPING = {
-    "Direito": "https://docs.google.com/spreadsheets/d/1qb9d3qNAJBfcluxTHNsdRDdE1pZW7LS0EyzHlobRVDk/edit?usp=drive_link",
-    "Geografia": "https://docs.google.com/spreadsheets/d/1U8js8DcnpMwANwIoBCSlPgH0BPEx2nQwRSBVssflCDs/edit?usp=drive_link",
-    "História Mundial": "https://docs.google.com/spreadsheets/d/1XNhhnjlCp7xB3eCkwHyiG8_hPrmT4AXk-r_8YSsAYWg/edit?usp=sharing",
-    "História do Brasil": "https://docs.google.com/spreadsheets/d/16LMjWZnez89To_0jNFWf_V9TcsKhUqTcxQP8VF1FL_8/edit?usp=sharing",
-    "Política Internacional": "https://docs.google.com/spreadsheets/d/1uiXehNXzYwJ0BM8pLThfhcH7f7Cr4d7BhSQ3KO4mQEU/edit?usp=drive_link",
-    "Economia": "https://docs.google.com/spreadsheets/d/1r3J0KnmoEs-pOD-oKuhogKGvMw7N26E1QeFENswEc3Y/edit?usp=drive_link",
-    "Francês": "https://docs.google.com/spreadsheets/d/1O8aEGmkoXtpN0wLc0Uypk6D741Udk1V3XXUw0Wa25is/edit?usp=drive_link",
-    "Inglês": "https://docs.google.com/spreadsheets/d/12VQFmP_42aKJIN2he4HzPobl79_icS0yqy5G4AZD_P4/edit?usp=drive_link"
-}
+SHEETS_MAPPING = SHEET_REGISTRY.content()
 
 # URL CORRETA DA TRILHA
-TRILHA_SHEET_URL = "https://docs.google.com/spreadsheets/d/1QUIvAgo_fLa7DtBrdRBcBqY4yRn6FbmH2tx1UoiAFd8/edit?usp=sharing"
+TRILHA_SHEET_URL = SHEET_REGISTRY.trilha.url
 
 def check_password():
     """Check if password is correct."""
@@ -194,6 +356,9 @@ def init_session_state():
     if "sidebar_open" not in st.session_state:
         st.session_state.sidebar_open = True
 
+    if "perf_history" not in st.session_state:
+        st.session_state.perf_history = deque(maxlen=MAX_RERUNS)
+
 
     defaults = {
         'question_index': 0,
@@ -220,7 +385,19 @@ def init_session_state():
         'last_audio_hash': None,
         'status_filter': [],
         'recency_filter': "Todas",
-        'jump_to_question': 1
+        'jump_to_question': 1,
+        'paged_loader': None,
+        'tab_stream': None,
+        'dataset_version': 0,
+        'topic_pages': {},
+        'question_cards': {},
+        'grading_queue': [],
+        'grading_seq': 0,
+        'grading_tier': None,
+        'pending_writes': [],
+        'write_seq': 0,
+        'last_write_ids': {},
+        'bulk_grid_seq': 0
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -322,34 +499,636 @@ def apply_custom_style():
         </style>
     """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=300)
+# --- SONDAGEM DE VERSÃO (REFETCH CONDICIONAL) ---
+# Passado o TTL, só os metadados do arquivo são consultados; a aba é baixada
+# de novo apenas se a versão mudou. Sem mudança, o cache é reaproveitado.
+# O TTL de cada planilha vem da sua CachePolicy e se adapta às mudanças vistas.
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+
+@st.cache_resource
+def get_process_state():
+    """Estado que precisa durar o processo inteiro.
+
+    O app.py é reexecutado a cada rerun, então variáveis de módulo voltariam
+    vazias (e o aquecedor ficaria com outra cópia); por isso ficam aqui.
+    """
+    return {
+        "lock": threading.Lock(),
+        "write_generations": {},      # planilha -> gravações feitas por este processo
+        "probed_sheets": set(),       # planilhas já sondadas (fora do modo snapshot)
+        "snapshot_refresh_scheduled": set(),
+        "full_frame_versions": {},    # (planilha, aba) -> versão da última carga completa
+    }
+
+def spreadsheet_id_from_url(sheet_url):
+    match = re.search(r"/spreadsheets/d/([a-zA-Z0-9-_]+)", sheet_url)
+    return match.group(1) if match else sheet_url
+
+def mark_sheet_written(spreadsheet_id):
+    """Registra uma gravação deste processo: a versão muda sem esperar o Drive."""
+    if not spreadsheet_id:
+        return
+    state = get_process_state()
+    with state["lock"]:
+        generations = state["write_generations"]
+        generations[spreadsheet_id] = generations.get(spreadsheet_id, 0) + 1
+        # Depois de gravar, o snapshot da partida a frio já não vale
+        for sheet_url in [*SHEETS_MAPPING.values(), TRILHA_SHEET_URL]:
+            if spreadsheet_id_from_url(sheet_url) == spreadsheet_id:
+                state["probed_sheets"].add(sheet_url)
+
+def write_generation(sheet_url):
+    """Quantas gravações este processo já fez na planilha."""
+    state = get_process_state()
+    with state["lock"]:
+        return state["write_generations"].get(spreadsheet_id_from_url(sheet_url), 0)
+
+def probe_sheet_version(sheet_url):
+    """Lê só version/modifiedTime do arquivo no Drive (uma chamada pequena)."""
+    client = get_gspread_client()
+    file_id = spreadsheet_id_from_url(sheet_url)
+    with traced_io("drive.files.get"):
+        response = client.http_client.request(
+            "get",
+            DRIVE_FILES_URL + file_id,
+            params={'fields': 'version,modifiedTime', 'supportsAllDrives': 'true'}
+        )
+    meta = response.json()
+    return meta.get('version') or meta.get('modifiedTime')
+
+def registry_version(sheet_url):
+    """Versão pelo registro: do cache se o TTL da planilha vale, senão sonda o Drive."""
+    try:
+        return SHEET_REGISTRY.version(
+            sheet_url, lambda: probe_sheet_version(sheet_url), write_generation(sheet_url)
+        )
+    finally:
+        get_process_state()["probed_sheets"].add(sheet_url)
+
+@trace_cache("get_sheet_version")
+def get_sheet_version(sheet_url):
+    """Versão da planilha no Drive (None se a sondagem falhar)."""
+    return registry_version(sheet_url)
+
+@trace_cache("get_trilha_version", worksheet="Trilha")
+def get_trilha_version():
+    """Versão da planilha da Trilha (política própria, mais curta que a do conteúdo)."""
+    return registry_version(TRILHA_SHEET_URL)
+
+def ensure_probed(sheet_url):
+    """Sonda a planilha agora se ela ainda vem do snapshot; chamada antes de gravar."""
+    if sheet_url not in get_process_state()["probed_sheets"]:
+        get_sheet_version(sheet_url)
+
+# --- SNAPSHOTS LOCAIS (PARTIDA A FRIO) ---
+# Planilhas ainda não sondadas neste processo são servidas do snapshot
+# (ver get_process_state)
+
+def snapshot_version(version):
+    """Parte da versão que identifica o snapshot (a do Drive).
+
+    Só vale sem gravações locais pendentes (geração 0) e com sondagem real;
+    no fallback por tempo ("t...") não há versão confiável para gravar.
+    """
+    drive_version, _, generation = str(version).rpartition(":")
+    if generation != "0" or not drive_version or drive_version.startswith("t"):
+        return None
+    return drive_version
+
+def serve_cold_snapshot(sheet_url):
+    """True se a planilha ainda não foi sondada e há snapshots para responder já.
+
+    Na primeira vez agenda a conferência com o Drive no aquecedor; depois
+    dela os carregamentos seguem pelo caminho normal (versão + cache).
+    """
+    state = get_process_state()
+    if sheet_url in state["probed_sheets"] or not snapshots.available():
+        return False
+    if write_generation(sheet_url) > 0:
+        return False  # O snapshot é anterior às gravações deste processo
+    if sheet_url not in state["snapshot_refresh_scheduled"]:
+        state["snapshot_refresh_scheduled"].add(sheet_url)
+        get_cache_prewarmer().schedule(sheet_url, refresh=True)
+    return True
+
+def loaded_sheet_version(sheet_url):
+    """Versão dos dados que um carregamento agora receberia.
+
+    Enquanto a planilha vem do snapshot devolve "snapshot", sem sondar o Drive
+    (a sondagem marcaria a planilha e pularia o snapshot na partida a frio).
+    """
+    if serve_cold_snapshot(sheet_url):
+        return "snapshot"
+    return current_sheet_version(sheet_url, get_sheet_version(sheet_url))
+
+def load_snapshot_frame(sheet_url, worksheet_title, version=None):
+    with traced_io("snapshot.load_frame", worksheet_title, kind="snapshot"):
+        found = snapshots.load_frame(spreadsheet_id_from_url(sheet_url), worksheet_title, version)
+    return None if found is None else found[1]
+
+def current_sheet_version(sheet_url, probed_version):
+    """Chave de versão usada nos caches de dados.
+
+    Junta a versão do Drive com as gravações feitas por este processo; se a
+    sondagem falhar, cai numa janela de tempo igual ao TTL inicial da política.
+    """
+    if probed_version is None:
+        ttl = SHEET_REGISTRY.entry(sheet_url).policy.ttl
+        probed_version = f"t{int(time.time() // ttl)}"
+    return f"{probed_version}:{write_generation(sheet_url)}"
+
+@trace_call("get_worksheet_titles")
 def get_worksheet_titles(sheet_url):
     """Get all worksheet titles from a spreadsheet."""
+    if serve_cold_snapshot(sheet_url):
+        found = snapshots.load_titles(spreadsheet_id_from_url(sheet_url))
+        if found is not None:
+            return found[1]
+    version = current_sheet_version(sheet_url, get_sheet_version(sheet_url))
     try:
-        client = get_gspread_client()
-        spreadsheet = client.open_by_url(sheet_url)
-        return [ws.title for ws in spreadsheet.worksheets()]
+        return _fetch_worksheet_titles(sheet_url, version)
     except Exception as e:
         st.error(f"Erro ao carregar abas: {str(e)}")
         return []
 
-@st.cache_data(ttl=300) # Guarda na memória por 5 minutos (conteúdo muda pouco)
+@trace_cache("fetch_worksheet_titles")
+@st.cache_data(ttl=6 * 3600, max_entries=64)
 @retry_on_quota
+def _fetch_worksheet_titles(sheet_url, version):
+    drive_version = snapshot_version(version)
+    if drive_version:
+        found = snapshots.load_titles(spreadsheet_id_from_url(sheet_url), drive_version)
+        if found is not None:
+            return found[1]
+    client = get_gspread_client()
+    spreadsheet = client.open_by_url(sheet_url)
+    titles = [ws.title for ws in spreadsheet.worksheets()]
+    if drive_version:
+        snapshots.save_titles(spreadsheet_id_from_url(sheet_url), drive_version, titles)
+    return titles
+
+# --- CARREGAMENTO COLUNAR ---
+# Só estas colunas são usadas no estudo; o resto da aba nem é baixado.
+CONTENT_COLUMNS = ['Assunto', 'Pergunta', 'Resposta', 'Resultado', 'Data', 'Minha_Resposta']
+
+def column_letter(col_idx):
+    """Converte índice 1-based de coluna em letra A1 (1 -> A, 27 -> AA)."""
+    letters = ""
+    while col_idx > 0:
+        col_idx, rem = divmod(col_idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def quote_sheet_title(worksheet_title):
+    """Nome da aba no formato aceito em ranges A1 ('Aba do João'!A1)."""
+    return "'" + str(worksheet_title).replace("'", "''") + "'"
+
+def read_header(spreadsheet, worksheet_title):
+    """Primeira linha da aba (nomes das colunas)."""
+    header_values = spreadsheet.values_get(f"{quote_sheet_title(worksheet_title)}!1:1").get('values') or [[]]
+    return [str(h) for h in header_values[0]]
+
+def read_column_ranges(spreadsheet, worksheet_title, specs, value_render_option="FORMATTED_VALUE"):
+    """Lê vários trechos de coluna num único values_batch_get (majorDimension=COLUMNS).
+
+    specs: [(nome, posição 0-based no cabeçalho, linha inicial, linha final ou None)].
+    Devolve {nome: [valores]}; a API omite vazios no fim de cada trecho.
+    """
+    sheet = quote_sheet_title(worksheet_title)
+    ranges = []
+    for _, position, start_row, end_row in specs:
+        letter = column_letter(position + 1)
+        ranges.append(f"{sheet}!{letter}{start_row}:{letter}{end_row or ''}")
+
+    response = spreadsheet.values_batch_get(
+        ranges,
+        params={'majorDimension': 'COLUMNS', 'valueRenderOption': value_render_option}
+    )
+    value_ranges = response.get('valueRanges', [])
+    columns = {}
+    for i, (name, _, _, _) in enumerate(specs):
+        values = (value_ranges[i].get('values') if i < len(value_ranges) else None) or [[]]
+        columns[name] = values[0]
+    return columns
+
+def pad_column(values, n_rows, fill=""):
+    return list(values) + [fill] * (n_rows - len(values))
+
+def load_columns(spreadsheet, worksheet_title, columns=None, value_render_option="FORMATTED_VALUE"):
+    """Baixa só as colunas pedidas, localizadas pela posição no cabeçalho.
+
+    Faz uma leitura do cabeçalho e um único values_batch_get por coluna
+    (majorDimension=COLUMNS), montando o DataFrame direto dos arrays, sem
+    passar por dicionários por linha nem pela conversão de tipos do
+    get_all_records. Com columns=None, traz todas as colunas do cabeçalho.
+    """
+    headers = read_header(spreadsheet, worksheet_title)
+
+    if columns is None:
+        wanted = list(enumerate(headers))
+    else:
+        wanted = [(headers.index(name), name) for name in columns if name in headers]
+    if not wanted:
+        return pd.DataFrame()
+
+    specs = [(str(i), position, 2, None) for i, (position, _) in enumerate(wanted)]
+    arrays = list(read_column_ranges(spreadsheet, worksheet_title, specs, value_render_option).values())
+
+    # A API corta vazios no fim de cada coluna: completa até a linha mais longa
+    n_rows = max(len(a) for a in arrays)
+    df = pd.DataFrame({i: pad_column(a, n_rows) for i, a in enumerate(arrays)})
+    df.columns = [name for _, name in wanted]
+    return df
+
+@trace_call("load_worksheet_data")
 def load_worksheet_data(sheet_url, worksheet_title):
-    """Carrega dados da disciplina com cache agressivo."""
+    """Carrega dados da disciplina; só baixa a aba de novo se a planilha mudou."""
+    if serve_cold_snapshot(sheet_url):
+        df = load_snapshot_frame(sheet_url, worksheet_title)
+        if df is not None:
+            return df
+    version = current_sheet_version(sheet_url, get_sheet_version(sheet_url))
     try:
-        client = get_gspread_client()
-        spreadsheet = client.open_by_url(sheet_url)
-        worksheet = spreadsheet.worksheet(worksheet_title)
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-        # Garante coluna de resposta pessoal
-        if 'Minha_Resposta' not in df.columns:
-            df['Minha_Resposta'] = ""
-        return df
+        df = _fetch_worksheet_data(sheet_url, worksheet_title, version)
     except Exception:
         return None
+    track_dataset(sheet_url, worksheet_title, version, df)
+    return df
+
+@trace_cache("fetch_worksheet_data", worksheet_arg=1)
+@st.cache_data(ttl=6 * 3600, max_entries=256) # Chaveado pela versão: expira por mudança, não por tempo
+@retry_on_quota
+def _fetch_worksheet_data(sheet_url, worksheet_title, version):
+    # Erros sobem: o st.cache_data não guarda falhas, que seriam servidas
+    # até a próxima mudança de versão. Quem chama decide como mostrá-las.
+    drive_version = snapshot_version(version)
+    if drive_version:
+        df = load_snapshot_frame(sheet_url, worksheet_title, drive_version)
+        if df is not None:
+            get_process_state()["full_frame_versions"][(sheet_url, worksheet_title)] = version
+            return df
+    client = get_gspread_client()
+    spreadsheet = client.open_by_url(sheet_url)
+    # Valores formatados: 'Data' chega como texto, no mesmo formato gravado pelo app
+    df = load_columns(spreadsheet, worksheet_title, CONTENT_COLUMNS)
+    # Garante coluna de resposta pessoal
+    if 'Minha_Resposta' not in df.columns:
+        df['Minha_Resposta'] = ""
+    get_process_state()["full_frame_versions"][(sheet_url, worksheet_title)] = version
+    if drive_version:
+        try:
+            snapshots.save_frame(spreadsheet_id_from_url(sheet_url), worksheet_title, drive_version, df)
+        except Exception:
+            pass  # Snapshot é só otimização
+    return df
+
+# --- CARREGAMENTO EM JANELAS (ABAS GRANDES NO MODO PERGUNTAS) ---
+# Colunas pequenas vêm inteiras (filtros e seletor de assunto); as de texto
+# longo chegam em janelas de linhas conforme a questão avança.
+INDEX_COLUMNS = ['Assunto', 'Resultado', 'Data']
+HEAVY_COLUMNS = ['Pergunta', 'Resposta', 'Minha_Resposta']
+PAGE_WINDOW_ROWS = 50
+PAGE_PREFETCH_AHEAD = 20
+
+@st.cache_resource(ttl=3600)
+def open_spreadsheet(sheet_url):
+    """Planilha aberta uma vez por processo para as leituras em janela."""
+    return get_gspread_client().open_by_url(sheet_url)
+
+@trace_cache("fetch_worksheet_head", worksheet_arg=1)
+@st.cache_data(ttl=6 * 3600, max_entries=256)
+@retry_on_quota
+def _fetch_worksheet_head(sheet_url, worksheet_title, version, window_rows):
+    """Cabeçalho, colunas de índice inteiras, a primeira janela das pesadas e o total de linhas.
+
+    Se a janela das pesadas veio cheia, o fim delas é conferido num pedido
+    à parte (a partir do fim das colunas lidas), para não perder linhas com
+    texto mas sem Assunto/Resultado/Data.
+    """
+    spreadsheet = open_spreadsheet(sheet_url)
+    headers = read_header(spreadsheet, worksheet_title)
+    specs = [(name, headers.index(name), 2, None) for name in INDEX_COLUMNS if name in headers]
+    heavy = [(name, headers.index(name)) for name in HEAVY_COLUMNS if name in headers]
+    specs += [(name, position, 2, window_rows + 1) for name, position in heavy]
+    columns = read_column_ranges(spreadsheet, worksheet_title, specs)
+    n_rows = max((len(v) for v in columns.values()), default=0)
+    if heavy and n_rows >= window_rows:
+        tail = read_column_ranges(
+            spreadsheet, worksheet_title,
+            [(name, position, n_rows + 2, None) for name, position in heavy]
+        )
+        n_rows += max((len(v) for v in tail.values()), default=0)
+    return headers, columns, n_rows
+
+@trace_cache("fetch_row_window", worksheet_arg=1)
+@st.cache_data(ttl=6 * 3600, max_entries=1024)
+@retry_on_quota
+def _fetch_row_window(sheet_url, worksheet_title, version, positions, start, stop):
+    """Colunas pesadas das linhas de dados [start, stop) (0-based, sem o cabeçalho)."""
+    spreadsheet = open_spreadsheet(sheet_url)
+    specs = [(name, position, start + 2, stop + 1) for name, position in positions]
+    return read_column_ranges(spreadsheet, worksheet_title, specs)
+
+@trace_call("load_worksheet_paged")
+def load_worksheet_paged(sheet_url, worksheet_title):
+    """Carrega a aba pronta para a primeira questão; devolve (df, pager).
+
+    Se a aba inteira já está no cache (ex.: pelo aquecedor) ela é usada
+    direto e pager é None. Caso contrário, as linhas fora da primeira janela
+    ficam com as colunas pesadas vazias e '_loaded' = False até o pager trazê-las.
+    """
+    if serve_cold_snapshot(sheet_url):
+        df = load_snapshot_frame(sheet_url, worksheet_title)
+        if df is not None:
+            return df, None
+    version = current_sheet_version(sheet_url, get_sheet_version(sheet_url))
+    drive_version = snapshot_version(version)
+    if (get_process_state()["full_frame_versions"].get((sheet_url, worksheet_title)) == version
+            or (drive_version and snapshots.has_frame(spreadsheet_id_from_url(sheet_url), worksheet_title, drive_version))):
+        return load_worksheet_data(sheet_url, worksheet_title), None
+
+    try:
+        head = _fetch_worksheet_head(sheet_url, worksheet_title, version, PAGE_WINDOW_ROWS)
+    except Exception:
+        return None, None
+    headers, columns, n_rows = head
+    first_window = min(PAGE_WINDOW_ROWS, n_rows)
+    df = pd.DataFrame({
+        name: pad_column(columns[name], n_rows) if name in INDEX_COLUMNS
+        else pad_column(pad_column(columns[name], first_window), n_rows, None)
+        for name in CONTENT_COLUMNS if name in columns
+    })
+    if 'Minha_Resposta' not in df.columns:
+        df['Minha_Resposta'] = ""
+
+    if n_rows <= PAGE_WINDOW_ROWS:
+        return df, None
+
+    df['_loaded'] = [i < first_window for i in range(n_rows)]
+    positions = tuple((name, headers.index(name)) for name in HEAVY_COLUMNS if name in headers)
+    pager = PagedWorksheet(
+        lambda start, stop: _fetch_row_window(sheet_url, worksheet_title, version, positions, start, stop),
+        total_rows=n_rows,
+        window_size=PAGE_WINDOW_ROWS,
+        columns=[name for name, _ in positions],
+        initial={name: columns.get(name, []) for name, _ in positions},
+    )
+    return df, pager
+
+def hydrate_rows(positions):
+    """Copia para filtered_df/original_df as linhas já baixadas pelo pager."""
+    pager = st.session_state.paged_loader
+    fdf = st.session_state.filtered_df
+    if pager is None or fdf is None or '_loaded' not in fdf.columns:
+        return
+    odf = st.session_state.original_df
+    mapping = st.session_state.row_mapping
+    for pos in positions:
+        if pos >= len(fdf) or pos >= len(mapping) or fdf.at[pos, '_loaded']:
+            continue
+        original_idx = mapping[pos]
+        values = pager.get(original_idx)
+        if values is None:
+            continue
+        for col, value in values.items():
+            fdf.at[pos, col] = value
+            if odf is not None:
+                odf.at[original_idx, col] = value
+        fdf.at[pos, '_loaded'] = True
+        if odf is not None:
+            odf.at[original_idx, '_loaded'] = True
+
+def ensure_question_rows(position):
+    """Garante a questão atual carregada e busca as próximas em segundo plano.
+
+    Devolve False (com st.error) se a janela da questão não pôde ser baixada.
+    """
+    pager = st.session_state.paged_loader
+    if pager is None:
+        return True
+    mapping = st.session_state.row_mapping
+    ahead = range(position, min(position + PAGE_PREFETCH_AHEAD, len(mapping)))
+    try:
+        if position < len(mapping):
+            pager.ensure(mapping[position])
+    except Exception as e:
+        st.error(f"Erro ao carregar a questão: {str(e)}")
+        return False
+    pager.prefetch([mapping[p] for p in ahead])
+    hydrate_rows(ahead)
+    return True
+
+def ensure_all_rows():
+    """Modo Dissertativo precisa de todas as linhas: baixa o que falta de uma vez.
+
+    Devolve False (com st.error) se alguma janela falhou; as que chegaram ficam.
+    """
+    stream = st.session_state.tab_stream
+    if stream is not None:
+        stream.wait()
+        absorb_streamed_tabs()
+    pager = st.session_state.paged_loader
+    if pager is None or st.session_state.filtered_df is None:
+        return True
+    try:
+        pager.ensure_all()
+    except Exception as e:
+        st.error(f"Erro ao carregar as questões: {str(e)}")
+        return False
+    finally:
+        hydrate_rows(range(len(st.session_state.filtered_df)))
+    return True
+
+# --- INVALIDAÇÃO DIRECIONADA E PRÉ-AQUECIMENTO DO CACHE ---
+PREWARM_PAUSE_SECONDS = 1.0    # Intervalo entre abas para não estourar a cota
+PREWARM_WRITE_DELAY = 5        # Agrupa gravações seguidas numa única recarga
+ANALYTICS_SYNC_SECONDS = 900   # Intervalo da sincronização periódica de cada planilha
+
+class CachePrewarmer:
+    """Recarrega abas e dados em segundo plano, uma planilha (ou aba) por vez."""
+
+    def __init__(self):
+        self._pending = {}  # (sheet_url, worksheet_title, refresh) -> horário previsto
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="cache-prewarmer", daemon=True)
+        self._thread.start()
+
+    def schedule(self, sheet_url, worksheet_title=None, delay=0, refresh=False):
+        """Agenda o aquecimento; pedidos repetidos para a mesma chave são agrupados."""
+        key = (sheet_url, worksheet_title, refresh)
+        due = time.time() + delay
+        with self._cond:
+            self._pending[key] = max(due, self._pending.get(key, 0))
+            self._cond.notify()
+
+    def schedule_all(self):
+        for sheet_url in SHEETS_MAPPING.values():
+            self.schedule(sheet_url)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._pending:
+                    key, due = min(self._pending.items(), key=lambda item: item[1])
+                    wait = due - time.time()
+                    if wait <= 0:
+                        del self._pending[key]
+                        return key
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
 
+    def _run(self):
+        while True:
+            sheet_url, worksheet_title, refresh = self._next_job()
+            try:
+                self._warm(sheet_url, worksheet_title, refresh)
+            except Exception:
+                pass  # Aquecimento é só otimização: falhas ficam para o carregamento normal
+
+    def _warm(self, sheet_url, worksheet_title, refresh):
+        if sheet_url == TRILHA_SHEET_URL:
+            if refresh:
+                SHEET_REGISTRY.expire(TRILHA_SHEET_URL)
+            get_trilha_version()
+            get_trilha_data()
+            get_study_logs()
+            return
+
+        if refresh:
+            # Força nova sondagem; os dados só são baixados se a versão mudou
+            SHEET_REGISTRY.expire(sheet_url)
+        # Sonda antes de carregar: tira a planilha do modo snapshot da partida
+        get_sheet_version(sheet_url)
+
+        titles = get_worksheet_titles(sheet_url)
+        targets = [worksheet_title] if worksheet_title else titles
+        for title in targets:
+            df = load_worksheet_data(sheet_url, title)
+            if df is not None:
+                sync_analytics(sheet_url, title, df)
+            time.sleep(PREWARM_PAUSE_SECONDS)
+
+        if worksheet_title is None and ANALYTICS_SYNC_SECONDS:
+            # Passada periódica: traz o que foi respondido fora do app
+            self.schedule(sheet_url, delay=ANALYTICS_SYNC_SECONDS, refresh=True)
+
+@st.cache_resource
+def get_cache_prewarmer():
+    """Um único aquecedor por processo, iniciado já com todas as disciplinas."""
+    prewarmer = CachePrewarmer()
+    prewarmer.schedule_all()
+    return prewarmer
+
+# --- ORÇAMENTO DE MEMÓRIA ---
+# Só entra no LRU o que pode voltar sem perda: abas do cache de dados
+# (recarregadas do snapshot ou do Google) e temas já visitados na sessão.
+@st.cache_resource
+def get_dataset_budget():
+    """Abas do cache de dados do processo, em ordem de uso (memory_budget.py).
+
+    Passado o orçamento, a aba usada há mais tempo sai do st.cache_data.
+    """
+    return LRUBudget(CACHE_BUDGET_MB * MB, on_evict=lambda key, _: _fetch_worksheet_data.clear(*key))
+
+def track_dataset(sheet_url, worksheet_title, version, df):
+    budget = get_dataset_budget()
+    key = (sheet_url, worksheet_title, version)
+    if key not in budget:
+        # Versões anteriores da mesma aba não serão mais pedidas: saem já
+        budget.discard([k for k in budget.keys() if k[:2] == key[:2]])
+    budget.touch(key, size=lambda: frame_bytes(df))
+
+def cancel_theme_stream(key, entry):
+    """Tema descartado: as abas do "Todos" que ainda viriam não são mais necessárias."""
+    stream = (entry or {}).get("tab_stream")
+    if stream is not None:
+        stream.cancel()
+
+def session_theme_budget():
+    """Temas visitados nesta sessão, guardados para voltar a eles sem recarregar."""
+    if "theme_lru" not in st.session_state:
+        st.session_state.theme_lru = LRUBudget(SESSION_BUDGET_MB * MB, on_evict=cancel_theme_stream)
+    return st.session_state.theme_lru
+
+def stash_current_theme():
+    """Guarda o tema aberto no LRU da sessão antes de trocar de seleção."""
+    df = st.session_state.original_df
+    if df is None or not st.session_state.selected_tema:
+        return
+    key = (st.session_state.selected_disciplina, st.session_state.selected_tema)
+    entry = {
+        "original_df": df,
+        "worksheets_map": st.session_state.worksheets_map,
+        "paged_loader": st.session_state.paged_loader,
+        "tab_stream": st.session_state.tab_stream,
+        "version": st.session_state.get("original_version"),
+    }
+    session_theme_budget().touch(key, entry, size=lambda: frame_bytes(df))
+
+def restore_theme(sheet_url):
+    """Volta a um tema guardado, se a versão da planilha (Drive + gravações) não mudou."""
+    key = (st.session_state.selected_disciplina, st.session_state.selected_tema)
+    entry = session_theme_budget().pop(key)
+    if entry is None:
+        return False
+    if entry["version"] != loaded_sheet_version(sheet_url):
+        cancel_theme_stream(key, entry)
+        return False
+    st.session_state.original_df = entry["original_df"]
+    st.session_state.worksheets_map = entry["worksheets_map"]
+    st.session_state.paged_loader = entry["paged_loader"]
+    st.session_state.tab_stream = entry.get("tab_stream")
+    st.session_state.original_version = entry["version"]
+    st.session_state.worksheet = None
+    return True
+
+SESSION_HEAVY_KEYS = ('original_df', 'filtered_df', 'question_cards', 'topic_pages', 'grading_queue', 'dedup_result')
+
+def memory_report():
+    """Medidor de memória: processo, cache de abas e esta sessão."""
+    rss = rss_bytes()
+    session_bytes = sum(object_bytes(st.session_state.get(key)) for key in SESSION_HEAVY_KEYS)
+    return {
+        "rss_mb": None if rss is None else round(rss / MB, 1),
+        "cache": get_dataset_budget().report(),
+        "temas": session_theme_budget().report(),
+        "sessão_mb": round(session_bytes / MB, 2),
+    }
+
+# --- AGREGADOS DE DESEMPENHO ---
+@st.cache_resource
+def get_analytics_store():
+    """Banco local de agregados (analytics.py), um por processo."""
+    return AnalyticsStore()
+
+def disciplina_for_url(sheet_url):
+    return next((name for name, url in SHEETS_MAPPING.items() if url == sheet_url), sheet_url)
+
+def sync_analytics(sheet_url, worksheet_title, df):
+    """Confere a aba com os agregados; não faz nada se a versão já foi vista."""
+    try:
+        version = get_process_state()["full_frame_versions"].get((sheet_url, worksheet_title))
+        get_analytics_store().sync_tab(disciplina_for_url(sheet_url), worksheet_title, df, version)
+    except Exception:
+        pass  # Agregados são auxiliares: nunca atrapalham o carregamento
+
+def invalidate_sheet_cache(sheet_url, worksheet_title=None, delay=0):
+    """Invalida só a planilha (ou aba) indicada e a recarrega em segundo plano.
+
+    Chamada só depois de gravações; trocar de disciplina ou tema não gasta
+    cota, a sondagem de versão já percebe mudanças feitas fora do app.
+
+    A limpeza (nova sondagem de versão) acontece no aquecedor, logo antes da
+    recarga, então as demais disciplinas e usuários continuam servidos pelo cache.
+    """
+    get_cache_prewarmer().schedule(sheet_url, worksheet_title, delay=delay, refresh=True)
+
+@trace_call("get_worksheet_for_update")
 def get_worksheet_for_update(sheet_url, worksheet_title):
     """Get worksheet object for updating (not cached)."""
     try:
@@ -388,28 +1167,33 @@ def get_column_index(worksheet, column_name):
     except:
         return None
 
+def load_source_tab(sheet_url, title):
+    """Aba pronta para o "Todos", com aba e linha de origem; None se não serve."""
+    required_cols = ['Assunto', 'Pergunta', 'Resposta', 'Resultado', 'Data']
+    df = load_worksheet_data(sheet_url, title)
+    if df is None or df.empty or not all(col in df.columns for col in required_cols):
+        return None
+    df['_source_sheet'] = title
+    df['_original_row_idx'] = list(range(len(df)))
+    return df
+
+@trace_call("load_all_worksheets_data")
 def load_all_worksheets_data(sheet_url):
-    """Load data from ALL worksheets and concatenate with source tracking."""
+    """Load data from ALL worksheets and concatenate with source tracking.
+
+    Cada aba vem do cache de load_worksheet_data; os objetos de planilha
+    usados na gravação só são obtidos quando necessários (resolve_worksheet).
+    """
     try:
-        client = get_gspread_client()
-        spreadsheet = client.open_by_url(sheet_url)
         all_dfs = []
         worksheets_map = {}
-        
-        for ws in spreadsheet.worksheets():
-            try:
-                data = ws.get_all_records()
-                if data:
-                    df = pd.DataFrame(data)
-                    required_cols = ['Assunto', 'Pergunta', 'Resposta', 'Resultado', 'Data']
-                    if all(col in df.columns for col in required_cols):
-                        df['_source_sheet'] = ws.title
-                        df['_original_row_idx'] = list(range(len(df)))
-                        all_dfs.append(df)
-                        worksheets_map[ws.title] = ws
-            except (ValueError):
-                continue
-        
+
+        for title in get_worksheet_titles(sheet_url):
+            df = load_source_tab(sheet_url, title)
+            if df is not None:
+                all_dfs.append(df)
+                worksheets_map[title] = None
+
         if all_dfs:
             combined_df = pd.concat(all_dfs, ignore_index=True)
             return combined_df, worksheets_map
@@ -418,6 +1202,95 @@ def load_all_worksheets_data(sheet_url):
         st.error(f"Erro ao carregar todas as abas: {str(e)}")
         return None, {}
 
+@trace_call("load_all_worksheets_stream")
+def load_all_worksheets_stream(sheet_url):
+    """Como load_all_worksheets_data, mas só espera a primeira aba que serve.
+
+    Devolve (df, worksheets_map, stream): as abas seguintes chegam pelo
+    TabStream em segundo plano e entram na seleção em absorb_streamed_tabs.
+    stream é None quando não sobrou aba para carregar.
+    """
+    try:
+        titles = get_worksheet_titles(sheet_url)
+        for i, title in enumerate(titles):
+            df = load_source_tab(sheet_url, title)
+            if df is None:
+                continue
+            rest = titles[i + 1:]
+            stream = TabStream(rest, lambda t: load_source_tab(sheet_url, t)) if rest else None
+            return df, {title: None}, stream
+        return None, {}, None
+    except Exception as e:
+        st.error(f"Erro ao carregar todas as abas: {str(e)}")
+        return None, {}, None
+
+def absorb_streamed_tabs():
+    """Junta à seleção as abas do "Todos" que chegaram desde o último rerun.
+
+    As linhas novas vão para o fim de original_df e, se já há um assunto
+    escolhido, as que passam nos filtros vão para o fim de filtered_df: as
+    posições já vistas não mudam, e o quiz segue na questão em que está.
+    """
+    stream = st.session_state.tab_stream
+    odf = st.session_state.original_df
+    if stream is None or odf is None:
+        return 0
+    arrived = stream.take()
+    if stream.done and not stream.has_new():
+        st.session_state.tab_stream = None
+    if not arrived:
+        return 0
+
+    added = pd.concat([df for _, df in arrived], ignore_index=True)
+    added.index += len(odf)
+    st.session_state.original_df = pd.concat([odf, added])
+    for title, _ in arrived:
+        st.session_state.worksheets_map.setdefault(title, None)
+
+    fdf = st.session_state.filtered_df
+    selected_assunto = st.session_state.selected_assunto
+    if fdf is not None and selected_assunto is not None:
+        matching = added
+        if st.session_state.status_filter:
+            matching = apply_status_filter(matching, st.session_state.status_filter)
+        if st.session_state.recency_filter != "Todas":
+            matching = apply_recency_filter(matching, st.session_state.recency_filter)
+        if selected_assunto != "Tudo":
+            matching = matching[matching['Assunto'].astype(str) == selected_assunto]
+        if len(matching):
+            st.session_state.filtered_df = pd.concat([fdf, matching], ignore_index=True)
+            st.session_state.row_mapping = list(st.session_state.row_mapping) + matching.index.tolist()
+            st.session_state.source_sheet_mapping = list(st.session_state.source_sheet_mapping) + matching['_source_sheet'].tolist()
+    return len(arrived)
+
+def _stream_progress_body():
+    stream = st.session_state.tab_stream
+    if stream is None:
+        return
+    if stream.has_new() or stream.done:
+        st.rerun()  # Rerun completo: seletor de assunto e contagem de questões mudam
+    loaded, total = stream.progress()
+    st.progress(loaded / total if total else 1.0,
+                text=f"Carregando as demais abas: {loaded} de {total}. Já dá para começar pelas questões abaixo.")
+
+def render_stream_progress():
+    """Progresso das abas do "Todos" ainda a caminho; se atualiza sozinho até acabar."""
+    stream = st.session_state.tab_stream
+    if stream is None:
+        return
+    st.fragment(_stream_progress_body, run_every=None if stream.done else STREAM_REFRESH_SECONDS)()
+
+STREAM_REFRESH_SECONDS = 1   # Intervalo da barra de progresso do "Todos"
+
+def resolve_worksheet(sheet_url, worksheet_title):
+    """Abre a aba para gravação na primeira vez e guarda o objeto na sessão."""
+    worksheet = st.session_state.worksheets_map.get(worksheet_title)
+    if worksheet is None:
+        worksheet = get_worksheet_for_update(sheet_url, worksheet_title)
+        if worksheet is not None:
+            st.session_state.worksheets_map[worksheet_title] = worksheet
+    return worksheet
+
 def apply_status_filter(df, status_filter):
     """Apply status filter to dataframe."""
     if not status_filter:
@@ -491,10 +1364,12 @@ def get_or_create_log_worksheet(sheet_url):
         st.error(f"Erro ao acessar Log_Estudos: {str(e)}")
         return None
 
+@trace_call("save_study_log")
 @retry_on_quota
-def save_study_log(disciplina, minutes):
-    """Salva apenas quando necessário, com proteção de cota."""
+def save_study_log(disciplina, minutes, day=None):
+    """Salva apenas quando necessário, com proteção de cota (day: "AAAA-MM-DD", hoje se None)."""
     try:
+        ensure_probed(TRILHA_SHEET_URL)
         client = get_gspread_client()
         spreadsheet = client.open_by_url(TRILHA_SHEET_URL)
         try:
@@ -503,61 +1378,134 @@ def save_study_log(disciplina, minutes):
             ws = spreadsheet.add_worksheet(title="Log_Estudos", rows=1000, cols=3)
             ws.update(values=[['Data', 'Disciplina', 'Minutos']], range_name='A1:C1')
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        ws.append_row([today, disciplina, minutes])
-
-        # Limpa o cache para o gráfico atualizar
-        get_study_logs.clear() 
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        ws.append_row([day, disciplina, minutes])
+        # Nova versão da planilha: a próxima leitura do log já vem atualizada
+        mark_sheet_written(spreadsheet_id_from_url(TRILHA_SHEET_URL))
+        add_study_minutes(day, minutes)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar: {e}")
         return False
 
+@trace_call("get_study_logs")
 def get_study_logs():
     """Get study logs for the last 7 days."""
-    try:
-        worksheet = get_or_create_log_worksheet(TRILHA_SHEET_URL)
-        if worksheet:
-            data = worksheet.get_all_records()
-            if data:
-                df = pd.DataFrame(data)
-                df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
-                seven_days_ago = datetime.now() - timedelta(days=7)
-                df = df[df['Data'] >= seven_days_ago]
-                return df
-    except:
-        pass
-    return pd.DataFrame(columns=['Data', 'Disciplina', 'Minutos'])
-
-def get_today_study_time():
-    """Get total study time for today."""
-    try:
-        df = get_study_logs()
-        if not df.empty:
-            today = datetime.now().strftime("%Y-%m-%d")
-            today_df = df[df['Data'].dt.strftime("%Y-%m-%d") == today]
-            return int(today_df['Minutos'].sum())
-    except:
-        pass
-    return 0
+    df = None
+    if serve_cold_snapshot(TRILHA_SHEET_URL):
+        df = load_snapshot_frame(TRILHA_SHEET_URL, "Log_Estudos")
+    if df is None:
+        version = current_sheet_version(TRILHA_SHEET_URL, get_trilha_version())
+        try:
+            df = _fetch_study_logs(version)
+        except Exception:
+            return pd.DataFrame(columns=['Data', 'Disciplina', 'Minutos'])
+    if df.empty:
+        return df
+    seven_days_ago = datetime.now() - timedelta(days=7)
+    return df[df['Data'] >= seven_days_ago]
 
-@st.cache_data(ttl=60) # Guarda na memória por 60 segundos
+@trace_cache("fetch_study_logs", worksheet="Log_Estudos")
+@st.cache_data(ttl=6 * 3600, max_entries=16)
 @retry_on_quota
+def _fetch_study_logs(version):
+    # Mesma chave de versão da Trilha (Log_Estudos fica na mesma planilha):
+    # save_study_log marca a gravação e a próxima leitura já vem atualizada
+    drive_version = snapshot_version(version)
+    if drive_version:
+        df = load_snapshot_frame(TRILHA_SHEET_URL, "Log_Estudos", drive_version)
+        if df is not None:
+            return df
+    worksheet = get_or_create_log_worksheet(TRILHA_SHEET_URL)
+    if not worksheet:
+        raise RuntimeError("Log_Estudos indisponível")  # Não fica no cache
+    data = worksheet.get_all_records()
+    df = pd.DataFrame(data) if data else pd.DataFrame(columns=['Data', 'Disciplina', 'Minutos'])
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    if drive_version:
+        try:
+            snapshots.save_frame(spreadsheet_id_from_url(TRILHA_SHEET_URL), "Log_Estudos", drive_version, df)
+        except Exception:
+            pass
+    return df
+
+# --- RESUMO DO TEMPO DE ESTUDO (SESSÃO) ---
+# O cronômetro lê o Log_Estudos uma vez por sessão (e na virada do dia); depois
+# o total de hoje e o gráfico são mantidos aqui pelas gravações do próprio app,
+# então cliques no cronômetro não fazem nenhuma chamada externa.
+STUDY_CHART_DAYS = 7
+
+def study_summary():
+    """{"day": hoje, "daily": {"AAAA-MM-DD": minutos}} da sessão; lê a planilha só na primeira vez."""
+    today = datetime.now().strftime("%Y-%m-%d")
+    summary = st.session_state.get("study_summary")
+    if summary is None or summary["day"] != today:
+        daily = {}
+        try:
+            logs = get_study_logs()
+            if not logs.empty:
+                minutes = pd.to_numeric(logs['Minutos'], errors='coerce').fillna(0)
+                daily = {day: int(total) for day, total in minutes.groupby(logs['Data'].dt.strftime("%Y-%m-%d")).sum().items()}
+        except Exception:
+            pass  # Sem log: começa do zero, as gravações da sessão somam
+        summary = st.session_state.study_summary = {"day": today, "daily": daily}
+    return summary
+
+def add_study_minutes(day, minutes):
+    """Soma uma gravação do log ao resumo da sessão (se já foi carregado)."""
+    summary = st.session_state.get("study_summary")
+    if summary is not None:
+        summary["daily"][day] = summary["daily"].get(day, 0) + int(minutes)
+
+@trace_call("get_trilha_data")
 def get_trilha_data():
-    """Busca dados da trilha com cache e proteção contra falhas."""
+    """Busca dados da trilha com cache e proteção contra falhas.
+
+    Quando os dados vêm de snapshot a aba não é aberta (worksheet None);
+    as gravações usam open_trilha_worksheet.
+    """
+    if serve_cold_snapshot(TRILHA_SHEET_URL):
+        df = load_snapshot_frame(TRILHA_SHEET_URL, "Trilha")
+        if df is not None:
+            return df, None
+    version = current_sheet_version(TRILHA_SHEET_URL, get_trilha_version())
     try:
-        client = get_gspread_client()
-        spreadsheet = client.open_by_url(TRILHA_SHEET_URL)
-        # Tenta pegar a aba, se não achar retorna None sem travar
-        try:
-            worksheet = spreadsheet.worksheet("Trilha")
-            data = worksheet.get_all_records()
-            return pd.DataFrame(data), worksheet
-        except:
-            return None, None
+        return _fetch_trilha_data(version)
     except Exception:
         return None, None
 
+@trace_cache("fetch_trilha_data", worksheet="Trilha")
+@st.cache_data(ttl=6 * 3600, max_entries=16)
+@retry_on_quota
+def _fetch_trilha_data(version):
+    drive_version = snapshot_version(version)
+    if drive_version:
+        df = load_snapshot_frame(TRILHA_SHEET_URL, "Trilha", drive_version)
+        if df is not None:
+            return df, None
+    client = get_gspread_client()
+    spreadsheet = client.open_by_url(TRILHA_SHEET_URL)
+    # Aba inexistente é resposta estável (criá-la muda a versão); outros erros sobem
+    try:
+        worksheet = spreadsheet.worksheet("Trilha")
+    except Exception as e:
+        if type(e).__name__ == "WorksheetNotFound":
+            return None, None
+        raise
+    # Valores brutos: o ID continua numérico para comparar com novas missões
+    df = load_columns(spreadsheet, "Trilha", value_render_option="UNFORMATTED_VALUE")
+    if drive_version:
+        try:
+            snapshots.save_frame(spreadsheet_id_from_url(TRILHA_SHEET_URL), "Trilha", drive_version, df)
+        except Exception:
+            pass
+    return df, worksheet
+
+def open_trilha_worksheet(worksheet=None):
+    """Aba da Trilha para gravação (aberta agora se veio de snapshot)."""
+    ensure_probed(TRILHA_SHEET_URL)
+    return worksheet or get_worksheet_for_update(TRILHA_SHEET_URL, "Trilha")
+
         
 def ensure_tempo_column(worksheet):
     """Ensure 'Tempo' column exists after 'Data' column in Trilha worksheet."""
@@ -608,6 +1556,7 @@ def get_next_mission(df):
         return missions[0]
     return None, None
 
+@trace_call("create_new_mission")
 def create_new_mission(worksheet, description, disciplina):
     """Create a new mission in the Trilha worksheet."""
     try:
@@ -625,11 +1574,13 @@ def create_new_mission(worksheet, description, disciplina):
         
         new_row = [new_id, description, disciplina, "não", "", ""]
         worksheet.append_row(new_row)
+        mark_sheet_written(worksheet.spreadsheet_id)
         return new_id
     except Exception as e:
         st.error(f"Erro ao criar missão: {str(e)}")
         return None
 
+@trace_call("complete_mission")
 def complete_mission(worksheet, row_idx, tempo_minutes=None):
     """Mark mission as complete with optional tempo."""
     try:
@@ -641,32 +1592,39 @@ def complete_mission(worksheet, row_idx, tempo_minutes=None):
             if tempo_col:
                 worksheet.update_cell(row_idx + 2, tempo_col, tempo_minutes)
         
+        mark_sheet_written(worksheet.spreadsheet_id)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar conclusão: {e}")
         return False
 
+def write_result_cells(worksheet, original_row_index, resultado, data, minha_resposta=None):
+    """Grava resultado, data e resposta na linha; erros sobem para quem chamou."""
+    resultado_col = get_column_index(worksheet, 'Resultado')
+    data_col = get_column_index(worksheet, 'Data')
+
+    if resultado_col:
+        worksheet.update_cell(original_row_index + 2, resultado_col, resultado)
+    else:
+        worksheet.update_cell(original_row_index + 2, 4, resultado)
+
+    if data_col:
+        worksheet.update_cell(original_row_index + 2, data_col, data)
+    else:
+        worksheet.update_cell(original_row_index + 2, 5, data)
+
+    if minha_resposta is not None:
+        minha_col = ensure_minha_resposta_column(worksheet)
+        if minha_col:
+            worksheet.update_cell(original_row_index + 2, minha_col, minha_resposta)
+
+    mark_sheet_written(worksheet.spreadsheet_id)
+
+@trace_call("update_sheet")
 def update_sheet(worksheet, original_row_index, resultado, data, minha_resposta=None):
     """Update the Google Sheet with the result, date, and user answer."""
     try:
-        resultado_col = get_column_index(worksheet, 'Resultado')
-        data_col = get_column_index(worksheet, 'Data')
-        
-        if resultado_col:
-            worksheet.update_cell(original_row_index + 2, resultado_col, resultado)
-        else:
-            worksheet.update_cell(original_row_index + 2, 4, resultado)
-        
-        if data_col:
-            worksheet.update_cell(original_row_index + 2, data_col, data)
-        else:
-            worksheet.update_cell(original_row_index + 2, 5, data)
-        
-        if minha_resposta is not None:
-            minha_col = ensure_minha_resposta_column(worksheet)
-            if minha_col:
-                worksheet.update_cell(original_row_index + 2, minha_col, minha_resposta)
-        
+        write_result_cells(worksheet, original_row_index, resultado, data, minha_resposta)
         return True
     except Exception as e:
         st.error(f"Erro ao atualizar planilha: {str(e)}")
@@ -703,31 +1661,378 @@ def format_last_resolution(value):
         return parsed.strftime("%d/%m/%Y %H:%M")
     return str(value)
 
-def record_result(resultado):
-    """Record the result and move to the next question."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    user_answer = st.session_state.user_answer
-    current_row = st.session_state.filtered_df.iloc[st.session_state.question_index]
-    
-    worksheet_to_use = st.session_state.worksheet
-    original_row_index = st.session_state.row_mapping[st.session_state.question_index] if st.session_state.question_index < len(st.session_state.row_mapping) else 0
-    
+def locate_question(position):
+    """Aba e linha de origem (0-based, sem cabeçalho) de uma questão da seleção."""
+    sheet_url = SHEETS_MAPPING.get(st.session_state.selected_disciplina)
     if st.session_state.selected_tema == "Todos" and st.session_state.worksheets_map:
-        source_sheet_name = current_row.get('_source_sheet', '')
-        original_row_index = int(current_row.get('_original_row_idx', 0))
-        worksheet_to_use = st.session_state.worksheets_map.get(source_sheet_name)
-
-    if worksheet_to_use and update_sheet(worksheet_to_use, original_row_index, resultado, timestamp, user_answer):
-        st.session_state.filtered_df.at[st.session_state.question_index, 'Resultado'] = resultado
-        st.session_state.filtered_df.at[st.session_state.question_index, 'Data'] = timestamp
-        if 'Minha_Resposta' not in st.session_state.filtered_df.columns:
-            st.session_state.filtered_df['Minha_Resposta'] = ''
-        st.session_state.filtered_df.at[st.session_state.question_index, 'Minha_Resposta'] = user_answer
+        current_row = st.session_state.filtered_df.iloc[position]
+        return sheet_url, current_row.get('_source_sheet', ''), int(current_row.get('_original_row_idx', 0))
+    mapping = st.session_state.row_mapping
+    original_row_index = mapping[position] if position < len(mapping) else 0
+    return sheet_url, st.session_state.selected_tema, original_row_index
+
+def worksheet_for_target(sheet_url, worksheet_title):
+    """Aba para gravação, reaproveitando o objeto já aberto na sessão."""
+    ensure_probed(sheet_url)
+    worksheet = st.session_state.worksheet
+    if worksheet is not None and worksheet.title == worksheet_title:
+        return worksheet
+    if worksheet_title in st.session_state.worksheets_map:
+        return resolve_worksheet(sheet_url, worksheet_title)
+    worksheet = get_worksheet_for_update(sheet_url, worksheet_title)
+    if worksheet is not None and worksheet_title == st.session_state.selected_tema:
+        st.session_state.worksheet = worksheet
+    return worksheet
+
+def apply_result_locally(resultado, timestamp, user_answer, position=None, version=None):
+    """Reflete o resultado em filtered_df, se a seleção ainda for a mesma.
+
+    Devolve (assunto, valores anteriores) ou (None, None) quando a linha
+    não está mais na seleção; os valores anteriores servem para desfazer.
+    """
+    if version is None:
+        version = st.session_state.dataset_version
+    df = st.session_state.filtered_df
+    if position is None or df is None or version != st.session_state.dataset_version:
+        return None, None
+    if 'Minha_Resposta' not in df.columns:
+        df['Minha_Resposta'] = ''
+    previous = {col: df.at[position, col] for col in ('Resultado', 'Data', 'Minha_Resposta')}
+    df.at[position, 'Resultado'] = resultado
+    df.at[position, 'Data'] = timestamp
+    df.at[position, 'Minha_Resposta'] = user_answer
+    st.session_state.question_cards.pop((version, position), None)
+    return str(df.at[position, 'Assunto']), previous
+
+def finish_result_write(sheet_url, worksheet_title, original_row_index, resultado, timestamp, assunto):
+    """Depois da gravação: agregados locais e recarga da aba em segundo plano."""
+    try:
+        get_analytics_store().record_answer(
+            disciplina_for_url(sheet_url), worksheet_title, original_row_index,
+            resultado, timestamp, assunto=assunto
+        )
+    except Exception:
+        pass
+    invalidate_sheet_cache(sheet_url, worksheet_title, delay=PREWARM_WRITE_DELAY)
+
+def commit_result(target, resultado, user_answer, position=None, version=None):
+    """Grava o resultado na planilha e reflete na seleção atual, se ainda for a mesma.
+
+    target é (sheet_url, aba, linha) de locate_question; position/version
+    apontam a linha em filtered_df no momento em que a resposta foi dada.
+    """
+    sheet_url, worksheet_title, original_row_index = target
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    worksheet_to_use = worksheet_for_target(sheet_url, worksheet_title) if sheet_url else None
+    if not worksheet_to_use or not update_sheet(worksheet_to_use, original_row_index, resultado, timestamp, user_answer):
+        return False
+
+    assunto, _ = apply_result_locally(resultado, timestamp, user_answer, position, version)
+    finish_result_write(sheet_url, worksheet_to_use.title, original_row_index, resultado, timestamp, assunto)
+    return True
+
+# --- GRAVAÇÃO OTIMISTA ---
+# O resultado entra em filtered_df e a questão avança na hora; a escrita no
+# Sheets fica com uma thread do processo. Falhas aparecem na bandeja de
+# gravações (render_write_tray), com opção de tentar de novo ou desfazer.
+OPTIMISTIC_WRITES = os.environ.get("STUDY_OPTIMISTIC_WRITES", "1") != "0"
+WRITE_TRAY_REFRESH_SECONDS = 2   # Atualização da bandeja enquanto há gravações pendentes
+
+class ResultWriter:
+    """Fila única de gravações de resultado, na ordem em que foram dadas."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._worksheets = {}  # (sheet_url, aba) -> objeto da aba já aberto
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        job["status"] = "pendente"
+        job["error"] = ""
+        self._queue.put(job)
+
+    def _worksheet(self, sheet_url, worksheet_title):
+        key = (sheet_url, worksheet_title)
+        if key not in self._worksheets:
+            spreadsheet = retry_on_quota(get_gspread_client().open_by_url)(sheet_url)
+            self._worksheets[key] = retry_on_quota(spreadsheet.worksheet)(worksheet_title)
+        return self._worksheets[key]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job["status"] != "pendente":
+                continue  # Desfeita enquanto esperava na fila
+            job["status"] = "gravando"
+            job["attempts"] += 1
+            try:
+                ensure_probed(job["sheet_url"])
+                worksheet = self._worksheet(job["sheet_url"], job["worksheet"])
+                retry_on_quota(write_result_cells)(
+                    worksheet, job["row"], job["resultado"], job["timestamp"], job["answer"]
+                )
+            except Exception as e:
+                self._worksheets.pop((job["sheet_url"], job["worksheet"]), None)
+                job["error"] = str(e) or type(e).__name__
+                job["status"] = "falhou"
+                continue
+            job["status"] = "gravado"
+            finish_result_write(job["sheet_url"], job["worksheet"], job["row"],
+                                job["resultado"], job["timestamp"], job["assunto"])
+
+@st.cache_resource
+def get_result_writer():
+    """Um único gravador por processo: a fila sobrevive a reruns e sessões."""
+    return ResultWriter()
+
+def submit_result(target, resultado, user_answer, position=None, version=None):
+    """Versão otimista de commit_result: aplica na seleção e grava em segundo plano."""
+    sheet_url, worksheet_title, original_row_index = target
+    if not sheet_url or not worksheet_title:
+        return False
+    if version is None:
+        version = st.session_state.dataset_version
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    assunto, previous = apply_result_locally(resultado, timestamp, user_answer, position, version)
+    st.session_state.write_seq += 1
+    job = {
+        "id": st.session_state.write_seq,
+        "sheet_url": sheet_url,
+        "worksheet": worksheet_title,
+        "row": original_row_index,
+        "resultado": resultado,
+        "timestamp": timestamp,
+        "answer": user_answer,
+        "assunto": assunto,
+        "position": position,
+        "version": version,
+        "previous": previous,
+        "attempts": 0,
+    }
+    key = (sheet_url, worksheet_title, original_row_index)
+    st.session_state.last_write_ids[key] = job["id"]
+    jobs = st.session_state.pending_writes
+    for older in [j for j in jobs if j["status"] == "falhou" and write_key(j) == key]:
+        # A falha antiga nunca chegou à planilha: o valor anterior de verdade é o dela
+        older["status"] = "substituído"
+        jobs.remove(older)
+        job["previous"] = older["previous"]
+    jobs.append(job)
+    get_result_writer().submit(job)
+    return True
+
+def save_result(target, resultado, user_answer, position=None, version=None):
+    """Grava pelo caminho configurado (otimista ou síncrono)."""
+    commit = submit_result if OPTIMISTIC_WRITES else commit_result
+    return commit(target, resultado, user_answer, position, version)
+
+def write_key(job):
+    return (job["sheet_url"], job["worksheet"], job["row"])
+
+def superseded(job):
+    """True se a mesma linha já recebeu um resultado mais novo nesta sessão."""
+    return st.session_state.last_write_ids.get(write_key(job), job["id"]) > job["id"]
+
+def failed_write(job_id):
+    """Gravação que falhou, ou None; a que já foi substituída sai da bandeja."""
+    jobs = st.session_state.pending_writes
+    job = next((j for j in jobs if j["id"] == job_id and j["status"] == "falhou"), None)
+    if job is not None and superseded(job):
+        job["status"] = "substituído"
+        jobs.remove(job)
+        return None
+    return job
+
+def retry_write(job_id):
+    """Callback da bandeja: devolve a gravação que falhou para a fila."""
+    job = failed_write(job_id)
+    if job is not None:
+        get_result_writer().submit(job)
+
+def rollback_write(job_id):
+    """Callback da bandeja: desiste da gravação e volta a linha ao valor anterior."""
+    job = failed_write(job_id)
+    if job is None:
+        return
+    job["status"] = "desfeito"
+    st.session_state.pending_writes.remove(job)
+    df = st.session_state.filtered_df
+    if job["previous"] and df is not None and job["version"] == st.session_state.dataset_version:
+        for col, value in job["previous"].items():
+            df.at[job["position"], col] = value
+        st.session_state.question_cards.pop((job["version"], job["position"]), None)
+
+def _write_tray_body():
+    jobs = st.session_state.pending_writes
+    jobs[:] = [job for job in jobs if job["status"] != "gravado"]
+    waiting = sum(job["status"] in ("pendente", "gravando") for job in jobs)
+    if waiting:
+        st.caption(f"⏳ Gravando {waiting} resultado(s) na planilha...")
+    for job in jobs:
+        if job["status"] != "falhou":
+            continue
+        label = f"{job['worksheet']}, linha {job['row'] + 2}: {job['resultado']}"
+        st.warning(f"Não foi possível gravar ({label}). {job['error']}")
+        c1, c2 = st.columns(2)
+        c1.button("Tentar de novo", key=f"retry_write_{job['id']}", use_container_width=True,
+                  on_click=retry_write, args=(job["id"],))
+        c2.button("Desfazer", key=f"rollback_write_{job['id']}", use_container_width=True,
+                  on_click=rollback_write, args=(job["id"],))
+
+def render_write_tray():
+    """Bandeja de gravações pendentes e falhas; se atualiza sozinha enquanto há fila."""
+    jobs = st.session_state.pending_writes
+    if not jobs:
+        return
+    waiting = any(job["status"] in ("pendente", "gravando") for job in jobs)
+    st.fragment(_write_tray_body, run_every=WRITE_TRAY_REFRESH_SECONDS if waiting else None)()
+
+def record_result(resultado):
+    """Record the result and move to the next question (callback dos botões de resultado)."""
+    position = st.session_state.question_index
+    if save_result(locate_question(position), resultado, st.session_state.user_answer, position):
         next_question()
-        st.rerun()
 
+# --- CORREÇÃO EM LOTE ("CORRIGIR DEPOIS") ---
+def queue_answer_for_grading(position, user_answer):
+    """Guarda a resposta atual na fila de correção em lote."""
+    row = st.session_state.filtered_df.iloc[position]
+    st.session_state.grading_seq += 1
+    st.session_state.grading_queue.append({
+        "id": str(st.session_state.grading_seq),
+        "target": locate_question(position),
+        "position": position,
+        "version": st.session_state.dataset_version,
+        "assunto": str(row['Assunto']),
+        "question": str(row['Pergunta']),
+        "reference": str(row['Resposta']),
+        "answer": user_answer,
+        "score": None,
+        "feedback": "",
+        "tier": None,
+    })
+
+def grade_in_batches(items, batch_size, on_batch=None):
+    """Corrige pela IA, em pedidos de batch_size, itens que a camada local não decidiu.
+
+    Itens que a resposta do lote não trouxe (ausentes ou malformados) são
+    corrigidos um a um por grade_answer; com a IA fora do ar, todos recebem
+    a nota local provisória. on_batch(feito, total) acompanha o progresso.
+    """
+    batches = chunked(items, batch_size)
+    for done, batch in enumerate(batches, start=1):
+        breaker = ai_breaker("correção")
+        results, reason = {}, None
+        if breaker.allow():
+            t0 = time.perf_counter()
+            try:
+                results = evaluate_answers_batch(batch)
+                breaker.record_success()
+            except Exception as e:
+                breaker.record_failure()
+                reason = f"a IA não respondeu ({type(e).__name__})"
+            per_item_ms = (time.perf_counter() - t0) * 1000 / len(batch)
+        else:
+            reason = f"IA pausada após falhas seguidas, nova tentativa em {breaker.retry_in():.0f}s"
+        for item in batch:
+            if item["id"] in results:
+                item["score"], item["feedback"] = results[item["id"]]
+                item["tier"] = "lote"
+                record_tier("lote", per_item_ms)
+            elif reason:
+                item["score"], item["feedback"] = fallback_result(item["answer"], item["reference"], reason)
+                item["tier"] = "reserva"
+            else:
+                item["score"], item["feedback"], item["tier"] = grade_answer(
+                    item["question"], item["answer"], item["reference"]
+                )
+        if on_batch is not None:
+            on_batch(done, len(batches))
+
+def grade_queued_answers(batch_size):
+    """Corrige os itens ainda sem nota, um pedido por lote de batch_size."""
+    pending = []
+    for item in st.session_state.grading_queue:
+        if item["score"] is not None:
+            continue
+        decision = timed_local_grade(item["answer"], item["reference"])
+        if decision is not None:
+            item["tier"], item["score"], item["feedback"] = decision
+        else:
+            pending.append(item)
+    if not pending:
+        return
+    total = len(chunked(pending, batch_size))
+    progress = st.progress(0.0, text=f"Corrigindo {len(pending)} respostas em {total} pedido(s)...")
+    grade_in_batches(
+        pending, batch_size,
+        on_batch=lambda done, total: progress.progress(done / total, text=f"Lote {done} de {total}"),
+    )
+    if any(item["tier"] == "reserva" for item in pending):
+        st.warning("⚠️ Parte das notas é provisória (calculada localmente): a IA não respondeu.")
+
+def render_grading_queue():
+    """Fila do modo "Corrigir depois": correção em lote e registro dos resultados."""
+    queue = st.session_state.grading_queue
+    if not queue:
+        return
+    graded = [item for item in queue if item["score"] is not None]
+    with st.expander(f"📝 Correção em lote ({len(queue)} respostas, {len(graded)} corrigidas)", expanded=True):
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            batch_size = st.number_input(
+                "Respostas por pedido", min_value=1, max_value=50,
+                value=GRADING_BATCH_SIZE, key="grading_batch_size"
+            )
+        with col2:
+            st.write("")
+            if len(graded) < len(queue) and st.button("Corrigir pendentes", type="primary", use_container_width=True):
+                grade_queued_answers(batch_size)
+                rerun_fragment()
+
+        if not graded:
+            return
+
+        review = pd.DataFrame([
+            {
+                "Assunto": item["assunto"],
+                "Pergunta": item["question"][:80],
+                "Nota": item["score"],
+                "Feedback": item["feedback"],
+                "Correção": item["tier"],
+                "Resultado": suggest_result(item["score"]),
+            }
+            for item in graded
+        ])
+        edited = st.data_editor(
+            review,
+            column_config={
+                "Resultado": st.column_config.SelectboxColumn(
+                    "Resultado", options=["Acertei", "Posso melhorar", "Errei"], required=True
+                ),
+            },
+            disabled=["Assunto", "Pergunta", "Nota", "Feedback", "Correção"],
+            hide_index=True,
+            use_container_width=True,
+            key=f"grading_review_{len(queue)}_{len(graded)}",
+        )
+
+        if st.button("Registrar resultados corrigidos", use_container_width=True):
+            recorded = set()
+            for item, resultado in zip(graded, edited["Resultado"]):
+                if save_result(item["target"], resultado, item["answer"], item["position"], item["version"]):
+                    recorded.add(item["id"])
+            st.session_state.grading_queue = [item for item in queue if item["id"] not in recorded]
+            st.toast(f"{len(recorded)} resultado(s) registrados.")
+            rerun_fragment()
+
+@trace_call("get_ai_response", kind="openai")
 def get_ai_response(question):
     """Get response from OpenAI using Responses API (GPT-5-mini)."""
+    breaker = ai_breaker("consultor")
+    if not breaker.allow():
+        return f"IA indisponível no momento (falhas seguidas); nova tentativa em {breaker.retry_in():.0f}s."
     try:
         api_key = (
             os.environ.get("AI_INTEGRATIONS_OPENAI_API_KEY")
@@ -735,13 +2040,14 @@ def get_ai_response(question):
             or os.environ.get("OPENAI_API_KEY")
         )
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.environ.get(
-                "AI_INTEGRATIONS_OPENAI_BASE_URL",
-                "https://api.openai.com/v1"
-            ),
+        base_url = os.environ.get(
+            "AI_INTEGRATIONS_OPENAI_BASE_URL",
+            "https://api.openai.com/v1"
         )
+        if use_fake_ai():
+            api_key, base_url = grading_api_config()
+
+        client = get_openai_client(api_key, base_url)
 
         response = client.responses.create(
             model="gpt-5-mini",
@@ -755,91 +2061,226 @@ def get_ai_response(question):
                     "content": [{"type": "input_text", "text": question}]
                 }
             ],
-            max_output_tokens=500
+            max_output_tokens=500,
+            timeout=AI_TIMEOUT_SECONDS
         )
 
+        breaker.record_success()
         return response.output_text
 
     except Exception as e:
+        breaker.record_failure()
         return f"Erro ao consultar IA: {str(e)}"
 
 
-def render_sidebar():
-    
-        # --- CRONÔMETRO BLINDADO (OFFLINE) ---
-        with st.expander("⏱️ Tempo de estudo", expanded=True):
-            tab1, tab2 = st.tabs(["Auto", "Manual"])
-
-            with tab1:
-                # Mostra o total já cacheado (rápido, não bate no Google)
-                today_time = get_today_study_time()
-                st.metric("Tempo Total Hoje", f"{today_time} min")
-
-                # --- CORREÇÃO DO ERRO COL2 ---
-                # Criamos as colunas ANTES de tentar usá-las
-                col1, col2 = st.columns(2)
-
-                # Lógica 100% Offline enquanto conta
-                with col1:
-                    if not st.session_state.timer_running:
-                        if st.button("▶️ Iniciar", use_container_width=True):
-                            st.session_state.timer_running = True
-                            st.session_state.timer_start = datetime.now()
-                            st.rerun()
-                    else:
-                         # Botão visualmente desabilitado ou informativo
-                         st.markdown(f"<div style='text-align:center; padding: 10px; color: #B86E7E; font-weight: bold;'>Em curso...</div>", unsafe_allow_html=True)
-
-                with col2:
-                    if st.session_state.timer_running:
-                        # Cálculo apenas visual (não toca no Google API)
-                        start = st.session_state.timer_start
-                        mins_decorridos = 0
-                        if start:
-                            delta = datetime.now() - start
-                            mins_decorridos = int(delta.total_seconds() / 60)
-
-                        # Botão de Parar (Só chama o Google AQUI)
-                        if st.button("⏹️ Parar", use_container_width=True):
-                            if start:
-                                delta = datetime.now() - start
-                                final_min = max(1, int(delta.total_seconds() / 60))
-                                disc = st.session_state.selected_disciplina or "Geral"
-
-                                with st.spinner("Salvando..."):
-                                    # Chama a função blindada de salvar
-                                    save_study_log(disc, final_min)
-
-                                st.success(f"+{final_min} min!")
-
-                            st.session_state.timer_running = False
-                            st.session_state.timer_start = None
-                            time.sleep(1)
-                            st.rerun()
+# --- MARCAÇÃO EM LOTE ---
+BULK_STATUSES = ["Acertei", "Posso melhorar", "Errei", "Novo"]
+
+def write_bulk_results(worksheet, updates):
+    """Grava vários (linha, resultado, data) de uma aba num único batch_update.
+
+    O cabeçalho é lido uma vez; linhas seguidas viram um só intervalo por coluna.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    headers = worksheet.row_values(1)
+    resultado_col = headers.index('Resultado') + 1 if 'Resultado' in headers else 4
+    data_col = headers.index('Data') + 1 if 'Data' in headers else 5
+
+    updates = sorted(updates)
+    data = []
+    for col, field in ((resultado_col, 1), (data_col, 2)):
+        run = []
+        for update in updates + [None]:
+            if run and (update is None or update[0] != run[-1][0] + 1):
+                first, last = rowcol_to_a1(run[0][0] + 2, col), rowcol_to_a1(run[-1][0] + 2, col)
+                data.append({"range": f"{first}:{last}", "values": [[u[field]] for u in run]})
+                run = []
+            if update is not None:
+                run.append(update)
+    worksheet.batch_update(data, value_input_option="USER_ENTERED")
+    mark_sheet_written(worksheet.spreadsheet_id)
+
+def commit_bulk_results(changes):
+    """Grava os resultados marcados na grade: uma gravação por aba.
+
+    changes é uma lista de (posição em filtered_df, resultado). Em "Todos",
+    cada linha vai para a sua aba de origem. Devolve (gravadas, erros).
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    df = st.session_state.filtered_df
+    version = st.session_state.dataset_version
+
+    by_worksheet = {}
+    for position, resultado in changes:
+        sheet_url, worksheet_title, original_row_index = locate_question(position)
+        # Voltar para "Novo" apaga o resultado, mas mantém a data da última revisão
+        data = timestamp if resultado else str(df.at[position, 'Data'])
+        by_worksheet.setdefault((sheet_url, worksheet_title), []).append(
+            (original_row_index, resultado, data, position)
+        )
 
-                # Feedback visual do tempo (fora das colunas para destaque)
-                if st.session_state.timer_running and st.session_state.timer_start:
-                    delta = datetime.now() - st.session_state.timer_start
-                    mins = int(delta.total_seconds() / 60)
-                    st.info(f"⏳ Tempo da sessão atual: {mins} min")
-
-            with tab2:
-                m_min = st.number_input("Minutos", 1, 480, 30)
-                m_date = st.date_input("Data", datetime.now())
-                m_disc = st.selectbox("Matéria", list(SHEETS_MAPPING.keys()))
-                if st.button("Salvar Manual", use_container_width=True):
-                    with st.spinner("Salvando..."):
-                        save_study_log(m_disc, m_min)
-                    st.success("Salvo!")
-
-        # --- GRÁFICO ---
+    saved, errors = 0, []
+    for (sheet_url, worksheet_title), updates in by_worksheet.items():
+        worksheet = worksheet_for_target(sheet_url, worksheet_title) if sheet_url else None
+        if worksheet is None:
+            errors.append(f"{worksheet_title}: aba indisponível")
+            continue
         try:
-            logs = get_study_logs()
-            if not logs.empty:
-                daily = logs.groupby(logs['Data'].dt.strftime("%d/%m"))['Minutos'].sum()
-                st.bar_chart(daily, height=150, color="#B86E7E")
-        except:
-            pass # Se der erro no gráfico, não quebra o app
+            retry_on_quota(write_bulk_results)(worksheet, [u[:3] for u in updates])
+        except Exception as e:
+            errors.append(f"{worksheet_title}: {e}")
+            continue
+
+        for original_row_index, resultado, data, position in updates:
+            df.at[position, 'Resultado'] = resultado
+            df.at[position, 'Data'] = data
+            st.session_state.question_cards.pop((version, position), None)
+            try:
+                get_analytics_store().record_answer(
+                    disciplina_for_url(sheet_url), worksheet_title, original_row_index,
+                    resultado, data, assunto=str(df.at[position, 'Assunto'])
+                )
+            except Exception:
+                pass
+        invalidate_sheet_cache(sheet_url, worksheet_title, delay=PREWARM_WRITE_DELAY)
+        saved += len(updates)
+    return saved, errors
+
+def save_bulk_grid(changes):
+    """Callback do botão da grade: grava e deixa o aviso para o próximo desenho."""
+    saved, errors = commit_bulk_results(changes)
+    st.session_state.bulk_grid_seq += 1
+    st.session_state.bulk_notice = (saved, errors)
+
+# --- FRAGMENTOS ---
+# Partes da página que se redesenham sozinhas (st.fragment). Um rerun de
+# fragmento não passa pelo main(): traced_fragment abre o registro dele no
+# painel de desempenho.
+def traced_fragment(label):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if rerun_in_progress():
+                return func(*args, **kwargs)
+            begin_rerun(st.session_state.perf_history, label=f"⚡ {label}")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end_rerun()
+        return wrapper
+    return decorator
+
+def rerun_fragment():
+    """Rerun só do fragmento corrente; se ele rodou junto com a página, rerun completo."""
+    from streamlit.errors import StreamlitAPIException
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# --- CRONÔMETROS ---
+# Os dois cronômetros são fragmentos: Iniciar/Parar/Pausar reexecutam só o
+# próprio trecho, e o relógio corre no navegador (render_live_timer), sem
+# reruns por segundo nem chamadas ao Google enquanto o tempo passa.
+def render_live_timer(elapsed_seconds, label=""):
+    """Relógio hh:mm:ss que avança no navegador a partir do tempo já decorrido."""
+    components.html(
+        f"""
+<div id="live-timer" style="font-family:'Source Sans Pro',sans-serif;color:#B86E7E;
+     font-weight:bold;text-align:center;padding:8px 0;"></div>
+<script>
+const base = {int(elapsed_seconds)}, loaded = Date.now(), label = {json.dumps(label)};
+const el = document.getElementById("live-timer");
+const pad = (n) => String(n).padStart(2, "0");
+function tick() {{
+  const s = base + Math.floor((Date.now() - loaded) / 1000);
+  el.textContent = label + pad(Math.floor(s / 3600)) + ":" + pad(Math.floor(s / 60) % 60) + ":" + pad(s % 60);
+}}
+tick();
+setInterval(tick, 1000);
+</script>
+""",
+        height=45,
+    )
+
+def start_study_timer():
+    st.session_state.timer_running = True
+    st.session_state.timer_start = datetime.now()
+
+def stop_study_timer():
+    """Parar: o único clique do cronômetro que chama o Google."""
+    start = st.session_state.timer_start
+    if start:
+        delta = datetime.now() - start
+        final_min = max(1, int(delta.total_seconds() / 60))
+        disc = st.session_state.selected_disciplina or "Geral"
+        if save_study_log(disc, final_min):
+            st.session_state.timer_notice = f"+{final_min} min!"
+    st.session_state.timer_running = False
+    st.session_state.timer_start = None
+
+def save_manual_study_log():
+    day = st.session_state.manual_study_date.strftime("%Y-%m-%d")
+    if save_study_log(st.session_state.manual_study_disc, st.session_state.manual_study_minutes, day):
+        st.session_state.timer_notice = "Salvo!"
+
+@st.fragment
+@traced_fragment("Cronômetro")
+def render_study_timer():
+    """Cronômetro do dia, total de hoje e gráfico dos últimos 7 dias.
+
+    Os botões usam callbacks: o estado muda antes do fragmento ser redesenhado,
+    então nenhum clique precisa de st.rerun. Total e gráfico vêm do resumo da
+    sessão (study_summary), sem ir ao Google a cada clique.
+    """
+    summary = study_summary()
+    # Avisos dos callbacks saem como toast (não seguram a tela como o sleep antigo)
+    notice = st.session_state.pop("timer_notice", None)
+    if notice:
+        st.toast(notice)
+
+    with st.expander("⏱️ Tempo de estudo", expanded=True):
+        tab1, tab2 = st.tabs(["Auto", "Manual"])
+
+        with tab1:
+            today_time = summary["daily"].get(summary["day"], 0)
+            st.metric("Tempo Total Hoje", f"{today_time} min")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                if not st.session_state.timer_running:
+                    st.button("▶️ Iniciar", use_container_width=True, on_click=start_study_timer)
+                else:
+                    st.markdown(f"<div style='text-align:center; padding: 10px; color: #B86E7E; font-weight: bold;'>Em curso...</div>", unsafe_allow_html=True)
+
+            with col2:
+                if st.session_state.timer_running:
+                    st.button("⏹️ Parar", use_container_width=True, on_click=stop_study_timer)
+
+            if st.session_state.timer_running and st.session_state.timer_start:
+                elapsed = datetime.now() - st.session_state.timer_start
+                render_live_timer(elapsed.total_seconds(), "⏳ Sessão atual: ")
+
+        with tab2:
+            st.number_input("Minutos", 1, 480, 30, key="manual_study_minutes")
+            st.date_input("Data", datetime.now(), key="manual_study_date")
+            st.selectbox("Matéria", list(SHEETS_MAPPING.keys()), key="manual_study_disc")
+            st.button("Salvar Manual", use_container_width=True, on_click=save_manual_study_log)
+
+    # --- GRÁFICO ---
+    since = (datetime.now() - timedelta(days=STUDY_CHART_DAYS)).strftime("%Y-%m-%d")
+    days = sorted(day for day in summary["daily"] if since <= day <= summary["day"])
+    if days:
+        daily = pd.Series([summary["daily"][day] for day in days],
+                          index=[datetime.strptime(day, "%Y-%m-%d").strftime("%d/%m") for day in days])
+        st.bar_chart(daily, height=150, color="#B86E7E")
+
+def render_sidebar():
+
+        # --- CRONÔMETRO BLINDADO (OFFLINE) ---
+        render_study_timer()
 
         # --- OUTRAS FERRAMENTAS ---
         with st.expander("🎧 Petit Journal"):
@@ -914,14 +2355,13 @@ def render_trilha_dashboard():
                 new_disc = st.selectbox("Disciplina", list(SHEETS_MAPPING.keys()))
                 if st.form_submit_button("Criar Missão", type="primary"):
                     if new_desc.strip():
-                        new_id = create_new_mission(worksheet, new_desc, new_disc)
+                        new_id = create_new_mission(open_trilha_worksheet(worksheet), new_desc, new_disc)
                         if new_id:
                             st.success(f"Missão #{new_id} criada!")
                             st.session_state.show_create_mission = False
                             st.session_state.force_select_mission = new_id
                             if 'mission_selector' in st.session_state:
                                 del st.session_state['mission_selector']
-                            get_trilha_data.clear()
                             st.rerun()
                     else:
                         st.warning("Preencha a descrição.")
@@ -975,65 +2415,70 @@ def render_trilha_dashboard():
                 submitted = st.form_submit_button("Criar Missão", type="primary")
                 if submitted:
                     if new_desc.strip():
-                        new_id = create_new_mission(worksheet, new_desc, new_disc)
+                        new_id = create_new_mission(open_trilha_worksheet(worksheet), new_desc, new_disc)
                         if new_id:
                             st.success(f"Missão #{new_id} criada!")
                             st.session_state.show_create_mission = False
                             st.session_state.force_select_mission = new_id
                             if 'mission_selector' in st.session_state:
                                 del st.session_state['mission_selector']
-                            get_trilha_data.clear()
                             st.rerun()
                     else:
                         st.warning("Preencha a descrição.")
 
     st.markdown(f"**Missão Ativa:** {active_desc}")
     
+    render_focus_timer(worksheet, active_idx, active_disc)
+
+def start_focus_timer():
+    st.session_state.trilha_timer_running = True
+    st.session_state.trilha_timer_start = datetime.now()
+
+def pause_focus_timer():
+    elapsed = datetime.now() - st.session_state.trilha_timer_start
+    st.session_state.trilha_elapsed_minutes += max(0, int(elapsed.total_seconds() / 60))
+    st.session_state.trilha_timer_running = False
+    st.session_state.trilha_timer_start = None
+
+@st.fragment
+@traced_fragment("Timer de foco")
+def render_focus_timer(worksheet, active_idx, active_disc):
+    """Timer de foco da missão ativa; só Concluir recarrega a página inteira."""
     timer_col1, timer_col2, timer_col3 = st.columns([1, 1, 1])
-    
+
     with timer_col1:
         if not st.session_state.trilha_timer_running:
             total_mins = st.session_state.trilha_elapsed_minutes
             if total_mins > 0:
                 st.info(f"⏸️ {total_mins} min acumulados")
-            if st.button("▶️ Iniciar Foco", use_container_width=True, type="primary"):
-                st.session_state.trilha_timer_running = True
-                st.session_state.trilha_timer_start = datetime.now()
-                st.rerun()
+            st.button("▶️ Iniciar Foco", use_container_width=True, type="primary", on_click=start_focus_timer)
         else:
             elapsed = datetime.now() - st.session_state.trilha_timer_start
-            session_mins = int(elapsed.total_seconds() / 60)
-            total_mins = st.session_state.trilha_elapsed_minutes + session_mins
-            st.info(f"⏳ {total_mins} min")
-    
+            total_seconds = st.session_state.trilha_elapsed_minutes * 60 + elapsed.total_seconds()
+            render_live_timer(total_seconds, "⏳ ")
+
     with timer_col2:
         if st.session_state.trilha_timer_running:
-            if st.button("⏹️ Pausar Timer", use_container_width=True):
-                elapsed = datetime.now() - st.session_state.trilha_timer_start
-                session_mins = max(0, int(elapsed.total_seconds() / 60))
-                st.session_state.trilha_elapsed_minutes += session_mins
-                st.session_state.trilha_timer_running = False
-                st.session_state.trilha_timer_start = None
-                st.rerun()
-    
+            st.button("⏹️ Pausar Timer", use_container_width=True, on_click=pause_focus_timer)
+
     with timer_col3:
         if st.button("✅ Concluir Missão", use_container_width=True):
             tempo_min = st.session_state.trilha_elapsed_minutes
             if st.session_state.trilha_timer_running and st.session_state.trilha_timer_start:
                 elapsed = datetime.now() - st.session_state.trilha_timer_start
                 tempo_min += max(0, int(elapsed.total_seconds() / 60))
-            
+
             tempo_min = max(1, tempo_min) if tempo_min > 0 else None
-            
-            if complete_mission(worksheet, active_idx, tempo_min):
+
+            if complete_mission(open_trilha_worksheet(worksheet), active_idx, tempo_min):
                 if tempo_min:
                     save_study_log(active_disc, tempo_min)
-                st.success(f"Missão concluída!" + (f" (+{tempo_min} min)" if tempo_min else ""))
+                st.toast(f"Missão concluída!" + (f" (+{tempo_min} min)" if tempo_min else ""))
                 st.session_state.trilha_timer_running = False
                 st.session_state.trilha_timer_start = None
                 st.session_state.trilha_elapsed_minutes = 0
                 st.session_state.active_mission_idx = None
-                get_trilha_data.clear()
+                # A lista de missões mudou: aqui sim a página inteira recarrega
                 st.rerun()
             else:
                 st.error("Erro ao concluir missão")
@@ -1054,6 +2499,7 @@ def render_study_content():
         )
 
         if selected_disciplina != st.session_state.selected_disciplina:
+            stash_current_theme()
             st.session_state.selected_disciplina = selected_disciplina
             st.session_state.selected_tema = None
             st.session_state.selected_assunto = None
@@ -1061,9 +2507,9 @@ def render_study_content():
             st.session_state.filtered_df = None
             st.session_state.worksheet = None
             st.session_state.worksheets_map = {}
+            st.session_state.paged_loader = None
+            st.session_state.tab_stream = None
             reset_quiz_state()
-            load_worksheet_data.clear()
-            get_worksheet_titles.clear()
 
     sheet_url = SHEETS_MAPPING[selected_disciplina]
     worksheet_titles = get_worksheet_titles(sheet_url)
@@ -1079,25 +2525,38 @@ def render_study_content():
             )
 
             if selected_tema != st.session_state.selected_tema:
+                stash_current_theme()
                 st.session_state.selected_tema = selected_tema
                 st.session_state.selected_assunto = None
                 st.session_state.original_df = None
                 st.session_state.filtered_df = None
                 st.session_state.worksheets_map = {}
+                st.session_state.paged_loader = None
+                st.session_state.tab_stream = None
                 st.session_state.source_sheet_mapping = []
                 reset_quiz_state()
-                load_worksheet_data.clear()
 
     if st.session_state.selected_tema and st.session_state.original_df is None:
+        restore_theme(sheet_url)
+
+    if st.session_state.selected_tema and st.session_state.original_df is None:
+        st.session_state.original_version = loaded_sheet_version(sheet_url)
         with st.spinner("Carregando dados..."):
             if st.session_state.selected_tema == "Todos":
-                df, worksheets_map = load_all_worksheets_data(sheet_url)
+                # Só a primeira aba é esperada; as demais entram conforme chegam
+                df, worksheets_map, stream = load_all_worksheets_stream(sheet_url)
                 if df is not None:
                     st.session_state.original_df = df.copy()
                     st.session_state.worksheets_map = worksheets_map
+                    st.session_state.tab_stream = stream
                     st.session_state.worksheet = None
             else:
-                df = load_worksheet_data(sheet_url, st.session_state.selected_tema)
+                pager = None
+                if st.session_state.study_mode == "Perguntas":
+                    # Primeira questão sem esperar a aba inteira (abas grandes)
+                    df, pager = load_worksheet_paged(sheet_url, st.session_state.selected_tema)
+                else:
+                    df = load_worksheet_data(sheet_url, st.session_state.selected_tema)
                 if df is not None:
                     required_columns = ['Assunto', 'Pergunta', 'Resposta', 'Resultado', 'Data']
                     missing_columns = [col for col in required_columns if col not in df.columns]
@@ -1106,7 +2565,12 @@ def render_study_content():
                         st.error(f"Colunas faltando: {', '.join(missing_columns)}")
                     else:
                         st.session_state.original_df = df.copy()
-                        st.session_state.worksheet = get_worksheet_for_update(sheet_url, st.session_state.selected_tema)
+                        st.session_state.paged_loader = pager
+                        # A aba para gravação é aberta só no primeiro record_result
+                        st.session_state.worksheet = None
+
+    absorb_streamed_tabs()
+    render_stream_progress()
 
     if st.session_state.original_df is not None:
         last_review = get_theme_last_review_date(st.session_state.original_df)
@@ -1140,10 +2604,12 @@ def render_study_content():
             unique_assuntos = sorted(working_df['Assunto'].dropna().unique().tolist())
             assunto_options = ["Tudo"] + [str(a) for a in unique_assuntos]
 
+            # Abas do "Todos" chegando mudam as opções: o seletor mantém o assunto
+            current = st.session_state.selected_assunto
             selected_assunto = st.selectbox(
                 "Escolha o assunto",
                 options=assunto_options,
-                index=0,
+                index=assunto_options.index(current) if current in assunto_options else 0,
                 key="assunto_select"
             )
 
@@ -1162,6 +2628,8 @@ def render_study_content():
                 filtered = filtered.reset_index(drop=True)
                 st.session_state.filtered_df = filtered
                 st.session_state.row_mapping = original_indices
+                # Nova seleção: invalida o que foi pré-renderizado para a anterior
+                st.session_state.dataset_version += 1
 
                 if '_source_sheet' in filtered.columns:
                     st.session_state.source_sheet_mapping = filtered['_source_sheet'].tolist()
@@ -1172,7 +2640,7 @@ def render_study_content():
 
     mode_col1, mode_col2 = st.columns([1, 4])
     with mode_col1:
-        study_mode = st.radio("Modo", ["Perguntas", "Dissertativo"], key="study_mode_radio")
+        study_mode = st.radio("Modo", ["Perguntas", "Dissertativo", "Marcar em lote"], key="study_mode_radio")
         st.session_state.study_mode = study_mode
 
     if st.session_state.filtered_df is None or len(st.session_state.filtered_df) == 0:
@@ -1182,35 +2650,113 @@ def render_study_content():
             st.warning("Nenhuma questão encontrada com os filtros selecionados.")
         return
 
-    with mode_col2:
-        total = len(st.session_state.filtered_df)
-        current = st.session_state.question_index + 1
-        st.progress(min(current / total, 1.0))
-        st.caption(f"Questão {min(current, total)} de {total}")
-
     # AQUI ESTAVA O ERRO: Chamamos as funções, mas elas precisam estar definidas FORA daqui
     if study_mode == "Perguntas":
+        # O progresso fica dentro do fragmento para acompanhar as respostas
         render_quiz_mode()
+    elif study_mode == "Marcar em lote":
+        render_bulk_review_mode()
     else:
+        with mode_col2:
+            total = len(st.session_state.filtered_df)
+            current = st.session_state.question_index + 1
+            st.progress(min(current / total, 1.0))
+            st.caption(f"Questão {min(current, total)} de {total}")
         render_essay_mode()
 
 
 # --- AGORA SIM: As funções estão coladas na margem esquerda (fora da anterior) ---
 
+# --- PRÉ-BUSCA DAS PRÓXIMAS QUESTÕES ---
+QUESTION_PREFETCH_AHEAD = 5   # Cards montados à frente da questão atual
+
+def build_question_card(row):
+    """Monta o HTML do card (já escapado) e o modelo do prompt de correção."""
+    status_anterior = row.get('Resultado', 'Novo') or "Novo"
+    last_resolution = format_last_resolution(row.get('Data', ''))
+    question_text = html.escape(str(row['Pergunta']))
+    assunto_text = html.escape(str(row['Assunto']))
+    card_html = f"""
+        <div class="question-card">
+            <div class="question-meta">
+                Assunto: {assunto_text} · Status anterior: {html.escape(str(status_anterior))} · Última resolução: {html.escape(last_resolution)}
+            </div>
+            <div class="question-text">{question_text}</div>
+        </div>
+        """
+    return {
+        "html": card_html,
+        "prompt": grading_prompt_template(row['Pergunta'], str(row['Resposta'])),
+    }
+
+def get_question_card(position):
+    """Card da questão, reaproveitando o que a pré-busca já montou."""
+    cache = st.session_state.question_cards
+    key = (st.session_state.dataset_version, position)
+    card = cache.get(key)
+    if card is None:
+        if any(k[0] != key[0] for k in cache):
+            cache.clear()
+        card = cache[key] = build_question_card(st.session_state.filtered_df.iloc[position])
+    return card
+
+def prefetch_question_cards(position, ahead=QUESTION_PREFETCH_AHEAD):
+    """Monta os cards das próximas questões e descarta os que ficaram para trás."""
+    df = st.session_state.filtered_df
+    cache = st.session_state.question_cards
+    version = st.session_state.dataset_version
+    for key in [k for k in cache if k[0] != version or k[1] < position]:
+        del cache[key]
+    for p in range(position + 1, min(position + 1 + ahead, len(df))):
+        if (version, p) in cache:
+            continue
+        row = df.iloc[p]
+        if '_loaded' in row and not row['_loaded']:
+            continue  # Texto ainda a caminho; monta quando a janela chegar
+        cache[(version, p)] = build_question_card(row)
+
+def submit_current_answer():
+    """Verificar Resposta: a correção acontece no redesenho do painel."""
+    answer = st.session_state.answer_input
+    if answer.strip():
+        st.session_state.user_answer = answer
+        st.session_state.show_result = True
+    else:
+        st.session_state.quiz_notice = "Por favor, digite uma resposta antes de enviar."
+
+def queue_current_answer():
+    """Guardar e Avançar (modo "Corrigir depois")."""
+    answer = st.session_state.answer_input
+    if answer.strip():
+        queue_answer_for_grading(st.session_state.question_index, answer)
+        next_question()
+    else:
+        st.session_state.quiz_notice = "Por favor, digite uma resposta antes de enviar."
+
+@st.fragment
+@traced_fragment("Perguntas")
 def render_quiz_mode():
-    """Render the quiz mode interface."""
+    """Render the quiz mode interface.
+
+    Roda como fragmento: responder, corrigir e registrar redesenham só o
+    painel de perguntas, sem refazer cronômetro, Trilha e filtros.
+    """
     df = st.session_state.filtered_df
     total = len(df)
 
+    current = st.session_state.question_index + 1
+    st.progress(min(current / total, 1.0))
+    st.caption(f"Questão {min(current, total)} de {total}")
+    render_write_tray()
+
     # 1. VERIFICAÇÃO DE CONCLUSÃO (Mudamos para o topo)
     # Se o índice passou do total, mostra a festa e para a execução AQUI.
     if st.session_state.question_index >= total:
         st.success(f"Você completou todas as {total} questões desta seleção!")
         st.balloons()
 
-        if st.button("Recomeçar"):
-            reset_quiz_state()
-            st.rerun()
+        st.button("Recomeçar", on_click=reset_quiz_state)
+        render_grading_queue()
         return
 
     # 2. BARRA DE NAVEGAÇÃO (Só desenha se não acabou)
@@ -1226,7 +2772,8 @@ def render_quiz_mode():
             value=safe_current
         )
 
-        # Lógica de pular para questão específica
+        # Lógica de pular para questão específica (o resto do painel já
+        # é desenhado com a nova questão, sem rerun)
         idx = idx_visual - 1
         if idx != st.session_state.question_index:
             st.session_state.question_index = idx
@@ -1238,27 +2785,16 @@ def render_quiz_mode():
             st.session_state.pending_clear_answer = True
 
             st.session_state.last_audio_hash = None
-            st.rerun()
 
+    if not ensure_question_rows(st.session_state.question_index):
+        return
     current_row = df.iloc[st.session_state.question_index]
+    card = get_question_card(st.session_state.question_index)
 
-    # Metadados
-    status_anterior = current_row.get('Resultado', 'Novo') or "Novo"
-    last_resolution = format_last_resolution(current_row.get('Data', ''))
-    question_text = html.escape(str(current_row['Pergunta']))
-    assunto_text = html.escape(str(current_row['Assunto']))
+    st.markdown(card["html"], unsafe_allow_html=True)
 
-    st.markdown(
-        f"""
-        <div class="question-card">
-            <div class="question-meta">
-                Assunto: {assunto_text} · Status anterior: {html.escape(str(status_anterior))} · Última resolução: {html.escape(last_resolution)}
-            </div>
-            <div class="question-text">{question_text}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    # Enquanto o aluno responde, deixa as próximas questões prontas
+    prefetch_question_cards(st.session_state.question_index)
 
     st.markdown("### Sua Resposta")
 
@@ -1291,7 +2827,7 @@ def render_quiz_mode():
                             st.session_state.voice_text = text
                             st.session_state.user_answer = text
                             st.session_state.answer_input = text
-                            st.rerun()
+                            rerun_fragment()
                         except Exception as e:
                             st.error(f"Erro na transcrição: {str(e)}")
         except Exception as e:
@@ -1310,37 +2846,52 @@ def render_quiz_mode():
     )
     st.session_state.user_answer = user_answer
 
+    grade_later = st.toggle(
+        "Corrigir depois (em lote)", key="grade_later",
+        help="Guarda as respostas e corrige várias num único pedido à IA."
+    )
+
     # --- LÓGICA DE BOTÕES E CORREÇÃO ---
-    if not st.session_state.show_result:
+    # Os botões usam callbacks: o estado muda antes do painel ser redesenhado
+    notice = st.session_state.pop("quiz_notice", None)
+    if notice:
+        st.warning(notice)
+
+    if grade_later and not st.session_state.show_result:
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.button("Verificar Resposta", type="primary", use_container_width=True):
-                if user_answer.strip():
-                    st.session_state.show_result = True
-                    st.rerun()
-                else:
-                    st.warning("Por favor, digite uma resposta antes de enviar.")
+            st.button("Guardar e Avançar", type="primary", use_container_width=True, on_click=queue_current_answer)
         with col2:
-            if st.button("Pular Questão", use_container_width=True):
-                next_question()
-                st.rerun()
+            st.button("Pular Questão", use_container_width=True, on_click=next_question)
+    elif not st.session_state.show_result:
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            st.button("Verificar Resposta", type="primary", use_container_width=True, on_click=submit_current_answer)
+        with col2:
+            st.button("Pular Questão", use_container_width=True, on_click=next_question)
     else:
         # CORREÇÃO VIA IA
         if st.session_state.similarity_score is None: 
             with st.spinner("⚖️ A Banca Examinadora está analisando sua resposta..."):
-                nota, feedback = evaluate_answer_ai(
+                nota, feedback, tier = grade_answer(
                     current_row['Pergunta'], 
                     user_answer, 
-                    str(current_row['Resposta'])
+                    str(current_row['Resposta']),
+                    prompt_template=card["prompt"]
                 )
                 st.session_state.similarity_score = nota
                 st.session_state.ai_feedback = feedback
+                st.session_state.grading_tier = tier
         else:
             nota = st.session_state.similarity_score
             feedback = getattr(st.session_state, 'ai_feedback', '')
 
         st.markdown("---")
         st.markdown(f"### Conformidade com o gabarito: **{nota}/100**")
+        if st.session_state.grading_tier == "reserva":
+            st.warning("⚠️ Nota provisória, calculada localmente: a IA não respondeu a tempo. Confira o gabarito antes de registrar.")
+        elif st.session_state.grading_tier not in (None, "ia"):
+            st.caption(f"⚡ Corrigido localmente (camada: {st.session_state.grading_tier}), sem chamada à IA.")
 
         if nota >= 80:
             st.success(f"**Excelente!** {feedback}")
@@ -1358,23 +2909,51 @@ def render_quiz_mode():
         st.markdown("### Registrar Desempenho")
         c1, c2, c3 = st.columns(3)
 
-        if c1.button("✅ Acertei", use_container_width=True): 
-            record_result("Acertei")
-        if c2.button("⚠️ Posso melhorar", use_container_width=True): 
-            record_result("Posso melhorar")
-        if c3.button("❌ Errei", use_container_width=True): 
-            record_result("Errei")
+        c1.button("✅ Acertei", use_container_width=True, on_click=record_result, args=("Acertei",))
+        c2.button("⚠️ Posso melhorar", use_container_width=True, on_click=record_result, args=("Posso melhorar",))
+        c3.button("❌ Errei", use_container_width=True, on_click=record_result, args=("Errei",))
+
+    render_grading_queue()
+
+TOPICS_PAGE_SIZE = 50
+
+def render_topic_page(df, page, page_size=TOPICS_PAGE_SIZE):
+    """Monta uma página da lista de tópicos como um único bloco markdown."""
+    start = page * page_size
+    chunk = df.iloc[start:start + page_size]
+    lines = [
+        f"**{start + i + 1}.** {assunto}: {str(pergunta)[:100]}..."
+        for i, (assunto, pergunta) in enumerate(zip(chunk['Assunto'], chunk['Pergunta']))
+    ]
+    return "  \n".join(lines)
+
+def get_topic_page(df, page):
+    """Página pré-renderizada, guardada por versão da seleção (dataset_version)."""
+    cache = st.session_state.topic_pages
+    key = (st.session_state.dataset_version, page)
+    if key not in cache:
+        if any(k[0] != key[0] for k in cache):
+            cache.clear()
+        cache[key] = render_topic_page(df, page)
+    return cache[key]
 
 def render_essay_mode():
     """Render the essay/dissertativo mode interface."""
+    if not ensure_all_rows():
+        return
     df = st.session_state.filtered_df
 
     st.markdown("### Modo Dissertativo")
     st.markdown("Escreva uma redação cobrindo todos os tópicos listados abaixo. O sistema verificará sua cobertura.")
 
     with st.expander(f"📋 Tópicos a Abordar ({len(df)} questões)", expanded=True):
-        for idx, row in df.iterrows():
-            st.markdown(f"**{idx+1}.** {row['Assunto']}: {row['Pergunta'][:100]}...")
+        n_pages = max(1, -(-len(df) // TOPICS_PAGE_SIZE))
+        page = 1
+        if n_pages > 1:
+            page = st.number_input(f"Página (de {n_pages})", 1, n_pages, 1, key=f"topics_page_{st.session_state.dataset_version}")
+        start = (page - 1) * TOPICS_PAGE_SIZE
+        st.caption(f"Mostrando {start + 1}–{min(start + TOPICS_PAGE_SIZE, len(df))} de {len(df)}")
+        st.markdown(get_topic_page(df, page - 1))
 
     st.markdown("---")
 
@@ -1388,6 +2967,8 @@ def render_essay_mode():
 
     if st.button("Avaliar Cobertura", type="primary"):
         if essay.strip():
+            from thefuzz import fuzz
+
             covered = []
             not_covered = []
 
@@ -1419,24 +3000,321 @@ def render_essay_mode():
             st.warning("Escreva algo antes de avaliar.")
 
 
+@st.fragment
+@traced_fragment("Marcar em lote")
+def render_bulk_review_mode():
+    """Grade para marcar o Resultado de várias questões de uma vez.
+
+    As alterações são gravadas com um único batch_update por aba
+    (commit_bulk_results), em vez de várias chamadas por questão.
+    """
+    if not ensure_all_rows():
+        return
+    df = st.session_state.filtered_df
+
+    st.markdown("### Marcar em Lote")
+    st.caption("Altere a coluna Resultado (ou marque todas de uma vez) e grave as alterações.")
+
+    notice = st.session_state.pop("bulk_notice", None)
+    if notice:
+        saved, errors = notice
+        if saved:
+            st.success(f"{saved} resultado(s) gravados.")
+        for error in errors:
+            st.error(f"Erro ao gravar {error}")
+
+    current = df['Resultado'].fillna('').astype(str).str.strip().replace('', 'Novo')
+    fill = st.selectbox("Marcar todas como", ["—"] + BULK_STATUSES, key="bulk_fill")
+
+    grid = pd.DataFrame({
+        "Assunto": df['Assunto'].astype(str),
+        "Pergunta": df['Pergunta'].astype(str).str.slice(0, 120),
+        "Resultado": current if fill == "—" else fill,
+        "Data": df['Data'].fillna('').astype(str),
+    })
+    if '_source_sheet' in df.columns:
+        grid.insert(0, "Aba", df['_source_sheet'].astype(str))
+
+    edited = st.data_editor(
+        grid,
+        column_config={
+            "Resultado": st.column_config.SelectboxColumn("Resultado", options=BULK_STATUSES, required=True),
+        },
+        disabled=[col for col in grid.columns if col != "Resultado"],
+        hide_index=True,
+        use_container_width=True,
+        key=f"bulk_grid_{st.session_state.dataset_version}_{st.session_state.bulk_grid_seq}_{fill}",
+    )
+
+    changes = [
+        (position, "" if new == "Novo" else new)
+        for position, (old, new) in enumerate(zip(current, edited["Resultado"]))
+        if new != old
+    ]
+    n_sheets = len({locate_question(position)[1] for position, _ in changes})
+    st.button(
+        f"Gravar {len(changes)} alteração(ões)" + (f" em {n_sheets} aba(s)" if n_sheets > 1 else ""),
+        type="primary", disabled=not changes, use_container_width=True,
+        on_click=save_bulk_grid, args=(changes,),
+    )
+
+def render_analytics_dashboard():
+    """Onde estou mais fraco? Lê só os agregados locais, sem chamar o Google."""
+    store = get_analytics_store()
+    st.subheader("Desempenho")
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        level = st.selectbox("Agrupar por", list(LEVELS), index=1, key="analytics_level")
+    with col2:
+        disciplina = st.selectbox("Disciplina", ["Todas"] + list(SHEETS_MAPPING), key="analytics_disciplina")
+    with col3:
+        st.write("")
+        if st.button("🔄 Sincronizar", use_container_width=True):
+            prewarmer = get_cache_prewarmer()
+            for sheet_url in SHEETS_MAPPING.values():
+                prewarmer.schedule(sheet_url, refresh=True)
+            st.toast("Sincronização agendada em segundo plano.")
+
+    disciplina_filter = None if disciplina == "Todas" else disciplina
+    rows = store.weakest(level, disciplina_filter)
+    if not rows:
+        st.info("Ainda não há dados sincronizados. As planilhas são lidas em segundo plano; volte em instantes.")
+        return
+
+    df = pd.DataFrame(rows)
+    total = int(df['total'].sum())
+    answered = int(df['respondidas'].sum())
+    errors = int(df['errei'].sum())
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Questões", total)
+    m2.metric("Respondidas", f"{answered} ({answered / total:.0%})" if total else "0")
+    m3.metric("Taxa de erro", f"{errors / answered:.0%}" if answered else "—")
+
+    labels = [" / ".join(str(r[c]) for c in LEVELS[level]) for r in rows]
+    ranked = df.assign(Grupo=labels).dropna(subset=['fraqueza'])
+    if not ranked.empty:
+        st.markdown("#### Mais fracos")
+        st.bar_chart(ranked.head(10).set_index('Grupo')[['fraqueza']], height=260)
+
+    st.dataframe(df, hide_index=True, use_container_width=True)
+
+    trend = store.trend(30, disciplina_filter)
+    if trend:
+        st.markdown("#### Tendência (30 dias)")
+        trend_df = pd.DataFrame(trend).set_index('dia')
+        st.line_chart(trend_df[['taxa_erro']], height=200)
+        st.bar_chart(trend_df[['revisões']], height=160)
+
+    with st.expander("Sincronização por aba"):
+        st.dataframe(pd.DataFrame(store.sync_status()), hide_index=True, use_container_width=True)
+
+# --- QUESTÕES DUPLICADAS ---
+@trace_cache("find_duplicate_clusters")
+@st.cache_data(ttl=6 * 3600, max_entries=8, show_spinner=False)
+def find_duplicate_clusters(versions, threshold):
+    """Quase duplicadas em todas as abas de SHEETS_MAPPING (dedup.py).
+
+    versions são as versões das planilhas: o resultado só é recalculado
+    quando alguma delas muda. Devolve (questões analisadas, grupos).
+    """
+    records = []
+    for disciplina, sheet_url in SHEETS_MAPPING.items():
+        for title in get_worksheet_titles(sheet_url):
+            df = load_worksheet_data(sheet_url, title)
+            if df is not None and 'Pergunta' in df.columns and 'Resposta' in df.columns:
+                records.extend(records_from_frame(df, disciplina=disciplina, aba=title))
+    return len(records), find_clusters(records, threshold)
+
+def render_duplicates_page():
+    """Grupos de questões quase iguais, com aba e linha de origem para mesclar."""
+    st.subheader("Questões duplicadas")
+    st.caption("Compara Pergunta + Resposta de todas as abas de todas as disciplinas.")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        threshold = st.slider("Semelhança mínima", 0.5, 0.95, DEDUP_THRESHOLD, 0.05, key="dedup_threshold")
+    with col2:
+        st.write("")
+        search = st.button("🔍 Procurar", use_container_width=True)
+    if not search and "dedup_result" not in st.session_state:
+        return
+    if search:
+        versions = tuple(
+            current_sheet_version(url, get_sheet_version(url)) for url in SHEETS_MAPPING.values()
+        )
+        with st.spinner("Lendo as abas e calculando assinaturas..."):
+            st.session_state.dedup_result = find_duplicate_clusters(versions, threshold)
+
+    analyzed, clusters = st.session_state.dedup_result
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Questões analisadas", analyzed)
+    m2.metric("Grupos", len(clusters))
+    m3.metric("Redundantes", sum(len(c) - 1 for c in clusters))
+    if not clusters:
+        st.success("Nenhuma duplicada encontrada.")
+        return
+
+    rows = [
+        {
+            "Grupo": group, "Semelhança": similarity, "Disciplina": record["disciplina"],
+            "Aba": record["aba"], "Linha": record["linha"], "Assunto": record.get("Assunto", ""),
+            "Pergunta": record["Pergunta"], "Resposta": record["Resposta"],
+        }
+        for group, cluster in enumerate(clusters, start=1)
+        for record, similarity in cluster
+    ]
+    report = pd.DataFrame(rows)
+    st.dataframe(report, hide_index=True, use_container_width=True)
+    st.download_button(
+        "⬇️ Exportar CSV",
+        data=report.to_csv(index=False).encode("utf-8"),
+        file_name="duplicadas.csv",
+        mime="text/csv",
+    )
+
+def is_perf_panel_available():
+    """O painel de desempenho é opt-in: variável STUDY_PERF_PANEL=1 ou ?perf=1 na URL.
+
+    O ?perf=1 só vale para quem entrou com a senha do app; sem senha
+    configurada, qualquer visitante poderia abrir o painel.
+    """
+    if os.environ.get("STUDY_PERF_PANEL") == "1":
+        return True
+    if not os.environ.get("app_password") or not st.session_state.get("authenticated"):
+        return False
+    try:
+        return st.query_params.get("perf") == "1"
+    except Exception:
+        return False
+
+def render_perf_panel():
+    """Timeline das chamadas externas dos últimos reruns (somente desenvolvimento)."""
+    history = list(st.session_state.perf_history)
+    with st.sidebar:
+        if not st.toggle("🛠️ Painel de desempenho", key="perf_panel_enabled"):
+            return
+
+        if not history:
+            st.caption("Nenhum rerun registrado ainda.")
+            return
+
+        last_n = st.number_input("Últimos N reruns", 1, MAX_RERUNS, min(10, MAX_RERUNS), key="perf_last_n")
+        recent = history[-int(last_n):]
+
+        summary = []
+        timeline = []
+        for rerun in recent:
+            io_events = [e for e in rerun['events'] if e['kind'] in ("sheets", "openai")]
+            cache_events = [e for e in rerun['events'] if e['kind'] == "cache"]
+            summary.append({
+                'Rerun': rerun['rerun_id'],
+                'Total (ms)': rerun['duration_ms'],
+                'Chamadas': len(io_events),
+                'I/O (ms)': round(sum(e['latency_ms'] for e in io_events), 1),
+                'Hits': sum(1 for e in cache_events if e['cache'] == "hit"),
+                'Misses': sum(1 for e in cache_events if e['cache'] == "miss"),
+            })
+            for e in io_events:
+                timeline.append({
+                    'Rerun': str(rerun['rerun_id']),
+                    'Origem': e['scope'] or e['function'],
+                    'ms': e['latency_ms'],
+                })
+
+        st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+
+        if timeline:
+            chart = pd.DataFrame(timeline).pivot_table(index='Rerun', columns='Origem', values='ms', aggfunc='sum', fill_value=0)
+            st.bar_chart(chart, height=220)
+
+        rerun_ids = [r['rerun_id'] for r in recent]
+        chosen = st.selectbox("Detalhar rerun", options=rerun_ids[::-1], key="perf_rerun_detail")
+        detail = next(r for r in recent if r['rerun_id'] == chosen)
+        if detail['events']:
+            st.dataframe(
+                pd.DataFrame(detail['events'])[['offset_ms', 'kind', 'scope', 'function', 'worksheet', 'latency_ms', 'cache', 'error']],
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("Sem chamadas externas neste rerun.")
+
+        st.markdown("**Memória**")
+        report = memory_report()
+        cache = report["cache"]
+        if report["rss_mb"] is not None:
+            st.metric("RSS do processo", f"{report['rss_mb']:.0f} MB")
+        st.progress(
+            min(cache["usado_mb"] / cache["orçamento_mb"], 1.0) if cache["orçamento_mb"] else 0.0,
+            text=f"Cache de abas: {cache['usado_mb']:.1f} de {cache['orçamento_mb']:.0f} MB ({cache['itens']} abas, {cache['remoções']} removidas)"
+        )
+        themes = report["temas"]
+        st.caption(
+            f"Sessão: {report['sessão_mb']:.1f} MB em uso; {themes['itens']} tema(s) guardados "
+            f"({themes['usado_mb']:.1f} de {themes['orçamento_mb']:.0f} MB)"
+        )
+
+        st.markdown("**Cache das planilhas**")
+        st.caption("TTL adaptativo da sondagem de versão: acertos servidos do cache, sondagens ao Drive e mudanças vistas.")
+        st.dataframe(pd.DataFrame(SHEET_REGISTRY.report()), hide_index=True, use_container_width=True)
+
+        st.markdown("**Correção em camadas**")
+        st.dataframe(pd.DataFrame(tier_stats()), hide_index=True, use_container_width=True)
+        if breaker_states():
+            st.markdown("**Disjuntores da IA**")
+            st.dataframe(pd.DataFrame(breaker_states()), hide_index=True, use_container_width=True)
+
+        st.download_button(
+            "⬇️ Exportar JSONL",
+            data=reruns_to_jsonl(history),
+            file_name="perf_trace.jsonl",
+            mime="application/jsonl",
+            use_container_width=True
+        )
+
 def main():
     """Main application entry point."""
+    check_credentials_configured()
+
     if not check_password():
         st.stop()
 
     init_session_state()
 
-    apply_custom_style()
+    # Garante o aquecedor de cache ativo (só inicia na primeira execução do processo)
+    get_cache_prewarmer()
+
+    begin_rerun(
+        st.session_state.perf_history,
+        label=f"{st.session_state.selected_disciplina or '-'} / {st.session_state.selected_tema or '-'}"
+    )
+    try:
+        apply_custom_style()
+
+        render_sidebar()
 
-    render_sidebar()
+        st.title("Meu estudo")
 
-    st.title("Meu estudo")
+        page = st.radio(
+            "Página", ["📚 Estudo", "📊 Desempenho", "🔁 Duplicadas"],
+            horizontal=True, key="main_page", label_visibility="collapsed"
+        )
+        if page == "📊 Desempenho":
+            render_analytics_dashboard()
+        elif page == "🔁 Duplicadas":
+            render_duplicates_page()
+        else:
+            render_trilha_dashboard()
 
-    render_trilha_dashboard()
+            st.divider()
 
-    st.divider()
+            render_study_content()
+    finally:
+        end_rerun()
 
-    render_study_content()
+    if is_perf_panel_available():
+        render_perf_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,99 @@
+"""Correção em lote: várias respostas avaliadas num único pedido ao modelo.
+
+No modo "Corrigir depois" as respostas da sessão ficam numa fila e são
+enviadas em grupos de GRADING_BATCH_SIZE. O modelo devolve um JSON com uma
+nota e um feedback por item, identificados pelo mesmo `id` enviado.
+"""
+import json
+import os
+import re
+
+GRADING_BATCH_SIZE = int(os.environ.get("STUDY_GRADING_BATCH_SIZE", 10))
+
+BATCH_ITEMS_MARKER = "ITENS (JSON):"
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def chunked(items, size):
+    """Divide a lista em grupos de no máximo `size` itens."""
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def build_batch_prompt(items):
+    """Prompt de correção para vários itens ({id, question, reference, answer})."""
+    payload = [
+        {
+            "id": str(item["id"]),
+            "pergunta": str(item["question"]),
+            "gabarito": str(item["reference"]),
+            "resposta": str(item["answer"]),
+        }
+        for item in items
+    ]
+    return (
+        "Atue como um medidor de desempenho. Para cada item abaixo, compare a "
+        "resposta com o gabarito, dê uma nota de 0 a 100 baseada na aderência e "
+        "um feedback curto (1-2 frases) sobre como o candidato se saiu.\n\n"
+        f"{BATCH_ITEMS_MARKER}\n{json.dumps(payload, ensure_ascii=False)}\n\n"
+        "Formato OBRIGATÓRIO de saída: apenas um objeto JSON\n"
+        '{"resultados": [{"id": "<id do item>", "nota": <0-100>, "feedback": "<texto>"}]}\n'
+        "com exatamente um resultado por item, na mesma ordem."
+    )
+
+
+def extract_batch_items(prompt):
+    """Lê de volta os itens embutidos no prompt (usado pelo servidor falso)."""
+    if BATCH_ITEMS_MARKER not in prompt:
+        return None
+    tail = prompt.split(BATCH_ITEMS_MARKER, 1)[1].strip()
+    try:
+        return json.JSONDecoder().raw_decode(tail)[0]
+    except ValueError:
+        return None
+
+
+def parse_batch_response(content, ids):
+    """Converte a saída do modelo em {id: (nota, feedback)}.
+
+    Itens ausentes ou malformados ficam de fora; quem chama decide se tenta
+    de novo. Um id repetido vale pela primeira ocorrência. Aceita a resposta
+    envolta em ```json ... ```.
+    """
+    wanted = {str(i) for i in ids}
+    match = _JSON_OBJECT.search(content or "")
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+
+    entries = data.get("resultados") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return {}
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.get("id", ""))
+        if item_id not in wanted or item_id in results:
+            continue
+        try:
+            score = int(round(float(entry.get("nota"))))
+        except (TypeError, ValueError, OverflowError):
+            continue
+        feedback = str(entry.get("feedback") or "Sem feedback.")
+        results[item_id] = (max(0, min(100, score)), feedback)
+    return results
+
+
+def suggest_result(score):
+    """Mesmo corte da correção individual: 80+ acertou, 50+ pode melhorar."""
+    if score >= 80:
+        return "Acertei"
+    if score >= 50:
+        return "Posso melhorar"
+    return "Errei"
@@ -0,0 +1,105 @@
+"""Disjuntor para chamadas externas (IA).
+
+Depois de `failure_threshold` falhas seguidas o disjuntor abre e as chamadas
+são recusadas na hora durante `cooldown_seconds`; quem chama usa a
+alternativa local. Passado o tempo, uma única chamada de teste é liberada:
+se der certo o disjuntor fecha, se falhar abre de novo.
+"""
+import threading
+import time
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio-aberto"
+
+
+class CircuitBreaker:
+    """Estado de um serviço: falhas seguidas, abertura e tempo de espera."""
+
+    def __init__(self, name, failure_threshold=3, cooldown_seconds=60.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return FECHADO
+        if self._clock() - self._opened_at >= self.cooldown_seconds:
+            return MEIO_ABERTO
+        return ABERTO
+
+    def allow(self):
+        """True se a chamada pode seguir; False se o serviço está em espera."""
+        with self._lock:
+            state = self._state()
+            if state == FECHADO:
+                self.stats["calls"] += 1
+                return True
+            if state == MEIO_ABERTO and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self.stats["calls"] += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self.stats["failures"] += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    def retry_in(self):
+        """Segundos até a próxima chamada de teste (0 se fechado)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (self._clock() - self._opened_at))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "serviço": self.name,
+                "estado": self._state(),
+                "falhas_seguidas": self._failures,
+                "chamadas": self.stats["calls"],
+                "falhas": self.stats["failures"],
+                "recusadas": self.stats["rejected"],
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **kwargs):
+    """Disjuntor único por nome no processo (criado na primeira chamada)."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def breaker_states():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [b.snapshot() for b in breakers]
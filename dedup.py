@@ -0,0 +1,156 @@
+"""Questões quase duplicadas entre abas e disciplinas (MinHash + LSH).
+
+Cada questão vira um conjunto de shingles (trechos de SHINGLE_SIZE
+caracteres do texto normalizado de Pergunta + Resposta) e uma assinatura
+MinHash de NUM_PERM valores. O LSH divide a assinatura em faixas: só
+questões que coincidem numa faixa inteira viram candidatas, o que evita a
+comparação de todos os pares. As candidatas são conferidas pela
+semelhança estimada (fração de valores iguais na assinatura) e agrupadas.
+"""
+import os
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from local_grader import normalize
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+# Semelhança de Jaccard (0-1) a partir da qual duas questões são duplicadas
+THRESHOLD = float(os.environ.get("STUDY_DEDUP_THRESHOLD", 0.7))
+
+CHUNK_SHINGLES = 50_000  # Shingles processados por vez no cálculo das assinaturas
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Trechos de k caracteres do texto normalizado."""
+    text = normalize(text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def choose_bands(num_perm, threshold):
+    """(faixas, linhas por faixa) com limiar do LSH logo abaixo do pedido.
+
+    O limiar aproximado é (1/faixas) ** (1/linhas); ficar abaixo dele troca
+    algumas candidatas a mais (descartadas na conferência) por não perder pares.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """Assinaturas MinHash com NUM_PERM funções (a·x + b) >> 32 (multiply-shift).
+
+    Os shingles viram inteiros de 32 bits por crc32 (estável entre processos)
+    e as assinaturas de várias questões são calculadas juntas, em blocos de
+    CHUNK_SHINGLES, com np.minimum.reduceat.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets):
+        """Matriz (questões × NUM_PERM); os conjuntos não podem ser vazios."""
+        out = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+        start = 0
+        while start < len(shingle_sets):
+            end, size = start, 0
+            while end < len(shingle_sets) and (end == start or size + len(shingle_sets[end]) <= CHUNK_SHINGLES):
+                size += len(shingle_sets[end])
+                end += 1
+            group = shingle_sets[start:end]
+            hashes = np.fromiter(
+                (zlib.crc32(s.encode("utf-8")) for shingle_set in group for s in shingle_set),
+                dtype=np.uint64, count=size,
+            )
+            offsets = np.cumsum([0] + [len(shingle_set) for shingle_set in group[:-1]])
+            values = (np.outer(self._a, hashes) + self._b[:, None]) >> np.uint64(32)
+            out[start:end] = np.minimum.reduceat(values, offsets, axis=1).T
+            start = end
+        return out
+
+
+def _shared_buckets(band):
+    """Grupos de questões (índices) com a faixa idêntica; ignora as sozinhas."""
+    keys = np.ascontiguousarray(band).view(np.dtype((np.void, band.shape[1] * band.itemsize))).ravel()
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    shared = np.nonzero(counts[inverse] > 1)[0]
+    if not len(shared):
+        return []
+    shared = shared[np.argsort(inverse[shared], kind="stable")]
+    cuts = np.nonzero(np.diff(inverse[shared]))[0] + 1
+    return [members.tolist() for members in np.split(shared, cuts)]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_clusters(records, threshold=THRESHOLD, num_perm=NUM_PERM):
+    """Agrupa as questões quase duplicadas.
+
+    records são dicts com 'Pergunta' e 'Resposta' mais os campos de origem
+    (disciplina, aba, linha...), que são devolvidos como vieram. Devolve uma
+    lista de grupos (maiores primeiro); cada grupo é uma lista de
+    (registro, semelhança com o primeiro do grupo).
+    """
+    kept, shingle_sets = [], []
+    for record in records:
+        shingle_set = shingles(f"{record.get('Pergunta', '')} {record.get('Resposta', '')}")
+        if shingle_set:
+            kept.append(record)
+            shingle_sets.append(shingle_set)
+    if len(kept) < 2:
+        return []
+    signatures = MinHasher(num_perm).signatures(shingle_sets)
+
+    bands, rows = choose_bands(num_perm, threshold)
+    parent = list(range(len(kept)))
+    for band in range(bands):
+        for members in _shared_buckets(signatures[:, band * rows:(band + 1) * rows]):
+            # Liga cada membro ao primeiro do balde: custo linear mesmo em baldes grandes
+            head = members[0]
+            for other in members[1:]:
+                if _find(parent, head) == _find(parent, other):
+                    continue
+                if np.mean(signatures[head] == signatures[other]) >= threshold:
+                    parent[_find(parent, other)] = _find(parent, head)
+
+    groups = defaultdict(list)
+    for i in range(len(kept)):
+        groups[_find(parent, i)].append(i)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        first = signatures[members[0]]
+        clusters.append([
+            (kept[i], round(float(np.mean(signatures[i] == first)), 3)) for i in members
+        ])
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+def records_from_frame(df, **origin):
+    """Registros de uma aba para find_clusters, com a linha da planilha (cabeçalho = 1)."""
+    columns = [c for c in ('Assunto', 'Pergunta', 'Resposta') if c in df.columns]
+    return [
+        dict(origin, linha=row_idx + 2, **{c: str(v) for c, v in zip(columns, values)})
+        for row_idx, values in enumerate(df[columns].itertuples(index=False, name=None))
+    ]
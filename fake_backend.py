@@ -0,0 +1,296 @@
+"""Backend local que imita o subconjunto do gspread usado pelo app.
+
+Serve para testes, benchmarks e desenvolvimento sem credenciais do Google:
+as planilhas ficam no modelo em memória de sheet_model.py e é possível
+injetar latência e limite de cota por minuto para simular o serviço real.
+
+Ative no app com STUDY_BACKEND=fake (opcionalmente STUDY_FAKE_DATA=<json>).
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from sheet_model import (
+    DRIVE_FILES_URL, SheetAPIError, SheetBackend, SpreadsheetNotFound, WorksheetNotFound,
+    apply_write, extract_id_from_url,
+)
+
+FakeAPIError = SheetAPIError
+
+
+class FakeBackend(SheetBackend):
+    """Modelo em memória (sheet_model.py) com latência e cota por minuto simuladas."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, quota_per_minute=None):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.quota_per_minute = quota_per_minute
+        self._window = deque()
+
+    def api_call(self, method):
+        """Aplica cota e latência de uma chamada; levanta 429 se passar do limite."""
+        super().api_call(method)
+        with self._lock:
+            now = time.monotonic()
+            if self.quota_per_minute is not None:
+                while self._window and now - self._window[0] > 60:
+                    self._window.popleft()
+                if len(self._window) >= self.quota_per_minute:
+                    self.stats["quota_errors"] += 1
+                    raise FakeAPIError(429, "Quota exceeded for quota metric 'Read requests' (simulado)")
+                self._window.append(now)
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+# --- DADOS DE DEMONSTRAÇÃO ---
+CONTENT_HEADERS = ['Assunto', 'Pergunta', 'Resposta', 'Resultado', 'Data', 'Minha_Resposta']
+TRILHA_HEADERS = ['ID', 'Descrição', 'Disciplina', 'Status', 'Data', 'Tempo']
+
+
+def seed_demo(backend, content_urls, trilha_url, tabs_per_sheet=3, rows_per_tab=40, seed=7):
+    """Cria planilhas de exemplo para cada URL (conteúdo) e a da Trilha."""
+    rng = random.Random(seed)
+    statuses = ["", "", "Acertei", "Errei", "Posso melhorar"]
+    for sheet_no, url in enumerate(content_urls, start=1):
+        sheet = backend.create_spreadsheet(extract_id_from_url(url), f"Disciplina {sheet_no}")
+        for tab_no in range(1, tabs_per_sheet + 1):
+            rows = [list(CONTENT_HEADERS)]
+            for i in range(1, rows_per_tab + 1):
+                status = rng.choice(statuses)
+                rows.append([
+                    f"Assunto {tab_no}.{(i - 1) // 10 + 1}",
+                    f"Pergunta {sheet_no}.{tab_no}.{i}: explique o conceito número {i} do tema {tab_no}?",
+                    f"O conceito {i} do tema {tab_no} trata de definição, contexto histórico e exemplos.",
+                    status,
+                    f"2024-12-{rng.randint(1, 28):02d} 10:00:00" if status else "",
+                    "",
+                ])
+            sheet.add(f"Tema {tab_no}", rows)
+
+    trilha = backend.create_spreadsheet(extract_id_from_url(trilha_url), "Trilha")
+    rows = [list(TRILHA_HEADERS)]
+    for i in range(1, 11):
+        rows.append([i, f"Missão de revisão {i}", "Direito", "sim" if i <= 3 else "não", "", ""])
+    trilha.add("Trilha", rows)
+    trilha.add("Log_Estudos", [['Data', 'Disciplina', 'Minutos']])
+    return backend
+
+
+_default_lock = threading.Lock()
+_default_backend = None
+
+
+def get_default_backend(content_urls=(), trilha_url=None, data_path=None, **kwargs):
+    """Backend único por processo: carregado de JSON ou com dados de demonstração."""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            if data_path:
+                _default_backend = FakeBackend.from_json(data_path, **kwargs)
+            else:
+                _default_backend = seed_demo(FakeBackend(**kwargs), content_urls, trilha_url)
+        return _default_backend
+
+
+def backend_from_env(content_urls=(), trilha_url=None):
+    """Configura o backend padrão pelas variáveis STUDY_FAKE_*."""
+    return get_default_backend(
+        content_urls,
+        trilha_url,
+        data_path=os.environ.get("STUDY_FAKE_DATA") or None,
+        latency_ms=float(os.environ.get("STUDY_FAKE_LATENCY_MS", 0)),
+        jitter_ms=float(os.environ.get("STUDY_FAKE_JITTER_MS", 0)),
+        quota_per_minute=int(os.environ["STUDY_FAKE_QUOTA"]) if os.environ.get("STUDY_FAKE_QUOTA") else None,
+    )
+
+
+# --- SERVIDOR DE MODELO FALSO (OpenAI) ---
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text):
+    return {w for w in _WORD.findall(str(text).lower()) if len(w) > 2}
+
+
+def fake_grade(answer, reference):
+    """Nota determinística: fração das palavras do gabarito presentes na resposta."""
+    ref = _tokens(reference)
+    if not ref or not str(answer).strip():
+        return 0, "Resposta vazia."
+    score = round(100 * len(ref & _tokens(answer)) / len(ref))
+    return score, f"Cobriu {score}% dos termos do gabarito (simulado)."
+
+
+class FakeModelServer:
+    """Servidor HTTP local com os endpoints da OpenAI usados pelo app.
+
+    Atende /v1/chat/completions (correção individual e em lote) e
+    /v1/responses (consultor). Cada pedido custa `latency_ms` mais `item_ms`
+    por item do lote, o que permite comparar a correção em lote com a
+    individual sem gastar com a API real. `fail_rate` (0 a 1) devolve erro
+    500 numa fração dos pedidos, para exercitar o disjuntor e a nota local.
+    """
+
+    def __init__(self, latency_ms=300.0, item_ms=20.0, fail_rate=0.0, host="127.0.0.1", port=0):
+        from http.server import ThreadingHTTPServer
+
+        self.latency_ms = latency_ms
+        self.item_ms = item_ms
+        self.fail_rate = fail_rate
+        self.stats = {"requests": 0, "items": 0, "errors": 0, "by_path": {}}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _model_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, name="fake-model-server", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, path, items):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["items"] += items
+            self.stats["by_path"][path] = self.stats["by_path"].get(path, 0) + 1
+        delay = self.latency_ms + self.item_ms * items
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self):
+        if self.fail_rate and random.random() < self.fail_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            return True
+        return False
+
+    def chat_completion(self, prompt):
+        """Texto de saída para um prompt de correção (lote ou individual)."""
+        from batch_grading import extract_batch_items
+
+        items = extract_batch_items(prompt)
+        if items is not None:
+            self._count("/chat/completions", len(items))
+            results = []
+            for item in items:
+                score, feedback = fake_grade(item.get("resposta", ""), item.get("gabarito", ""))
+                results.append({"id": item.get("id"), "nota": score, "feedback": feedback})
+            return json.dumps({"resultados": results}, ensure_ascii=False)
+
+        self._count("/chat/completions", 1)
+        reference = re.search(r"GABARITO:(.*?)RESPOSTA:", prompt, re.DOTALL)
+        answer = re.search(r"RESPOSTA:(.*?)Tarefa:", prompt, re.DOTALL)
+        score, feedback = fake_grade(
+            answer.group(1).strip() if answer else "",
+            reference.group(1).strip() if reference else "",
+        )
+        return f"NOTA: {score}\nFEEDBACK: {feedback}"
+
+    def response_text(self, question):
+        self._count("/responses", 1)
+        return f"Resposta simulada para: {str(question)[:200]}"
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency_ms=float(os.environ.get("STUDY_FAKE_AI_LATENCY_MS", 300)),
+            item_ms=float(os.environ.get("STUDY_FAKE_AI_ITEM_MS", 20)),
+            fail_rate=float(os.environ.get("STUDY_FAKE_AI_FAIL_RATE", 0)),
+        )
+
+
+def _model_handler(server):
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            try:
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # O cliente desistiu (prazo estourado)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": {"message": "JSON inválido"}})
+            model = request.get("model", "fake")
+            if server.should_fail():
+                return self._reply(500, {"error": {"message": "Falha simulada", "type": "server_error"}})
+
+            if self.path.endswith("/chat/completions"):
+                prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+                content = server.chat_completion(prompt)
+                return self._reply(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (len(prompt) + len(content)) // 4},
+                })
+
+            if self.path.endswith("/responses"):
+                messages = request.get("input", [])
+                question = ""
+                if isinstance(messages, list) and messages:
+                    content = messages[-1].get("content", "")
+                    if isinstance(content, list):
+                        question = " ".join(str(c.get("text", "")) for c in content)
+                    else:
+                        question = str(content)
+                text = server.response_text(question)
+                return self._reply(200, {
+                    "id": "resp_fake",
+                    "object": "response",
+                    "created_at": int(time.time()),
+                    "model": model,
+                    "status": "completed",
+                    "output": [{
+                        "type": "message",
+                        "id": "msg_fake",
+                        "role": "assistant",
+                        "status": "completed",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}],
+                    }],
+                    "parallel_tool_calls": False,
+                    "tool_choice": "auto",
+                    "tools": [],
+                })
+
+            return self._reply(404, {"error": {"message": f"Endpoint não simulado: {self.path}"}})
+
+    return Handler
@@ -1,59 +1,228 @@
 import os
+import threading
+import time
+from datetime import datetime, timezone
+
 import requests
 import gspread
 from google.oauth2.credentials import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.file',
+    'https://www.googleapis.com/auth/drive.appdata',
+    'https://www.googleapis.com/auth/spreadsheets.readonly'
+]
 
-def get_access_token():
-    """Get access token from Replit connector."""
-    hostname = os.environ.get('REPLIT_CONNECTORS_HOSTNAME')
-    
+CONNECT_TIMEOUT = 3.05      # seconds to open the connection to the connector
+READ_TIMEOUT = 10           # seconds to wait for its answer
+DEFAULT_TOKEN_TTL = 50 * 60 # used when the connector does not report an expiry
+REFRESH_MARGIN = 5 * 60     # refresh this long before the token expires
+RETRY_DELAY = 30            # wait after a failed background refresh
+MAX_RETRY_DELAY = 5 * 60    # cap for the backoff on tokens that arrive near expiry
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Pooled session for the connectors endpoint (keep-alive, retries on 5xx)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=2, backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({'GET'}),
+            )
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+            session.headers['Accept'] = 'application/json'
+            _session = session
+        return _session
+
+
+def _replit_token():
     repl_identity = os.environ.get('REPL_IDENTITY')
     web_repl_renewal = os.environ.get('WEB_REPL_RENEWAL')
-    
+
     if repl_identity:
-        x_replit_token = f'repl {repl_identity}'
-    elif web_repl_renewal:
-        x_replit_token = f'depl {web_repl_renewal}'
-    else:
-        raise Exception('X_REPLIT_TOKEN not found for repl/depl')
-    
-    response = requests.get(
-        f'https://{hostname}/api/v2/connection?include_secrets=true&connector_names=google-sheet',
-        headers={
-            'Accept': 'application/json',
-            'X_REPLIT_TOKEN': x_replit_token
-        }
+        return f'repl {repl_identity}'
+    if web_repl_renewal:
+        return f'depl {web_repl_renewal}'
+    raise Exception('X_REPLIT_TOKEN not found for repl/depl')
+
+
+def _parse_expiry(settings):
+    """Expiry of the token as a UTC timestamp (DEFAULT_TOKEN_TTL if not reported)."""
+    credentials = settings.get('oauth', {}).get('credentials', {})
+    expires_at = settings.get('expires_at') or credentials.get('expires_at')
+    if isinstance(expires_at, (int, float)):
+        return expires_at / 1000 if expires_at > 1e12 else float(expires_at)
+    if expires_at:
+        try:
+            parsed = datetime.fromisoformat(str(expires_at).replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+        except ValueError:
+            pass
+    expires_in = credentials.get('expires_in') or settings.get('expires_in')
+    if expires_in:
+        return time.time() + float(expires_in)
+    return time.time() + DEFAULT_TOKEN_TTL
+
+
+def fetch_access_token():
+    """Fetch a token from the Replit connector; returns (token, expires_at)."""
+    hostname = os.environ.get('REPLIT_CONNECTORS_HOSTNAME')
+
+    response = get_http_session().get(
+        f'https://{hostname}/api/v2/connection',
+        params={'include_secrets': 'true', 'connector_names': 'google-sheet'},
+        headers={'X_REPLIT_TOKEN': _replit_token()},
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
     )
-    
+    response.raise_for_status()
+
     data = response.json()
     connection_settings = data.get('items', [{}])[0] if data.get('items') else None
-    
+
     if not connection_settings:
         raise Exception('Google Sheet not connected')
-    
+
     settings = connection_settings.get('settings', {})
     access_token = settings.get('access_token') or settings.get('oauth', {}).get('credentials', {}).get('access_token')
-    
+
     if not access_token:
         raise Exception('Google Sheet access token not found')
-    
-    return access_token
+
+    return access_token, _parse_expiry(settings)
+
+
+class TokenCache:
+    """Access token kept in memory until shortly before it expires.
+
+    The first get() fetches it (blocking, bounded by the timeouts); after
+    that a daemon thread refreshes it REFRESH_MARGIN ahead of the expiry, so
+    callers never wait for the connector while the current token is valid.
+    """
+
+    def __init__(self, fetch=fetch_access_token, margin=REFRESH_MARGIN):
+        self._fetch = fetch
+        self.margin = margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._thread = None
+        self.stats = {'fetches': 0, 'background_refreshes': 0, 'failures': 0, 'short_lived': 0}
+
+    def _fresh(self, now=None):
+        return self._token is not None and (now or time.time()) < self._expires_at - self.margin
+
+    def peek(self):
+        """Current token if still outside the margin, else None (never fetches)."""
+        with self._lock:
+            return self._token if self._fresh() else None
+
+    def get(self):
+        """Current token; only fetches when there is none or it has expired."""
+        with self._lock:
+            if self._fresh():
+                return self._token
+            if self._token is not None and time.time() < self._expires_at:
+                # Still valid, inside the margin: the refresher is on its way
+                self._start_refresher()
+                return self._token
+        self.refresh()
+        with self._lock:
+            return self._token
+
+    @property
+    def expiry(self):
+        """Expiry as a naive UTC datetime (the format google.auth expects)."""
+        with self._lock:
+            return datetime.fromtimestamp(self._expires_at, timezone.utc).replace(tzinfo=None)
+
+    def refresh(self, force=False):
+        """Fetch a new token; concurrent callers share a single request."""
+        with self._fetch_lock:
+            with self._lock:
+                if not force and self._fresh():
+                    return
+            token, expires_at = self._fetch()
+            with self._lock:
+                self._token, self._expires_at = token, expires_at
+                self.stats['fetches'] += 1
+                self._start_refresher()
+
+    def _start_refresher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._refresh_loop, name='token-refresher', daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        backoff = RETRY_DELAY
+        while True:
+            with self._lock:
+                wait = self._expires_at - self.margin - time.time()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                self.refresh(force=True)
+            except Exception:
+                with self._lock:
+                    self.stats['failures'] += 1
+                time.sleep(RETRY_DELAY)
+                continue
+            with self._lock:
+                self.stats['background_refreshes'] += 1
+                near_expiry = self._expires_at - self.margin <= time.time()
+                if near_expiry:
+                    self.stats['short_lived'] += 1
+            if near_expiry:
+                # The connector handed out a token that is already inside the
+                # margin: wait instead of asking again right away, longer each time
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RETRY_DELAY)
+            else:
+                backoff = RETRY_DELAY
+
+
+_token_cache = TokenCache()
+
+
+class ConnectorCredentials(Credentials):
+    """OAuth credentials whose refresh reads the shared token cache."""
+
+    def __init__(self, cache=None, scopes=SCOPES):
+        cache = cache or _token_cache
+        # No connector call here: without a cached token google-auth sees the
+        # credentials as invalid and calls refresh() on the first request
+        super().__init__(token=cache.peek(), scopes=scopes)
+        self._cache = cache
+        self.expiry = cache.expiry if self.token else None
+
+    def refresh(self, request):
+        self.token = self._cache.get()
+        self.expiry = self._cache.expiry
+
+
+def get_access_token():
+    """Get access token from Replit connector (cached until shortly before it expires)."""
+    return _token_cache.get()
 
 
 def get_gspread_client():
     """Get gspread client using Replit connector authentication."""
-    access_token = get_access_token()
-    
-    credentials = Credentials(
-        token=access_token,
-        scopes=[
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive.file',
-            'https://www.googleapis.com/auth/drive.appdata',
-            'https://www.googleapis.com/auth/spreadsheets.readonly'
-        ]
-    )
-    
+    # Building the client makes no network call; the token is fetched on the
+    # first request and renewed from the cache by the credentials themselves,
+    # so the client can be kept for the lifetime of the process
+    credentials = ConnectorCredentials(_token_cache, SCOPES)
+
     client = gspread.authorize(credentials)
     return client
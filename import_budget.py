@@ -0,0 +1,74 @@
+"""Mede o tempo de import do app.py e compara com o orçamento de cold start.
+
+Roda `python -X importtime -c "import app"` num processo novo (como um
+container recém-criado) e falha se o import passar do orçamento ou se algum
+módulo pesado for carregado antes de ser necessário.
+
+Uso:
+    python import_budget.py [--budget-ms 2500] [--top 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 2500))
+
+# Só podem ser importados quando a funcionalidade correspondente é usada
+DEFERRED_MODULES = ("matplotlib", "openai", "thefuzz", "oauth2client", "gspread")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module="app"):
+    """Importa o módulo num processo limpo e devolve [(nome, self_us, cumulative_us, nível)]."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=here,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    entries = measure(args.module)
+    total_ms = sum(cum for _, _, cum, level in entries if level == 0) / 1000
+    top_level = sorted((e for e in entries if e[3] == 0), key=lambda e: e[2], reverse=True)
+
+    print(f"Import de '{args.module}': {total_ms:.0f} ms (orçamento {args.budget_ms:.0f} ms)")
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    imported = {name.split(".")[0] for name, _, _, _ in entries}
+    eager = sorted(m for m in DEFERRED_MODULES if m in imported)
+
+    ok = True
+    if eager:
+        print(f"ERRO: módulos que deveriam ser adiados foram importados: {', '.join(eager)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print(f"ERRO: orçamento de import estourado em {total_ms - args.budget_ms:.0f} ms")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
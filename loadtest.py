@@ -0,0 +1,358 @@
+"""Teste de carga: N sessões simultâneas contra os backends falsos.
+
+Cada sessão é um AppTest do Streamlit rodando o app.py inteiro numa thread
+própria, no mesmo processo (caches, backend falso e gravador em segundo
+plano são compartilhados, como num contêiner de verdade). As sessões
+seguem o roteiro de um aluno: escolhem disciplina e tema, respondem e
+registram questões (com correção), usam o cronômetro e o timer de foco e
+concluem missões da Trilha.
+
+Cada rerun é cronometrado; o relatório traz vazão, p50/p95/p99 por etapa,
+erros do app e a taxa de erros de cota do Sheets falso.
+
+    python loadtest.py --sessions 8 --rounds 3 --latency-ms 80 --quota 300
+    python main.py loadtest --sessions 8    # o mesmo, pela CLI
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+RESULTS = ("✅ Acertei", "⚠️ Posso melhorar", "❌ Errei")
+GRADE_FEEDBACK = "**Insuficiente.**"  # st.error da nota baixa: resultado da correção, não falha
+
+
+def percentile(values, pct):
+    """Percentil por posição mais próxima (valores já ordenados)."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+class SessionError(Exception):
+    """Falha da sessão simulada (botão ausente, exceção no app)."""
+
+
+# --- SESSÃO SIMULADA ---
+class SimulatedSession:
+    """Um aluno: um AppTest e um roteiro com escolhas aleatórias (semente própria)."""
+
+    def __init__(self, number, report, rounds, think_ms, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.report = report
+        self.rounds = rounds
+        self.think_ms = think_ms
+        self.rng = random.Random(number)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def run(self, step):
+        """Um rerun cronometrado; exceções e st.error vão para o relatório."""
+        if self.think_ms:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_ms / 1000)
+        t0 = time.perf_counter()
+        try:
+            self.at.run()
+        except Exception as exc:  # Timeout do AppTest
+            self.report.record(step, (time.perf_counter() - t0) * 1000, exception=str(exc))
+            raise SessionError(f"{step}: {exc}") from exc
+        exception = "; ".join(e.message for e in self.at.exception)
+        self.report.record(
+            step, (time.perf_counter() - t0) * 1000,
+            exception=exception,
+            errors=[e.value for e in self.at.error if not e.value.startswith(GRADE_FEEDBACK)],
+        )
+        if exception:
+            raise SessionError(f"{step}: {exception}")
+
+    def click(self, label, step):
+        for button in self.at.button:
+            if button.label == label and not button.disabled:
+                button.click()
+                self.run(step)
+                return True
+        return False
+
+    def widget(self, kind, key):
+        """Elemento pela chave, ou None se a tela não o mostrou (ex.: aba que falhou ao carregar)."""
+        try:
+            return getattr(self.at, kind)(key=key)
+        except KeyError:
+            self.report.count(f"sem_{key}")
+            return None
+
+    def choose(self, key, step, options=None):
+        box = self.widget("selectbox", key)
+        if box is None:
+            return None
+        choice = self.rng.choice(options or box.options)
+        if choice != box.value:
+            box.select(choice)
+            self.run(step)
+        return choice
+
+    def answer_question(self):
+        answer = self.widget("text_area", "answer_input")
+        if answer is None:
+            return False
+        if not answer.disabled:
+            words = ["conceito", "definição", "exemplo", "tema", "aplicação", "regra"]
+            answer.input(" ".join(self.rng.sample(words, 4)))
+        if not self.click("Verificar Resposta", "corrigir"):
+            return False
+        if self.at.session_state["grading_tier"] == "reserva":
+            self.report.count("correção_reserva")
+        self.report.count("correções")
+        return self.click(self.rng.choice(RESULTS), "registrar")
+
+    def use_timers(self):
+        if self.click("▶️ Iniciar", "cronômetro"):
+            self.click("⏹️ Parar", "cronômetro")
+        if self.click("▶️ Iniciar Foco", "timer_foco"):
+            self.click("⏹️ Pausar Timer", "timer_foco")
+
+    def flow(self):
+        self.run("abrir")
+        for _ in range(self.rounds):
+            self.choose("disciplina_select", "disciplina")
+            box = self.widget("selectbox", "tema_select")
+            if box is not None:
+                # "Todos" é o mais pesado: entra numa rodada em cada quatro
+                temas = [t for t in box.options if t != "Todos"] or box.options
+                self.choose("tema_select", "tema", ["Todos"] if self.rng.random() < 0.25 else temas)
+                for _ in range(self.rng.randint(2, 4)):
+                    if not self.answer_question():
+                        break
+            self.use_timers()
+            if self.rng.random() < 0.5 and self.click("✅ Concluir Missão", "missão"):
+                self.report.count("missões")
+
+    def __call__(self):
+        try:
+            self.flow()
+            self.report.count("sessões_ok")
+        except Exception as exc:  # SessionError ou elemento que não apareceu na tela
+            self.report.count("sessões_com_falha")
+            self.report.failures.append(f"sessão {self.number}: {type(exc).__name__}: {exc}")
+
+
+# --- RELATÓRIO ---
+class LoadReport:
+    """Tempos de rerun por etapa e contadores; seguro entre threads."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # etapa -> [ms]
+        self.counters = defaultdict(int)
+        self.error_messages = defaultdict(int)  # st.error mostrado -> vezes
+        self.failures = []
+        self._lock = threading.Lock()
+        self.started = self.finished = None
+
+    def record(self, step, elapsed_ms, exception="", errors=()):
+        with self._lock:
+            self.latencies[step].append(elapsed_ms)
+            self.counters["reruns"] += 1
+            if exception:
+                self.counters["exceções"] += 1
+            if errors:
+                self.counters["reruns_com_st_error"] += 1
+            for message in errors:
+                self.error_messages[message[:120]] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def summary(self, backend_stats=None):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        every = sorted(ms for values in self.latencies.values() for ms in values)
+        steps = {
+            step: {
+                "reruns": len(values),
+                "p50_ms": round(percentile(sorted(values), 50), 1),
+                "p95_ms": round(percentile(sorted(values), 95), 1),
+                "p99_ms": round(percentile(sorted(values), 99), 1),
+            }
+            for step, values in sorted(self.latencies.items())
+        }
+        result = {
+            "duração_s": round(elapsed, 2),
+            "reruns": len(every),
+            "reruns_por_s": round(len(every) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(every, 50), 1),
+            "p95_ms": round(percentile(every, 95), 1),
+            "p99_ms": round(percentile(every, 99), 1),
+            "etapas": steps,
+            "contadores": dict(self.counters),
+            "mensagens_de_erro": dict(sorted(self.error_messages.items(), key=lambda kv: -kv[1])[:10]),
+            "falhas": self.failures[:20],
+        }
+        if backend_stats is not None:
+            calls = backend_stats["calls"]
+            result["sheets"] = {
+                "chamadas": calls,
+                "erros_de_cota": backend_stats["quota_errors"],
+                "taxa_erros_de_cota": round(backend_stats["quota_errors"] / calls, 4) if calls else 0.0,
+            }
+        corrections = self.counters.get("correções", 0)
+        if corrections:
+            result["taxa_correção_reserva"] = round(self.counters.get("correção_reserva", 0) / corrections, 4)
+        return result
+
+
+def print_summary(summary, config):
+    print(f"[loadtest] {config['sessions']} sessões × {config['rounds']} rodadas; "
+          f"Sheets {config['latency_ms']:.0f} ms/chamada, cota {config['quota'] or 'sem limite'}/min; "
+          f"IA {config['ai_latency_ms']:.0f} ms, falhas {config['ai_fail_rate']:.0%}")
+    print(f"{'etapa':<14}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, row in summary["etapas"].items():
+        print(f"{step:<14}{row['reruns']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    print(f"{'total':<14}{summary['reruns']:>8}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}")
+    print(f"vazão: {summary['reruns_por_s']} reruns/s em {summary['duração_s']} s")
+    sheets = summary.get("sheets")
+    if sheets:
+        print(f"Sheets: {sheets['chamadas']} chamadas, {sheets['erros_de_cota']} erros de cota "
+              f"({sheets['taxa_erros_de_cota']:.2%})")
+    if "taxa_correção_reserva" in summary:
+        print(f"correções na reserva local (IA falhou): {summary['taxa_correção_reserva']:.2%}")
+    print("contadores:", ", ".join(f"{k}={v}" for k, v in sorted(summary["contadores"].items())))
+    registry_rows = [row for row in summary.get("planilhas", []) if row["consultas"]]
+    if registry_rows:
+        print(f"{'planilha':<24}{'ttl s':>7}{'consultas':>11}{'acertos':>9}{'sondagens':>11}{'mudanças':>10}")
+        for row in registry_rows:
+            print(f"{row['planilha']:<24}{row['ttl_s']:>7}{row['consultas']:>11}{row['taxa_acerto']:>9.0%}"
+                  f"{row['sondagens']:>11}{row['mudanças']:>10}")
+    for message, times in summary["mensagens_de_erro"].items():
+        print(f"  st.error ({times}x): {message}")
+    for failure in summary["falhas"]:
+        print("  falha:", failure)
+
+
+# --- EXECUÇÃO ---
+def share_apptest_runtime():
+    """Deixa várias sessões AppTest rodarem ao mesmo tempo no processo.
+
+    Cada AppTest.run instala um Runtime simulado em Runtime._instance e o
+    apaga ao terminar, o que derruba as outras threads no meio do rerun.
+    Aqui um único Runtime simulado fica instalado e cada run grava o seu numa
+    subclasse, sem tocar no global; global.appTest fica ligado o tempo todo
+    pelo mesmo motivo.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    class SessionRuntime(Runtime):
+        _instance = None
+
+    # O script compilado também é único, como no servidor (e o ast.parse do
+    # Python 3.11 não aguenta compilações simultâneas em threads)
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(APP_PATH)
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = shared
+    app_test.Runtime = SessionRuntime
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    config.set_option("global.appTest", True)
+
+
+def configure_environment(args):
+    """Backends falsos com latência e cota pedidas; dados locais descartáveis."""
+    workdir = tempfile.mkdtemp(prefix="estudo-load-")
+    os.environ.update({
+        "STUDY_BACKEND": "fake",
+        "STUDY_AI_BACKEND": "fake",
+        "STUDY_FAKE_LATENCY_MS": str(args.latency_ms),
+        "STUDY_FAKE_JITTER_MS": str(args.jitter_ms),
+        "STUDY_FAKE_AI_LATENCY_MS": str(args.ai_latency_ms),
+        "STUDY_FAKE_AI_FAIL_RATE": str(args.ai_fail_rate),
+        "STUDY_SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "STUDY_ANALYTICS_DB": os.path.join(workdir, "analytics.sqlite3"),
+    })
+    if args.quota:
+        os.environ["STUDY_FAKE_QUOTA"] = str(args.quota)
+    else:
+        os.environ.pop("STUDY_FAKE_QUOTA", None)
+    os.environ.pop("app_password", None)  # Sem tela de senha nas sessões simuladas
+    return workdir
+
+
+def run_load(args):
+    configure_environment(args)
+    import streamlit.logger
+    from streamlit import config
+
+    config.set_option("logger.level", "error")
+    streamlit.logger.set_log_level("error")
+    share_apptest_runtime()
+
+    report = LoadReport()
+    sessions = [
+        SimulatedSession(n, report, args.rounds, args.think_ms, args.timeout)
+        for n in range(args.sessions)
+    ]
+    threads = [threading.Thread(target=s, name=f"sessao-{s.number}", daemon=True) for s in sessions]
+    report.started = time.perf_counter()
+    for n, thread in enumerate(threads):
+        thread.start()
+        if args.ramp_s and n < len(threads) - 1:
+            time.sleep(args.ramp_s / len(threads))
+    for thread in threads:
+        thread.join()
+    report.finished = time.perf_counter()
+
+    import fake_backend  # Mesmo módulo que o app importou: o backend é o das sessões
+    import sheet_registry
+
+    backend = fake_backend._default_backend
+    summary = report.summary(backend.stats if backend is not None else None)
+    summary["planilhas"] = sheet_registry.get_registry().report()
+    return summary
+
+
+def add_arguments(parser):
+    parser.add_argument("--sessions", type=int, default=8, help="sessões simultâneas")
+    parser.add_argument("--rounds", type=int, default=3, help="rodadas do roteiro por sessão")
+    parser.add_argument("--think-ms", type=float, default=0, help="pausa média entre ações de cada sessão")
+    parser.add_argument("--ramp-s", type=float, default=0, help="espalha o início das sessões neste intervalo")
+    parser.add_argument("--latency-ms", type=float, default=80, help="latência de cada chamada ao Sheets falso")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="variação aleatória somada à latência")
+    parser.add_argument("--quota", type=int, default=0, help="chamadas por minuto ao Sheets falso (0 = sem limite)")
+    parser.add_argument("--ai-latency-ms", type=float, default=300, help="latência do modelo falso")
+    parser.add_argument("--ai-fail-rate", type=float, default=0.0, help="fração de respostas 500 do modelo falso")
+    parser.add_argument("--timeout", type=float, default=120, help="tempo máximo de cada rerun (s)")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava o relatório também em JSON")
+
+
+def main(args=None):
+    if not isinstance(args, argparse.Namespace):
+        parser = argparse.ArgumentParser(description="Teste de carga com sessões simuladas.")
+        add_arguments(parser)
+        args = parser.parse_args(args)
+    summary = run_load(args)
+    print_summary(summary, vars(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0 if not summary["contadores"].get("sessões_com_falha") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
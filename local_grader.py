@@ -0,0 +1,130 @@
+"""Correção local em camadas, antes de chamar o modelo.
+
+Os casos claros são decididos aqui, em microssegundos: a resposta vazia (ou
+curta demais) e a cópia quase literal do gabarito, com os mesmos números e
+as mesmas negações. O que sobra é ambíguo e
+segue para evaluate_answer_ai. Os limites vêm das variáveis STUDY_GRADER_*
+e cada decisão fica registrada por camada em tier_stats(). fallback_grade
+é a nota de reserva usada quando a IA falha ou está pausada.
+"""
+import os
+import re
+import threading
+import time
+
+# Abaixo de MIN_CHARS caracteres úteis a resposta é tratada como vazia
+MIN_CHARS = int(os.environ.get("STUDY_GRADER_MIN_CHARS", 3))
+# Semelhança (0-100, fuzz.ratio) a partir da qual a resposta é cópia do gabarito
+HIGH_THRESHOLD = int(os.environ.get("STUDY_GRADER_HIGH", 97))
+# Semelhança abaixo da qual a resposta é dada como errada; 0 desliga
+LOW_THRESHOLD = int(os.environ.get("STUDY_GRADER_LOW", 0))
+# A cópia precisa ter ao menos esta fração do tamanho do gabarito
+MIN_LENGTH_RATIO = float(os.environ.get("STUDY_GRADER_MIN_LENGTH_RATIO", 0.6))
+
+TIERS = ("vazia", "literal", "distante", "ia", "lote", "reserva")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_NUMBER = re.compile(r"\d+")
+# Uma palavra destas a mais ou a menos inverte o sentido da resposta
+NEGATIONS = frozenset({
+    "não", "nao", "nunca", "jamais", "nem", "nenhum", "nenhuma", "sem",
+    "not", "no", "never", "none", "ne", "pas",
+})
+_stats = {tier: {"count": 0, "total_ms": 0.0} for tier in TIERS}
+_stats_lock = threading.Lock()
+
+
+def normalize(text):
+    """Minúsculas, sem pontuação e com espaços simples."""
+    return " ".join(_WORD.findall(str(text).lower()))
+
+
+def same_facts(answer_norm, reference_norm):
+    """Mesmos números e mesmas negações nos dois textos normalizados."""
+    if sorted(_NUMBER.findall(answer_norm)) != sorted(_NUMBER.findall(reference_norm)):
+        return False
+    answer_neg = sorted(w for w in answer_norm.split() if w in NEGATIONS)
+    reference_neg = sorted(w for w in reference_norm.split() if w in NEGATIONS)
+    return answer_neg == reference_neg
+
+
+def local_grade(answer, reference, high=None, low=None, min_chars=None):
+    """Decide os casos claros localmente.
+
+    Devolve (camada, nota, feedback) ou None quando a resposta é ambígua e
+    deve ir para o modelo.
+    """
+    high = HIGH_THRESHOLD if high is None else high
+    low = LOW_THRESHOLD if low is None else low
+    min_chars = MIN_CHARS if min_chars is None else min_chars
+
+    answer_norm = normalize(answer)
+    if len(answer_norm.replace(" ", "")) < min_chars:
+        return "vazia", 0, "Resposta vazia ou curta demais para avaliar."
+
+    reference_norm = normalize(reference)
+    if not reference_norm:
+        return None
+
+    from thefuzz import fuzz
+
+    # Só a semelhança na ordem original: trocar termos de lugar muda o sentido
+    similarity = fuzz.ratio(answer_norm, reference_norm)
+    if (similarity >= high
+            and len(answer_norm) >= MIN_LENGTH_RATIO * len(reference_norm)
+            and same_facts(answer_norm, reference_norm)):
+        return "literal", similarity, "Resposta praticamente igual ao gabarito."
+    if low and fuzz.token_set_ratio(answer_norm, reference_norm) < low:
+        return "distante", 0, "Resposta sem relação com o gabarito."
+    return None
+
+
+def fallback_grade(answer, reference):
+    """Nota aproximada quando a IA está indisponível (camada "reserva").
+
+    Média entre a cobertura das palavras do gabarito e a semelhança
+    token_sort_ratio; serve de estimativa, não substitui a correção da IA.
+    """
+    answer_norm = normalize(answer)
+    reference_norm = normalize(reference)
+    if not answer_norm or not reference_norm:
+        return 0, "Nota provisória: resposta ou gabarito vazio."
+
+    from thefuzz import fuzz
+
+    reference_words = set(reference_norm.split())
+    coverage = 100 * len(reference_words & set(answer_norm.split())) / len(reference_words)
+    score = round((coverage + fuzz.token_sort_ratio(answer_norm, reference_norm)) / 2)
+    return max(0, min(100, score)), f"Nota provisória: cobre {coverage:.0f}% dos termos do gabarito."
+
+
+def record_tier(tier, latency_ms):
+    """Conta uma correção feita pela camada indicada."""
+    with _stats_lock:
+        entry = _stats.setdefault(tier, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += latency_ms
+
+
+def timed_local_grade(answer, reference):
+    """local_grade registrando o tempo gasto quando a camada local decide."""
+    t0 = time.perf_counter()
+    decision = local_grade(answer, reference)
+    if decision is not None:
+        record_tier(decision[0], (time.perf_counter() - t0) * 1000)
+    return decision
+
+
+def tier_stats():
+    """Uso de cada camada no processo: quantidade, fração e tempo médio."""
+    with _stats_lock:
+        total = sum(entry["count"] for entry in _stats.values())
+        return [
+            {
+                "camada": tier,
+                "correções": entry["count"],
+                "fração": round(entry["count"] / total, 3) if total else 0.0,
+                "média_ms": round(entry["total_ms"] / entry["count"], 3) if entry["count"] else 0.0,
+            }
+            for tier, entry in _stats.items()
+        ]
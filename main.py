@@ -1,6 +1,363 @@
-def main():
-    print("Hello from repl-nix-workspace!")
+"""Linha de comando para as tarefas pesadas, fora das requisições do app.
+
+Reaproveita a camada de dados do app.py, importado sem subir o servidor
+(Streamlit em modo bare), para rodar em cron ou no deploy:
+
+    python main.py sync                  # espelho SQLite das planilhas (modo worker)
+    python main.py prewarm               # snapshots locais + agregados de desempenho
+    python main.py export --out DIR      # snapshots em CSV (ou Parquet)
+    python main.py reindex               # recria agregados e relatório de duplicadas
+    python main.py benchmark             # cenários contra o backend falso
+    python main.py loadtest              # sessões simultâneas simuladas (loadtest.py)
+
+--fake (ou STUDY_BACKEND=fake) usa o backend local em vez do Google.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_LATENCY_MS = 50   # Latência simulada por chamada nos cenários
+BENCHMARK_WRITES = 20       # Resultados gravados nos cenários de gravação
+
+
+def load_app():
+    """Importa o app.py sem servidor; os avisos do modo bare ficam de fora."""
+    import streamlit.logger
+    from streamlit import config
+
+    config.set_option("logger.level", "error")
+    streamlit.logger.set_log_level("error")
+    # Tarefas avulsas não sobem o worker de sincronização (o `sync` é uma passada dele)
+    os.environ.setdefault("STUDY_SYNC_AUTOSTART", "0")
+    import app
+    return app
+
+
+def content_sheets(app):
+    return list(app.SHEETS_MAPPING.items())
+
+
+def log(message):
+    print(message, flush=True)
+
+
+# --- SYNC ---
+def cmd_sync(args):
+    """Uma passada do sync_worker: grava pendências e baixa o que mudou no Drive."""
+    import sync_worker
+
+    lock = sync_worker.acquire_worker_lock(args.db)
+    if lock is None:
+        log("[sync] o worker do app já sincroniza este espelho; nada a fazer")
+        return 0
+    app = load_app()
+    store = sync_worker.SyncStore(args.db)
+    for url in app.SHEETS_MAPPING.values():
+        store.register(url, "content")
+    store.register(app.TRILHA_SHEET_URL, "trilha")
+
+    worker = sync_worker.SyncWorker(
+        sync_worker.build_client(store), store, sync_worker.RateLimiter(args.rate)
+    )
+    t0 = time.perf_counter()
+    worker.refresh(force={sheet["spreadsheet_id"] for sheet in store.sheets()})
+    worker.drain()
+    log(f"[sync] {len(store.sheets())} planilhas em {time.perf_counter() - t0:.1f}s: {worker.stats}")
+    log(f"[sync] caixa de saída: {store.outbox_counts()}")
+    return 0 if not worker.stats["write_errors"] else 1
+
+
+# --- PREWARM ---
+def prewarm_content(app, disciplina, sheet_url):
+    """Sonda a planilha e passa por todas as abas (snapshot salvo se a versão for nova)."""
+    t0 = time.perf_counter()
+    version = app.get_sheet_version(sheet_url)  # Também tira a planilha do modo snapshot
+    titles = app.get_worksheet_titles(sheet_url)
+    rows = 0
+    for title in titles:
+        df = app.load_worksheet_data(sheet_url, title)
+        if df is None:
+            log(f"[prewarm] {disciplina} / {title}: falha ao carregar")
+            continue
+        rows += len(df)
+        app.sync_analytics(sheet_url, title, df)
+    log(f"[prewarm] {disciplina}: {len(titles)} abas, {rows} linhas, versão {version} "
+        f"({time.perf_counter() - t0:.1f}s)")
+    return version is not None
+
+
+def cmd_prewarm(args):
+    app = load_app()
+    ok = True
+    for disciplina, sheet_url in content_sheets(app):
+        if args.disciplina and disciplina not in args.disciplina:
+            continue
+        ok &= prewarm_content(app, disciplina, sheet_url)
+    if not args.disciplina:
+        t0 = time.perf_counter()
+        app.get_trilha_version()
+        trilha = app.get_trilha_data()
+        logs = app.get_study_logs()
+        log(f"[prewarm] Trilha: {len(trilha)} missões, {len(logs)} registros recentes "
+            f"({time.perf_counter() - t0:.1f}s)")
+    if not app.snapshots.available():
+        log("[prewarm] snapshots desativados (sem pyarrow ou STUDY_SNAPSHOTS=0): só os agregados foram atualizados")
+    return 0 if ok else 1
+
+
+# --- EXPORT ---
+def cmd_export(args):
+    """Copia os snapshots mais recentes para arquivos comuns, um por aba."""
+    app = load_app()
+    snapshots = app.snapshots
+    if not snapshots.available():
+        log("[export] snapshots indisponíveis (sem pyarrow ou STUDY_SNAPSHOTS=0)")
+        return 1
+
+    targets = []
+    for disciplina, sheet_url in content_sheets(app):
+        sid = app.spreadsheet_id_from_url(sheet_url)
+        found = snapshots.load_titles(sid)
+        targets += [(disciplina, sid, title) for title in (found[1] if found else [])]
+    trilha_id = app.spreadsheet_id_from_url(app.TRILHA_SHEET_URL)
+    targets += [("Trilha", trilha_id, "Trilha"), ("Trilha", trilha_id, "Log_Estudos")]
+
+    exported = 0
+    for folder, sid, title in targets:
+        found = snapshots.load_frame(sid, title)
+        if found is None:
+            log(f"[export] {folder} / {title}: sem snapshot (rode prewarm antes)")
+            continue
+        version, df = found
+        directory = os.path.join(args.out, folder)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{title}.{args.format}")
+        if args.format == "parquet":
+            df.astype({c: str for c in df.columns if df[c].dtype == object}).to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        exported += 1
+        log(f"[export] {path} ({len(df)} linhas, versão {version})")
+    log(f"[export] {exported} de {len(targets)} abas exportadas para {args.out}")
+    return 0 if exported else 1
+
+
+# --- REINDEX ---
+def cmd_reindex(args):
+    """Recria os agregados do zero e, se pedido, o relatório de duplicadas."""
+    app = load_app()
+    tabs, records = [], []
+    for disciplina, sheet_url in content_sheets(app):
+        version = app.current_sheet_version(sheet_url, app.get_sheet_version(sheet_url))
+        for title in app.get_worksheet_titles(sheet_url):
+            df = app.load_worksheet_data(sheet_url, title)
+            if df is None:
+                continue
+            tabs.append((disciplina, title, df, version))
+            if args.duplicates:
+                records.extend(app.records_from_frame(df, disciplina=disciplina, aba=title))
+
+    t0 = time.perf_counter()
+    changed = app.get_analytics_store().rebuild(tabs)
+    log(f"[reindex] agregados: {len(tabs)} abas, {changed} questões ({time.perf_counter() - t0:.1f}s)")
+
+    if args.duplicates:
+        import pandas as pd
+
+        t0 = time.perf_counter()
+        clusters = app.find_clusters(records, args.threshold)
+        rows = [
+            dict(Grupo=group, Semelhança=similarity, **record)
+            for group, cluster in enumerate(clusters, start=1)
+            for record, similarity in cluster
+        ]
+        os.makedirs(os.path.dirname(os.path.abspath(args.duplicates)), exist_ok=True)
+        pd.DataFrame(rows).to_csv(args.duplicates, index=False)
+        log(f"[reindex] duplicadas: {len(clusters)} grupos em {len(records)} questões "
+            f"({time.perf_counter() - t0:.1f}s) -> {args.duplicates}")
+    return 0
+
+
+# --- BENCHMARK ---
+# Cada cenário recebe o app e o backend falso e devolve um texto opcional;
+# o tempo e as chamadas ao "Google" são medidos em volta dele.
+def _first_sheet(app):
+    return next(iter(app.SHEETS_MAPPING.values()))
+
+
+def bench_cold_load(app, backend):
+    url = _first_sheet(app)
+    app.get_sheet_version(url)
+    titles = app.get_worksheet_titles(url)
+    for title in titles:
+        app.load_worksheet_data(url, title)
+    return f"{len(titles)} abas"
+
+
+def bench_warm_load(app, backend):
+    return bench_cold_load(app, backend)
+
+
+def bench_probe_unchanged(app, backend):
+    app.SHEET_REGISTRY.expire()
+    return bench_cold_load(app, backend)
+
+
+def bench_snapshot_start(app, backend):
+    """Reinício do processo: caches vazios, dados servidos do snapshot."""
+    app.st.cache_data.clear()
+    state = app.get_process_state()
+    state["probed_sheets"].clear()
+    state["snapshot_refresh_scheduled"].add(_first_sheet(app))  # Sem conferência em segundo plano
+    url = _first_sheet(app)
+    titles = app.get_worksheet_titles(url)
+    for title in titles:
+        app.load_worksheet_data(url, title)
+    state["probed_sheets"].add(url)
+    return f"{len(titles)} abas"
+
+
+def _bench_targets(app):
+    url = _first_sheet(app)
+    title = app.get_worksheet_titles(url)[0]
+    worksheet = app.get_gspread_client().open_by_url(url).worksheet(title)
+    return worksheet, [(row, "Acertei", time.strftime("%Y-%m-%d %H:%M:%S")) for row in range(BENCHMARK_WRITES)]
+
+
+def bench_single_writes(app, backend):
+    worksheet, updates = _bench_targets(app)
+    for row, resultado, data in updates:
+        app.write_result_cells(worksheet, row, resultado, data)
+    return f"{len(updates)} resultados"
+
+
+def bench_bulk_write(app, backend):
+    worksheet, updates = _bench_targets(app)
+    app.write_bulk_results(worksheet, updates)
+    return f"{len(updates)} resultados"
+
+
+def bench_reload_after_write(app, backend):
+    return bench_cold_load(app, backend)
+
+
+def bench_all_tabs(app, backend):
+    df, worksheets_map = app.load_all_worksheets_data(_first_sheet(app))
+    return f"{len(worksheets_map)} abas, {len(df)} linhas"
+
+
+def bench_duplicates(app, backend):
+    records = []
+    for disciplina, url in content_sheets(app):
+        app.get_sheet_version(url)
+        for title in app.get_worksheet_titles(url):
+            df = app.load_worksheet_data(url, title)
+            if df is not None:
+                records.extend(app.records_from_frame(df, disciplina=disciplina, aba=title))
+    clusters = app.find_clusters(records)
+    return f"{len(records)} questões, {len(clusters)} grupos"
+
+
+# Ordem importa: cada cenário parte do estado deixado pelo anterior
+BENCHMARKS = {
+    "partida_fria": bench_cold_load,
+    "cache_quente": bench_warm_load,
+    "sondagem_sem_mudanca": bench_probe_unchanged,
+    "partida_snapshot": bench_snapshot_start,
+    "gravacao_unitaria": bench_single_writes,
+    "gravacao_em_lote": bench_bulk_write,
+    "recarga_apos_gravacao": bench_reload_after_write,
+    "todos": bench_all_tabs,
+    "duplicadas": bench_duplicates,
+}
+
+
+def cmd_benchmark(args):
+    # Sempre contra o backend falso, com snapshots e agregados descartáveis
+    workdir = tempfile.mkdtemp(prefix="estudo-bench-")
+    os.environ.update({
+        "STUDY_BACKEND": "fake",
+        "STUDY_FAKE_LATENCY_MS": str(args.latency_ms),
+        "STUDY_SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "STUDY_ANALYTICS_DB": os.path.join(workdir, "analytics.sqlite3"),
+    })
+    app = load_app()
+    import fake_backend
+
+    app.get_gspread_client()
+    backend = fake_backend.get_default_backend()
+
+    selected = args.scenario or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        log(f"[benchmark] cenários desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(BENCHMARKS)})")
+        return 2
+
+    log(f"[benchmark] latência simulada {args.latency_ms:.0f} ms/chamada; dados em {workdir}")
+    log(f"{'cenário':<24}{'ms':>10}{'chamadas':>10}  detalhe")
+    for name in selected:
+        calls_before = backend.stats["calls"]
+        t0 = time.perf_counter()
+        detail = BENCHMARKS[name](app, backend)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        log(f"{name:<24}{elapsed_ms:>10.1f}{backend.stats['calls'] - calls_before:>10}  {detail or ''}")
+    return 0
+
+
+# --- LOADTEST ---
+def cmd_loadtest(args):
+    import loadtest
+
+    return loadtest.main(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tarefas de manutenção do app de estudo.")
+    parser.add_argument("--fake", action="store_true", help="usa o backend local (STUDY_BACKEND=fake)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    import dedup
+    import loadtest
+    import sync_worker
+
+    p = sub.add_parser("sync", help="espelho SQLite das planilhas (modo worker)")
+    p.add_argument("--db", default=sync_worker.DEFAULT_PATH, help="caminho do espelho SQLite")
+    p.add_argument("--rate", type=int, default=sync_worker.RATE_PER_MINUTE, help="pedidos ao Google por minuto")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("prewarm", help="snapshots locais e agregados de todas as abas")
+    p.add_argument("--disciplina", action="append", help="só esta disciplina (pode repetir)")
+    p.set_defaults(func=cmd_prewarm)
+
+    p = sub.add_parser("export", help="exporta os snapshots mais recentes")
+    p.add_argument("--out", default="export", help="diretório de saída")
+    p.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("reindex", help="recria os agregados (e o relatório de duplicadas)")
+    p.add_argument("--duplicates", metavar="CSV", help="grava o relatório de duplicadas neste arquivo")
+    p.add_argument("--threshold", type=float, default=dedup.THRESHOLD, help="semelhança mínima das duplicadas")
+    p.set_defaults(func=cmd_reindex)
+
+    p = sub.add_parser("benchmark", help="cenários de carga e gravação contra o backend falso")
+    p.add_argument("scenario", nargs="*", help=f"cenários (padrão: todos): {', '.join(BENCHMARKS)}")
+    p.add_argument("--latency-ms", type=float, default=BENCHMARK_LATENCY_MS)
+    p.set_defaults(func=cmd_benchmark)
+
+    p = sub.add_parser("loadtest", help="sessões simultâneas simuladas contra os backends falsos")
+    loadtest.add_arguments(p)
+    p.set_defaults(func=cmd_loadtest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.fake:
+        os.environ["STUDY_BACKEND"] = "fake"
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Orçamento de memória: registro LRU de dados carregados e medição do processo.
+
+LRUBudget guarda (chave -> tamanho em bytes, e opcionalmente o valor) na
+ordem de uso; quando o total passa do orçamento, os itens usados há mais
+tempo saem e on_evict é chamado com a chave e o valor. Quem registra só
+coloca ali o que pode ser recarregado (cache do Streamlit ou snapshot).
+
+Os orçamentos vêm de STUDY_CACHE_BUDGET_MB (abas no cache do processo) e
+STUDY_SESSION_BUDGET_MB (temas guardados em cada sessão).
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+MB = 1024 * 1024
+CACHE_BUDGET_MB = float(os.environ.get("STUDY_CACHE_BUDGET_MB", 256))
+SESSION_BUDGET_MB = float(os.environ.get("STUDY_SESSION_BUDGET_MB", 32))
+
+
+def frame_bytes(df):
+    """Memória do DataFrame, contando o conteúdo das strings."""
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return sys.getsizeof(df)
+
+
+def object_bytes(obj, _seen=None):
+    """Estimativa do tamanho de um objeto (DataFrames, dicts, listas, strings)."""
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):
+        return frame_bytes(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(object_bytes(k, _seen) + object_bytes(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(object_bytes(v, _seen) for v in obj)
+    return size
+
+
+def rss_bytes():
+    """Memória residente do processo (None se não der para medir)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Pico, na falta do atual
+    except Exception:
+        return None
+
+
+class LRUBudget:
+    """Itens na ordem de uso, limitados a budget_bytes; seguro entre threads."""
+
+    def __init__(self, budget_bytes, on_evict=None):
+        self.budget_bytes = budget_bytes
+        self._on_evict = on_evict
+        self._items = OrderedDict()  # chave -> (tamanho, valor)
+        self._lock = threading.Lock()
+        self.stats = {"evictions": 0, "evicted_bytes": 0}
+
+    def touch(self, key, value=None, size=None):
+        """Registra (ou marca como recém-usado) o item; devolve as chaves removidas.
+
+        size pode ser um número ou uma função, chamada só quando o item é novo
+        ou recebe outro valor (medir um DataFrame grande custa caro).
+        O item recém-usado nunca é removido, mesmo sozinho acima do orçamento.
+        """
+        with self._lock:
+            if key in self._items:
+                old_size, old_value = self._items.pop(key)
+                if value is None:
+                    value = old_value
+                    if size is None or callable(size):
+                        size = old_size
+            if callable(size):
+                size = size()
+            self._items[key] = (int(size or 0), value)
+            evicted = self._shrink(keep=key)
+        self._notify(evicted)
+        return [k for k, _ in evicted]
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key][1]
+
+    def pop(self, key, default=None):
+        """Tira o item sem chamar on_evict (quem tirou vai usá-lo)."""
+        with self._lock:
+            item = self._items.pop(key, None)
+        return default if item is None else item[1]
+
+    def discard(self, keys):
+        """Remove as chaves indicadas chamando on_evict (ex.: versões antigas)."""
+        with self._lock:
+            evicted = [(k, self._items.pop(k)[1]) for k in keys if k in self._items]
+        self._notify(evicted)
+
+    def keys(self):
+        with self._lock:
+            return list(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for size, _ in self._items.values())
+
+    def _shrink(self, keep):
+        evicted = []
+        total = sum(size for size, _ in self._items.values())
+        for key in list(self._items):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            size, value = self._items.pop(key)
+            total -= size
+            self.stats["evictions"] += 1
+            self.stats["evicted_bytes"] += size
+            evicted.append((key, value))
+        return evicted
+
+    def _notify(self, evicted):
+        if self._on_evict is None:
+            return
+        for key, value in evicted:
+            try:
+                self._on_evict(key, value)
+            except Exception:
+                pass  # Remover do cache é só economia: falha não derruba quem carregou
+
+    def report(self):
+        """Resumo para o medidor: itens, MB usados e orçamento."""
+        with self._lock:
+            used = sum(size for size, _ in self._items.values())
+            return {
+                "itens": len(self._items),
+                "usado_mb": round(used / MB, 2),
+                "orçamento_mb": round(self.budget_bytes / MB, 2),
+                "remoções": self.stats["evictions"],
+            }
@@ -0,0 +1,173 @@
+"""Carregamento em janelas das colunas pesadas de abas grandes.
+
+No modo Perguntas só uma linha aparece por vez: as colunas de texto longo
+(Pergunta, Resposta...) são baixadas em janelas de linhas, a primeira logo
+de cara e as seguintes em segundo plano conforme a questão avança.
+
+No tema "Todos" a unidade é a aba: a primeira chega em primeiro plano e as
+demais em segundo plano (TabStream), entrando na seleção conforme chegam.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="paged-loader")
+# Separado: uma planilha inteira chegando não atrasa as janelas da questão atual
+_stream_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tab-stream")
+
+
+class PagedWorksheet:
+    """Guarda as janelas já baixadas de uma aba e busca as que faltam.
+
+    fetch_window(start, stop) recebe índices 0-based de linha de dados (stop
+    exclusivo) e devolve {coluna: [valores]}, como read_column_ranges.
+    """
+
+    def __init__(self, fetch_window, total_rows, window_size, columns, initial=None):
+        self._fetch = fetch_window
+        self.total_rows = total_rows
+        self.window_size = window_size
+        self.columns = list(columns)
+        self._rows = {}      # índice da linha -> {coluna: valor}
+        self._futures = {}   # número da janela -> Future em andamento
+        self._lock = threading.Lock()
+        if initial is not None:
+            self._store(0, min(window_size, total_rows), initial)
+
+    def window_of(self, row_idx):
+        return row_idx // self.window_size
+
+    def _bounds(self, window):
+        start = window * self.window_size
+        return start, min(start + self.window_size, self.total_rows)
+
+    def _store(self, start, stop, values):
+        with self._lock:
+            for offset in range(stop - start):
+                self._rows[start + offset] = {
+                    col: (values.get(col, [])[offset] if offset < len(values.get(col, [])) else "")
+                    for col in self.columns
+                }
+
+    def _load(self, start, stop):
+        self._store(start, stop, self._fetch(start, stop))
+
+    def is_loaded(self, row_idx):
+        with self._lock:
+            return row_idx in self._rows
+
+    def get(self, row_idx):
+        """Valores das colunas pesadas da linha, ou None se ainda não chegaram."""
+        with self._lock:
+            return self._rows.get(row_idx)
+
+    def loaded_count(self):
+        with self._lock:
+            return len(self._rows)
+
+    def ensure(self, row_idx):
+        """Bloqueia até a janela da linha estar carregada (usado no salto direto)."""
+        if row_idx >= self.total_rows or self.is_loaded(row_idx):
+            return
+        window = self.window_of(row_idx)
+        with self._lock:
+            future = self._futures.get(window)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass  # Tenta de novo abaixo, agora em primeiro plano
+        if not self.is_loaded(row_idx):
+            self._load(*self._bounds(window))
+
+    def prefetch(self, row_indices):
+        """Agenda em segundo plano as janelas das linhas indicadas que faltam."""
+        windows = []
+        for row_idx in row_indices:
+            window = self.window_of(row_idx)
+            if row_idx < self.total_rows and window not in windows and not self.is_loaded(row_idx):
+                windows.append(window)
+
+        for window in windows:
+            with self._lock:
+                if window in self._futures:
+                    continue
+                future = _executor.submit(self._load, *self._bounds(window))
+                self._futures[window] = future
+            future.add_done_callback(lambda _f, w=window: self._forget(w))
+
+    def _forget(self, window):
+        with self._lock:
+            self._futures.pop(window, None)
+
+    def ensure_all(self):
+        """Carrega tudo o que falta, um pedido por trecho contínuo ausente."""
+        with self._lock:
+            missing = [i for i in range(self.total_rows) if i not in self._rows]
+        spans = []
+        for row_idx in missing:
+            if spans and spans[-1][1] == row_idx:
+                spans[-1][1] = row_idx + 1
+            else:
+                spans.append([row_idx, row_idx + 1])
+        for start, stop in spans:
+            self._load(start, stop)
+
+
+class TabStream:
+    """Abas chegando em segundo plano, uma a uma, na ordem dos títulos.
+
+    fetch(title) devolve o DataFrame pronto ou None (aba que falhou ou não
+    serve). Quem consome chama take() a cada rerun e recebe só as abas que
+    chegaram desde a última vez.
+    """
+
+    def __init__(self, titles, fetch):
+        self.titles = list(titles)
+        self._fetch = fetch
+        self._arrived = []   # (título, df ou None), na ordem dos títulos
+        self._taken = 0
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._future = _stream_executor.submit(self._run)
+
+    def _run(self):
+        for title in self.titles:
+            if self._cancelled:
+                return
+            try:
+                df = self._fetch(title)
+            except Exception:
+                df = None
+            with self._lock:
+                self._arrived.append((title, df))
+
+    def progress(self):
+        """(abas que já chegaram, total de abas do stream)."""
+        with self._lock:
+            return len(self._arrived), len(self.titles)
+
+    @property
+    def done(self):
+        return self._future.done()
+
+    def has_new(self):
+        with self._lock:
+            return len(self._arrived) > self._taken
+
+    def take(self):
+        """Abas chegadas desde o último take(), sem as que vieram vazias."""
+        with self._lock:
+            new = self._arrived[self._taken:]
+            self._taken = len(self._arrived)
+        return [(title, df) for title, df in new if df is not None]
+
+    def wait(self):
+        """Bloqueia até todas as abas chegarem (modos que precisam da seleção inteira)."""
+        try:
+            self._future.result()
+        except Exception:
+            pass
+
+    def cancel(self):
+        """Para depois da aba em andamento (o que chegou continua disponível)."""
+        self._cancelled = True
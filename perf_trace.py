@@ -0,0 +1,273 @@
+"""Rastreamento de I/O por rerun (Google Sheets e OpenAI).
+
+Cada chamada externa vira um evento com função, aba, latência e se veio do
+cache. Os eventos ficam agrupados por rerun da sessão para o painel de
+desenvolvimento e podem ser exportados em JSON lines.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+MAX_RERUNS = 50
+MAX_BACKGROUND_EVENTS = 500
+
+_local = threading.local()
+_background_events = deque(maxlen=MAX_BACKGROUND_EVENTS)
+_background_lock = threading.Lock()
+
+
+def _current_rerun():
+    return getattr(_local, "rerun", None)
+
+
+def rerun_in_progress():
+    """True se há um rerun aberto nesta thread (ex.: um fragmento rodando dentro do main)."""
+    return _current_rerun() is not None
+
+
+def _scope_stack():
+    stack = getattr(_local, "scope_stack", None)
+    if stack is None:
+        stack = _local.scope_stack = []
+    return stack
+
+
+def begin_rerun(history, label=""):
+    """Abre o registro de um rerun e o associa à thread do script."""
+    rerun = {
+        "rerun_id": (history[-1]["rerun_id"] + 1) if history else 1,
+        "label": label,
+        "started_at": datetime.now().isoformat(timespec="milliseconds"),
+        "_t0": time.perf_counter(),
+        "duration_ms": None,
+        "events": [],
+    }
+    history.append(rerun)
+    _local.rerun = rerun
+    _local.cache_stack = []
+    _local.scope_stack = []
+    return rerun
+
+
+def end_rerun():
+    """Fecha o rerun corrente registrando sua duração total."""
+    rerun = _current_rerun()
+    if rerun is not None:
+        rerun["duration_ms"] = round((time.perf_counter() - rerun["_t0"]) * 1000, 2)
+    _local.rerun = None
+    _local.cache_stack = []
+    _local.scope_stack = []
+
+
+def record_event(kind, function, worksheet=None, latency_ms=0.0, cache="none", error=None):
+    """Registra uma chamada externa no rerun corrente (ou no buffer de fundo)."""
+    stack = getattr(_local, "cache_stack", None)
+    if stack and kind in ("sheets", "openai"):
+        # Chamada feita de dentro de uma função cacheada: é um miss
+        for marker in stack:
+            marker["io"] += 1
+        cache = "miss"
+
+    scopes = _scope_stack()
+    rerun = _current_rerun()
+    event = {
+        "kind": kind,
+        "function": function,
+        "scope": scopes[-1] if scopes else None,
+        "worksheet": worksheet,
+        "latency_ms": round(latency_ms, 2),
+        "cache": cache,
+        "error": error,
+        "offset_ms": round((time.perf_counter() - rerun["_t0"]) * 1000, 2) if rerun else None,
+        "thread": threading.current_thread().name,
+    }
+    if rerun is not None:
+        rerun["events"].append(event)
+    else:
+        with _background_lock:
+            _background_events.append(event)
+
+
+@contextmanager
+def traced_io(function, worksheet=None, kind="sheets"):
+    """Mede um bloco que faz I/O fora do proxy (ex.: chamada direta ao Drive)."""
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        record_event(kind, function, worksheet, (time.perf_counter() - t0) * 1000, error=error)
+
+
+def trace_cache(label, worksheet_arg=None, worksheet=None):
+    """Envolve uma função com st.cache_data registrando hit/miss.
+
+    Deve ficar por fora do decorador de cache: se nenhuma chamada externa
+    acontecer durante a execução, o valor veio do cache (hit).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = getattr(_local, "cache_stack", None)
+            if stack is None:
+                stack = _local.cache_stack = []
+            marker = {"io": 0}
+            stack.append(marker)
+            scopes = _scope_stack()
+            scopes.append(label)
+            t0 = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                scopes.pop()
+                stack.pop()
+                ws_name = worksheet
+                if worksheet_arg is not None and len(args) > worksheet_arg:
+                    ws_name = str(args[worksheet_arg])
+                record_event(
+                    "cache", label, ws_name,
+                    (time.perf_counter() - t0) * 1000,
+                    "miss" if marker["io"] else "hit",
+                    error,
+                )
+        # st.cache_data expõe .clear(); mantemos acessível pelo wrapper
+        if hasattr(func, "clear"):
+            wrapper.clear = func.clear
+        return wrapper
+    return decorator
+
+
+def trace_call(label, kind="call"):
+    """Decorador que mede uma função inteira e nomeia as chamadas feitas nela.
+
+    Use kind="openai" para chamadas diretas ao modelo; o padrão "call" serve
+    para funções que agrupam várias chamadas ao Sheets (ex.: get_study_logs).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            scopes = _scope_stack()
+            scopes.append(label)
+            t0 = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                scopes.pop()
+                record_event(kind, label, None, (time.perf_counter() - t0) * 1000, error=error)
+        return wrapper
+    return decorator
+
+
+class TracedProxy:
+    """Proxy do cliente gspread que mede cada método chamado.
+
+    Planilhas e abas devolvidas também são embrulhadas, para que chamadas como
+    worksheet.get_all_records() apareçam com o nome da aba.
+    """
+
+    def __init__(self, target, worksheet=None):
+        self.__dict__["_target"] = target
+        self.__dict__["_worksheet"] = worksheet
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        target = self.__dict__.get("_target")
+        if target is None:
+            raise AttributeError(name)
+        attr = getattr(target, name)
+        if not callable(attr):
+            return attr
+
+        worksheet = self.__dict__.get("_worksheet")
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            ws_name = worksheet
+            if name == "worksheet" and args:
+                ws_name = str(args[0])
+            elif name.startswith("values_") and args:
+                ws_name = _worksheet_from_range(args[0])
+            t0 = time.perf_counter()
+            error = None
+            try:
+                return _wrap_result(attr(*args, **kwargs))
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                record_event("sheets", name, ws_name, (time.perf_counter() - t0) * 1000, error=error)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self.__dict__["_target"], name, value)
+
+    def __repr__(self):
+        return f"TracedProxy({self.__dict__.get('_target')!r})"
+
+
+def _worksheet_from_range(range_arg):
+    """Extrai o nome da aba de um range A1 ("'Aba'!A2:A" ou lista deles)."""
+    ranges = range_arg if isinstance(range_arg, (list, tuple)) else [range_arg]
+    titles = []
+    for r in ranges:
+        title = str(r).rsplit("!", 1)[0] if "!" in str(r) else ""
+        title = title.strip("'").replace("''", "'")
+        if title and title not in titles:
+            titles.append(title)
+    return ", ".join(titles) or None
+
+
+def _wrap_result(result):
+    kind = type(result).__name__
+    if kind == "Worksheet":
+        return TracedProxy(result, worksheet=result.title)
+    if kind == "Spreadsheet":
+        return TracedProxy(result)
+    if isinstance(result, list) and result and type(result[0]).__name__ == "Worksheet":
+        return [TracedProxy(ws, worksheet=ws.title) for ws in result]
+    return result
+
+
+def unwrap(obj):
+    """Devolve o objeto original por trás de um TracedProxy."""
+    if isinstance(obj, TracedProxy):
+        return obj.__dict__["_target"]
+    return obj
+
+
+def background_events():
+    """Eventos registrados fora de um rerun (threads de fundo)."""
+    with _background_lock:
+        return list(_background_events)
+
+
+def reruns_to_jsonl(history):
+    """Serializa o histórico de reruns em JSON lines (um evento por linha)."""
+    lines = []
+    for rerun in history:
+        for event in rerun["events"]:
+            row = {
+                "rerun_id": rerun["rerun_id"],
+                "rerun_label": rerun["label"],
+                "rerun_started_at": rerun["started_at"],
+                "rerun_duration_ms": rerun["duration_ms"],
+            }
+            row.update(event)
+            lines.append(json.dumps(row, ensure_ascii=False))
+    return "\n".join(lines) + ("\n" if lines else "")
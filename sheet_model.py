@@ -0,0 +1,489 @@
+"""Modelo em memória de planilhas com a interface do gspread usada pelo app.
+
+Planilhas, abas e células ficam em memória; cada gravação incrementa a
+versão do arquivo (como o `version`/`modifiedTime` do Drive) e passa por
+on_write, para quem precisar registrá-la. Dois backends se apoiam nele: o
+falso, para testes e desenvolvimento (fake_backend.py), e o espelho local do
+modo worker (MirrorBackend, em sync_worker.py).
+"""
+import json
+import re
+import threading
+from datetime import datetime, timezone
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+
+_URL_ID = re.compile(r"/spreadsheets/d/([a-zA-Z0-9-_]+)")
+_A1_CELL = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+class SheetAPIError(Exception):
+    """Erro da API (a mensagem segue o formato do gspread)."""
+
+    def __init__(self, code, message):
+        super().__init__(f"APIError: [{code}]: {message}")
+        self.code = code
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+class SpreadsheetNotFound(Exception):
+    pass
+
+
+def extract_id_from_url(url):
+    match = _URL_ID.search(url)
+    if not match:
+        raise SpreadsheetNotFound(url)
+    return match.group(1)
+
+
+def _column_index(letters):
+    idx = 0
+    for ch in letters.upper():
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx
+
+
+def parse_a1(range_name):
+    """Converte um range A1 em (aba, linha1, col1, linha2, col2); None = aberto."""
+    title = None
+    rng = str(range_name)
+    if "!" in rng:
+        title, rng = rng.rsplit("!", 1)
+        title = title.strip("'").replace("''", "'")
+    elif len(rng) > 1 and rng.startswith("'") and rng.endswith("'"):
+        # Só o nome da aba entre aspas: a aba inteira
+        return rng[1:-1].replace("''", "'"), 1, 1, None, None
+    start, _, end = rng.partition(":")
+    end = end or start
+
+    def cell(ref):
+        match = _A1_CELL.match(ref.strip())
+        if not match:
+            raise SheetAPIError(400, f"Unable to parse range: {range_name}")
+        letters, digits = match.groups()
+        return (int(digits) if digits else None), (_column_index(letters) if letters else None)
+
+    r1, c1 = cell(start)
+    r2, c2 = cell(end)
+    return title, r1 or 1, c1 or 1, r2, c2
+
+
+def formatted_value(value):
+    """Valor como o Sheets o exibe (FORMATTED_VALUE)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def numericise(value):
+    """Texto numérico vira int ou float, como no get_all_records do gspread."""
+    if isinstance(value, str) and value.strip():
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _lookup_backend(key):
+    return _registry[key]
+
+
+def _restore_spreadsheet(backend, spreadsheet_id):
+    return Spreadsheet(backend, backend.spreadsheets[spreadsheet_id])
+
+
+def _restore_worksheet(backend, spreadsheet_id, title):
+    return Worksheet(backend, backend.spreadsheets[spreadsheet_id].worksheets[title])
+
+
+class SheetBackend:
+    """Estado compartilhado: as planilhas e o relógio de versões.
+
+    Objetos devolvidos (planilhas, abas) podem ser serializados com pickle,
+    como faz o st.cache_data: voltam apontando para o mesmo backend.
+    api_call é chamado antes de cada operação (contagem; subclasses podem
+    simular rede ou sincronizar) e on_write depois de cada gravação.
+    """
+
+    def __init__(self):
+        with _registry_lock:
+            self.key = len(_registry)
+            _registry[self.key] = self
+        self.spreadsheets = {}
+        self.stats = {"calls": 0, "quota_errors": 0, "by_method": {}}
+        self._lock = threading.RLock()
+
+    def api_call(self, method):
+        """Conta uma chamada à API (por método)."""
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["by_method"][method] = self.stats["by_method"].get(method, 0) + 1
+
+    # --- dados ---
+    def create_spreadsheet(self, spreadsheet_id, title=None):
+        with self._lock:
+            sheet = SpreadsheetData(spreadsheet_id, title or spreadsheet_id)
+            self.spreadsheets[spreadsheet_id] = sheet
+            return sheet
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                sid: {"title": s.title, "worksheets": {t: ws.rows for t, ws in s.worksheets.items()}}
+                for sid, s in self.spreadsheets.items()
+            }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        backend = cls(**kwargs)
+        for sid, payload in data.items():
+            sheet = backend.create_spreadsheet(sid, payload.get("title"))
+            for title, rows in payload.get("worksheets", {}).items():
+                sheet.add(title, [list(r) for r in rows])
+        return backend
+
+    @classmethod
+    def from_json(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), **kwargs)
+
+    def client(self):
+        return Client(self)
+
+    def on_write(self, spreadsheet_id, worksheet_title, op, payload):
+        """Chamado depois de cada gravação; subclasses podem registrar a operação."""
+
+    def version_of(self, sheet):
+        """Versão da planilha informada na sondagem do Drive."""
+        return str(sheet.version)
+
+    def __reduce__(self):
+        return _lookup_backend, (self.key,)
+
+
+class SpreadsheetData:
+    def __init__(self, spreadsheet_id, title):
+        self.id = spreadsheet_id
+        self.title = title
+        self.worksheets = {}
+        self.version = 1
+        self.modified = datetime.now(timezone.utc)
+        self._next_ws_id = 0
+
+    def add(self, title, rows=None):
+        ws = WorksheetData(self, self._next_ws_id, title, rows or [])
+        self._next_ws_id += 1
+        self.worksheets[title] = ws
+        return ws
+
+    def touch(self):
+        self.version += 1
+        self.modified = datetime.now(timezone.utc)
+
+
+class WorksheetData:
+    def __init__(self, spreadsheet, ws_id, title, rows):
+        self.spreadsheet = spreadsheet
+        self.id = ws_id
+        self.title = title
+        self.rows = rows
+
+    def n_rows(self):
+        n = len(self.rows)
+        while n and not any(formatted_value(v) for v in self.rows[n - 1]):
+            n -= 1
+        return n
+
+    def n_cols(self):
+        return max((len(r) for r in self.rows), default=0)
+
+    def get(self, row, col):
+        if row - 1 < len(self.rows) and col - 1 < len(self.rows[row - 1]):
+            return self.rows[row - 1][col - 1]
+        return ""
+
+    def set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        line = self.rows[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = value
+
+    def read(self, r1, c1, r2, c2, major="ROWS", render="FORMATTED_VALUE"):
+        r2 = r2 or self.n_rows()
+        c2 = c2 or self.n_cols()
+        convert = formatted_value if render == "FORMATTED_VALUE" else (lambda v: v)
+        grid = [[convert(self.get(r, c)) for c in range(c1, c2 + 1)] for r in range(r1, r2 + 1)]
+        if major == "COLUMNS":
+            grid = [list(col) for col in zip(*grid)] if grid else []
+        # A API omite vazios no fim de cada linha e linhas vazias no fim
+        trimmed = []
+        for line in grid:
+            while line and line[-1] in ("", None):
+                line = line[:-1]
+            trimmed.append(line)
+        while trimmed and not trimmed[-1]:
+            trimmed.pop()
+        return trimmed
+
+
+def _range_response(title, range_name, values, major):
+    response = {"range": f"'{title}'!{range_name.split('!')[-1]}", "majorDimension": major}
+    if values:
+        response["values"] = values
+    return response
+
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def json(self):
+        return self._payload
+
+
+class DriveHTTPClient:
+    """Responde ao GET de metadados do Drive usado na sondagem de versão."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        self.backend.api_call("drive.files.get")
+        if not endpoint.startswith(DRIVE_FILES_URL):
+            raise SheetAPIError(404, f"Endpoint não suportado: {endpoint}")
+        sid = endpoint[len(DRIVE_FILES_URL):].split("?")[0]
+        with self.backend._lock:
+            sheet = self.backend.spreadsheets.get(sid)
+            if sheet is None:
+                raise SheetAPIError(404, f"File not found: {sid}")
+            return _Response({
+                "id": sid,
+                "version": self.backend.version_of(sheet),
+                "modifiedTime": sheet.modified.isoformat().replace("+00:00", "Z"),
+            })
+
+
+class Client:
+    def __init__(self, backend):
+        self.backend = backend
+        self.http_client = DriveHTTPClient(backend)
+
+    def __reduce__(self):
+        return Client, (self.backend,)
+
+    def open_by_key(self, key):
+        self.backend.api_call("open_by_key")
+        with self.backend._lock:
+            data = self.backend.spreadsheets.get(key)
+        if data is None:
+            raise SpreadsheetNotFound(key)
+        return Spreadsheet(self.backend, data)
+
+    def open_by_url(self, url):
+        return self.open_by_key(extract_id_from_url(url))
+
+
+class Spreadsheet:
+    """Mesmo nome da classe do gspread (o rastreador identifica pelo nome)."""
+
+    def __init__(self, backend, data):
+        self._backend = backend
+        self._data = data
+        self.id = data.id
+        self.title = data.title
+        self.url = f"https://docs.google.com/spreadsheets/d/{data.id}"
+
+    def __reduce__(self):
+        return _restore_spreadsheet, (self._backend, self.id)
+
+    def worksheets(self):
+        self._backend.api_call("worksheets")
+        with self._backend._lock:
+            return [Worksheet(self._backend, ws) for ws in self._data.worksheets.values()]
+
+    def worksheet(self, title):
+        self._backend.api_call("worksheet")
+        with self._backend._lock:
+            ws = self._data.worksheets.get(title)
+        if ws is None:
+            raise WorksheetNotFound(title)
+        return Worksheet(self._backend, ws)
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._backend.api_call("add_worksheet")
+        with self._backend._lock:
+            if title in self._data.worksheets:
+                raise SheetAPIError(400, f"A sheet with the name \"{title}\" already exists.")
+            ws = self._data.add(title)
+            self._data.touch()
+        self._backend.on_write(self.id, title, "add_worksheet", {"rows": rows, "cols": cols})
+        return Worksheet(self._backend, ws)
+
+    def get_lastUpdateTime(self):
+        self._backend.api_call("get_lastUpdateTime")
+        with self._backend._lock:
+            return self._data.modified.isoformat().replace("+00:00", "Z")
+
+    def _resolve(self, range_name):
+        title, r1, c1, r2, c2 = parse_a1(range_name)
+        ws = self._data.worksheets.get(title) if title else next(iter(self._data.worksheets.values()), None)
+        if ws is None:
+            raise SheetAPIError(400, f"Unable to parse range: {range_name}")
+        return ws, (r1, c1, r2, c2)
+
+    def values_get(self, range, params=None):
+        self._backend.api_call("values_get")
+        params = params or {}
+        major = params.get("majorDimension", "ROWS")
+        with self._backend._lock:
+            ws, bounds = self._resolve(range)
+            values = ws.read(*bounds, major=major, render=params.get("valueRenderOption", "FORMATTED_VALUE"))
+            return _range_response(ws.title, range, values, major)
+
+    def values_batch_get(self, ranges, params=None):
+        self._backend.api_call("values_batch_get")
+        params = params or {}
+        major = params.get("majorDimension", "ROWS")
+        render = params.get("valueRenderOption", "FORMATTED_VALUE")
+        with self._backend._lock:
+            value_ranges = []
+            for rng in ranges:
+                ws, bounds = self._resolve(rng)
+                value_ranges.append(_range_response(ws.title, rng, ws.read(*bounds, major=major, render=render), major))
+            return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+
+class Worksheet:
+    def __init__(self, backend, data):
+        self._backend = backend
+        self._data = data
+        self.title = data.title
+        self.id = data.id
+        self.spreadsheet_id = data.spreadsheet.id
+
+    def __reduce__(self):
+        return _restore_worksheet, (self._backend, self.spreadsheet_id, self.title)
+
+    @property
+    def row_count(self):
+        return max(1000, len(self._data.rows))
+
+    @property
+    def col_count(self):
+        return max(26, self._data.n_cols())
+
+    def _write(self):
+        self._data.spreadsheet.touch()
+
+    def row_values(self, row, **kwargs):
+        self._backend.api_call("row_values")
+        with self._backend._lock:
+            values = self._data.read(row, 1, row, None)
+            return values[0] if values else []
+
+    def col_values(self, col, **kwargs):
+        self._backend.api_call("col_values")
+        with self._backend._lock:
+            values = self._data.read(1, col, None, col, major="COLUMNS")
+            return values[0] if values else []
+
+    def get_all_values(self, **kwargs):
+        self._backend.api_call("get_all_values")
+        with self._backend._lock:
+            return [r + [""] * (self._data.n_cols() - len(r)) for r in self._data.read(1, 1, None, None)]
+
+    def get_all_records(self, **kwargs):
+        self._backend.api_call("get_all_records")
+        with self._backend._lock:
+            rows = self._data.read(1, 1, None, None)
+        if not rows:
+            return []
+        headers = rows[0]
+        return [
+            {h: numericise(r[i]) if i < len(r) else "" for i, h in enumerate(headers)}
+            for r in rows[1:]
+        ]
+
+    def batch_get(self, ranges, major_dimension=None, value_render_option=None, **kwargs):
+        self._backend.api_call("batch_get")
+        with self._backend._lock:
+            result = []
+            for rng in ranges:
+                _, r1, c1, r2, c2 = parse_a1(rng)
+                result.append(self._data.read(
+                    r1, c1, r2, c2,
+                    major=major_dimension or "ROWS",
+                    render=value_render_option or "FORMATTED_VALUE",
+                ))
+            return result
+
+    def update_cell(self, row, col, value):
+        self._backend.api_call("update_cell")
+        self._apply("update_cell", {"row": row, "col": col, "value": value})
+
+    def update(self, values=None, range_name=None, **kwargs):
+        # Aceita também a ordem antiga update(range_name, values)
+        if isinstance(values, str) and not isinstance(range_name, str):
+            values, range_name = range_name, values
+        self._backend.api_call("update")
+        self._apply("update", {"range": range_name or "A1", "values": values or []})
+
+    def batch_update(self, data, **kwargs):
+        self._backend.api_call("batch_update")
+        payload = {"data": [{"range": d["range"], "values": d["values"]} for d in data]}
+        if kwargs.get("value_input_option"):
+            payload["value_input_option"] = kwargs["value_input_option"]
+        self._apply("batch_update", payload)
+
+    def append_row(self, values, **kwargs):
+        self._backend.api_call("append_row")
+        self._apply("append_row", {"values": list(values)})
+
+    def _apply(self, op, payload):
+        with self._backend._lock:
+            apply_write(self._data, op, payload)
+            self._write()
+        self._backend.on_write(self.spreadsheet_id, self.title, op, payload)
+
+
+def apply_write(data, op, payload):
+    """Aplica uma gravação (formato de on_write) aos dados de uma aba."""
+    if op == "update_cell":
+        data.set(payload["row"], payload["col"], payload["value"])
+    elif op == "update":
+        _write_block(data, payload["range"], payload["values"])
+    elif op == "batch_update":
+        for item in payload["data"]:
+            _write_block(data, item["range"], item["values"])
+    elif op == "append_row":
+        row = data.n_rows() + 1
+        for col, value in enumerate(payload["values"], start=1):
+            data.set(row, col, value)
+    else:
+        raise ValueError(f"Operação desconhecida: {op}")
+
+
+def _write_block(data, range_name, values):
+    _, r1, c1, _, _ = parse_a1(range_name)
+    for i, line in enumerate(values):
+        for j, value in enumerate(line):
+            data.set(r1 + i, c1 + j, value)
@@ -0,0 +1,211 @@
+"""Registro das planilhas do app, cada uma com sua política de cache.
+
+Cada planilha declara nome, URL, tipo ("conteudo" ou "trilha") e uma
+CachePolicy. A política vale para a sondagem de versão: por quanto tempo a
+versão lida do Drive é usada sem perguntar de novo. Os dados ficam em cache
+chaveados pela versão e só são baixados outra vez quando ela muda.
+
+O TTL se adapta ao que as sondagens encontram:
+- sem mudança, o TTL cresce (bancos de questões estáveis);
+- com mudança feita fora deste processo, o TTL diminui (planilhas ativas);
+- mudança causada por gravação do próprio app não conta.
+O TTL fica sempre entre min_ttl e max_ttl.
+
+A aba Log_Estudos fica na planilha da Trilha e segue a política dela.
+
+STUDY_SHEETS troca a lista padrão: o JSON em si ou o caminho de um arquivo
+com ele (mesmos campos de DEFAULT_SHEETS, com ttl/min_ttl/max_ttl
+opcionais; a lista precisa ter uma planilha "trilha"). STUDY_ADAPTIVE_TTL=0
+mantém o TTL inicial fixo.
+"""
+import json
+import os
+import threading
+import time
+
+ADAPTIVE = os.environ.get("STUDY_ADAPTIVE_TTL", "1") != "0"
+
+CONTENT = "conteudo"
+TRILHA = "trilha"
+
+
+class CachePolicy:
+    """TTL inicial e limites da sondagem de versão (segundos)."""
+
+    def __init__(self, ttl, min_ttl, max_ttl, grow=1.5, shrink=0.5):
+        self.ttl = ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.grow = grow        # Fator a cada sondagem sem mudança
+        self.shrink = shrink    # Fator a cada mudança externa
+
+    def clamp(self, ttl):
+        return max(self.min_ttl, min(self.max_ttl, ttl))
+
+
+CONTENT_POLICY = CachePolicy(ttl=300, min_ttl=60, max_ttl=1800)   # Conteúdo muda pouco
+TRILHA_POLICY = CachePolicy(ttl=60, min_ttl=15, max_ttl=300)      # Missões e tempo de estudo mudam no dia
+
+DEFAULT_SHEETS = [
+    {"name": "Direito", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1qb9d3qNAJBfcluxTHNsdRDdE1pZW7LS0EyzHlobRVDk/edit?usp=drive_link"},
+    {"name": "Geografia", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1U8js8DcnpMwANwIoBCSlPgH0BPEx2nQwRSBVssflCDs/edit?usp=drive_link"},
+    {"name": "História Mundial", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1XNhhnjlCp7xB3eCkwHyiG8_hPrmT4AXk-r_8YSsAYWg/edit?usp=sharing"},
+    {"name": "História do Brasil", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/16LMjWZnez89To_0jNFWf_V9TcsKhUqTcxQP8VF1FL_8/edit?usp=sharing"},
+    {"name": "Política Internacional", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1uiXehNXzYwJ0BM8pLThfhcH7f7Cr4d7BhSQ3KO4mQEU/edit?usp=drive_link"},
+    {"name": "Economia", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1r3J0KnmoEs-pOD-oKuhogKGvMw7N26E1QeFENswEc3Y/edit?usp=drive_link"},
+    {"name": "Francês", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/1O8aEGmkoXtpN0wLc0Uypk6D741Udk1V3XXUw0Wa25is/edit?usp=drive_link"},
+    {"name": "Inglês", "kind": CONTENT, "url": "https://docs.google.com/spreadsheets/d/12VQFmP_42aKJIN2he4HzPobl79_icS0yqy5G4AZD_P4/edit?usp=drive_link"},
+    {"name": "Trilha", "kind": TRILHA, "url": "https://docs.google.com/spreadsheets/d/1QUIvAgo_fLa7DtBrdRBcBqY4yRn6FbmH2tx1UoiAFd8/edit?usp=sharing"},
+]
+
+
+class SheetEntry:
+    """Uma planilha registrada: política, versão em cache e contadores."""
+
+    def __init__(self, name, url, kind, policy):
+        self.name = name
+        self.url = url
+        self.kind = kind
+        self.policy = policy
+        self.ttl = policy.ttl
+        self.lock = threading.Lock()    # Uma sondagem por vez por planilha
+        self._cached = False
+        self.value = None               # Última resposta (None se a sondagem falhou)
+        self.last_version = None        # Última versão lida com sucesso
+        self.generation = 0             # Gravações do processo na última sondagem
+        self.checked_at = 0.0
+        self.stats = {"hits": 0, "probes": 0, "changes": 0, "failures": 0}
+
+    def fresh(self, now):
+        # Falha de sondagem vale só min_ttl: tenta de novo logo
+        ttl = self.ttl if self.value is not None else self.policy.min_ttl
+        return self._cached and now < self.checked_at + ttl
+
+    def observe(self, version, generation, now):
+        """Registra o resultado de uma sondagem e ajusta o TTL."""
+        self.stats["probes"] += 1
+        if version is None:
+            self.stats["failures"] += 1
+        elif self.last_version is not None and version != self.last_version:
+            self.stats["changes"] += 1
+            if ADAPTIVE and generation == self.generation:
+                # Ninguém aqui gravou: a planilha está sendo editada lá fora
+                self.ttl = self.policy.clamp(self.ttl * self.policy.shrink)
+        elif self.last_version is not None and ADAPTIVE:
+            self.ttl = self.policy.clamp(self.ttl * self.policy.grow)
+        if version is not None:
+            self.last_version = version
+        self.value = version
+        self.generation = generation
+        self.checked_at = now
+        self._cached = True
+
+    def expire(self):
+        with self.lock:
+            self._cached = False
+
+    def report(self):
+        lookups = self.stats["hits"] + self.stats["probes"]
+        return {
+            "planilha": self.name,
+            "tipo": self.kind,
+            "ttl_s": round(self.ttl),
+            "ttl_faixa": f"{self.policy.min_ttl}-{self.policy.max_ttl}",
+            "consultas": lookups,
+            "acertos": self.stats["hits"],
+            "taxa_acerto": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "sondagens": self.stats["probes"],
+            "mudanças": self.stats["changes"],
+            "falhas": self.stats["failures"],
+        }
+
+
+class SheetRegistry:
+    """Planilhas por nome e URL; a versão de cada uma é servida pela política."""
+
+    def __init__(self, sheets):
+        self._entries = []
+        self._by_url = {}
+        for sheet in sheets:
+            base = CONTENT_POLICY if sheet.get("kind", CONTENT) == CONTENT else TRILHA_POLICY
+            policy = CachePolicy(
+                ttl=sheet.get("ttl", base.ttl),
+                min_ttl=sheet.get("min_ttl", base.min_ttl),
+                max_ttl=sheet.get("max_ttl", base.max_ttl),
+                grow=base.grow,
+                shrink=base.shrink,
+            )
+            entry = SheetEntry(sheet["name"], sheet["url"], sheet.get("kind", CONTENT), policy)
+            self._entries.append(entry)
+            self._by_url[entry.url] = entry
+        if not any(e.kind == TRILHA for e in self._entries):
+            raise ValueError('Nenhuma planilha com kind "trilha" no registro (confira STUDY_SHEETS).')
+
+    def content(self):
+        """{disciplina: URL} das planilhas de conteúdo, na ordem do registro."""
+        return {e.name: e.url for e in self._entries if e.kind == CONTENT}
+
+    @property
+    def trilha(self):
+        return next(e for e in self._entries if e.kind == TRILHA)
+
+    def entry(self, url):
+        return self._by_url[url]
+
+    def version(self, url, probe, generation=0):
+        """Versão da planilha: a do cache se ainda vale, senão probe() (None se falhar).
+
+        generation é o número de gravações deste processo na planilha, para
+        separar as mudanças feitas pelo app das feitas fora dele.
+        """
+        entry = self._by_url[url]
+        with entry.lock:
+            now = time.time()
+            if entry.fresh(now):
+                entry.stats["hits"] += 1
+                return entry.value
+            try:
+                version = probe()
+            except Exception:
+                version = None
+            entry.observe(version, generation, now)
+            return version
+
+    def expire(self, url=None):
+        """Força nova sondagem da planilha (ou de todas)."""
+        for entry in ([self._by_url[url]] if url else self._entries):
+            entry.expire()
+
+    def report(self):
+        return [entry.report() for entry in self._entries]
+
+
+def load_sheets(value=None):
+    """Lista de planilhas do STUDY_SHEETS ou a padrão.
+
+    O valor pode ser o JSON em si (começa com "[") ou o caminho de um
+    arquivo com esse JSON.
+    """
+    value = (value or os.environ.get("STUDY_SHEETS") or "").strip()
+    if not value:
+        return DEFAULT_SHEETS
+    try:
+        if value.startswith("["):
+            return json.loads(value)
+        with open(value, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"STUDY_SHEETS inválido: {e}") from e
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registro único por processo (o app.py é reexecutado a cada rerun)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SheetRegistry(load_sheets())
+        return _registry
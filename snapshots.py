@@ -0,0 +1,173 @@
+"""Snapshots locais das abas, versionados pela versão da planilha no Drive.
+
+Cada aba baixada é gravada em Arrow IPC (formato de arquivo do Feather v2,
+sem compressão) em .study_cache/snapshots/<planilha>/<aba>/<versão>.arrow e
+lida de volta por memory map. Depois de um reinício o app responde a partir
+do disco em vez de baixar tudo de novo; a conferência com o Drive fica para
+o aquecedor, em segundo plano.
+
+pyarrow é opcional: sem ele, available() é False e nada é gravado.
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import quote, unquote
+
+SNAPSHOT_DIR = os.environ.get(
+    "STUDY_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".study_cache", "snapshots"),
+)
+KEEP_VERSIONS = 2   # Versões mantidas por aba (a atual e a anterior)
+TITLES_NAME = "__abas__"
+JSON_COLUMNS_KEY = b"study.json_columns"
+
+_lock = threading.Lock()
+
+
+def available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return os.environ.get("STUDY_SNAPSHOTS", "1") != "0"
+
+
+def _dataset_dir(spreadsheet_id, name):
+    return os.path.join(SNAPSHOT_DIR, quote(spreadsheet_id, safe=""), quote(name, safe=""))
+
+
+def _versions(directory, suffix):
+    """Arquivos de snapshot do diretório, do mais novo para o mais antigo."""
+    try:
+        entries = [e for e in os.scandir(directory) if e.name.endswith(suffix)]
+    except FileNotFoundError:
+        return []
+    return sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True)
+
+
+def _prune(directory, suffix):
+    for entry in _versions(directory, suffix)[KEEP_VERSIONS:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def save_frame(spreadsheet_id, name, version, df):
+    """Grava o DataFrame da aba para a versão indicada; devolve o caminho."""
+    if not available():
+        return None
+    import pyarrow as pa
+
+    directory = _dataset_dir(spreadsheet_id, name)
+    path = os.path.join(directory, quote(str(version), safe="") + ".arrow")
+
+    # Colunas com tipos misturados (ex.: ID numérico e "" na Trilha) não cabem
+    # num tipo Arrow: vão como JSON e voltam com os valores originais
+    json_columns = [
+        col for col in df.columns
+        if df[col].dtype == object and not all(isinstance(v, str) for v in df[col])
+    ]
+    encoded = df.copy()
+    for col in json_columns:
+        encoded[col] = [json.dumps(v, ensure_ascii=False, default=str) for v in df[col]]
+    table = pa.Table.from_pandas(encoded, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[JSON_COLUMNS_KEY] = json.dumps([str(c) for c in json_columns]).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    with _lock:
+        _write_atomic(path, write)
+        _prune(directory, ".arrow")
+    return path
+
+
+def load_frame(spreadsheet_id, name, version=None):
+    """Lê o snapshot da aba (versão exata, ou o mais recente se version=None).
+
+    Devolve (versão, DataFrame) ou None se não houver snapshot.
+    """
+    if not available():
+        return None
+    import pyarrow as pa
+
+    directory = _dataset_dir(spreadsheet_id, name)
+    if version is None:
+        entries = _versions(directory, ".arrow")
+        if not entries:
+            return None
+        path = entries[0].path
+    else:
+        path = os.path.join(directory, quote(str(version), safe="") + ".arrow")
+        if not os.path.exists(path):
+            return None
+
+    try:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            df = table.to_pandas()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    json_columns = json.loads((table.schema.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))
+    for col in json_columns:
+        df[col] = [json.loads(v) for v in df[col]]
+    found = os.path.basename(path)[:-len(".arrow")]
+    return unquote(found), df
+
+
+def has_frame(spreadsheet_id, name, version):
+    path = os.path.join(_dataset_dir(spreadsheet_id, name), quote(str(version), safe="") + ".arrow")
+    return available() and os.path.exists(path)
+
+
+def save_titles(spreadsheet_id, version, titles):
+    """Lista de abas da planilha (JSON pequeno, mesmo esquema de versões)."""
+    if not available():
+        return None
+    directory = _dataset_dir(spreadsheet_id, TITLES_NAME)
+    path = os.path.join(directory, quote(str(version), safe="") + ".json")
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": str(version), "saved_at": time.time(), "titles": list(titles)}, f, ensure_ascii=False)
+
+    with _lock:
+        _write_atomic(path, write)
+        _prune(directory, ".json")
+    return path
+
+
+def load_titles(spreadsheet_id, version=None):
+    """(versão, [abas]) da versão exata ou da mais recente; None se não houver."""
+    if not available():
+        return None
+    directory = _dataset_dir(spreadsheet_id, TITLES_NAME)
+    if version is None:
+        entries = _versions(directory, ".json")
+        if not entries:
+            return None
+        path = entries[0].path
+    else:
+        path = os.path.join(directory, quote(str(version), safe="") + ".json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return payload.get("version"), payload.get("titles", [])
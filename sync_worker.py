@@ -0,0 +1,517 @@
+"""Processo de sincronização: o único que conversa com o Google.
+
+Com STUDY_SYNC_MODE=worker o app não chama mais o Sheets nem o Drive. Ele lê
+de um espelho local (SQLite em .study_cache/sync.sqlite3) e cada gravação
+entra numa caixa de saída (tabela `outbox`). Este processo roda ao lado do
+app (o app o inicia sozinho; `python sync_worker.py` também serve) e faz
+todo o I/O num só lugar, com uma trava de arquivo garantindo um worker por
+espelho:
+
+- esvazia a caixa de saída na ordem, aba por aba; atualizações de célula
+  seguidas viram um único batch_update;
+- sonda a versão de cada planilha no Drive e, se mudou, baixa todas as abas
+  num só values_batch_get e grava no espelho;
+- respeita um limite de pedidos por minuto (STUDY_SYNC_RATE).
+
+No app, MirrorBackend (abaixo) expõe o espelho pelo modelo em memória de
+sheet_model.py, com a interface do gspread, então o resto do código não muda.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sheet_model import DRIVE_FILES_URL, SheetBackend, apply_write, extract_id_from_url, formatted_value, numericise
+
+DEFAULT_PATH = os.environ.get(
+    "STUDY_SYNC_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".study_cache", "sync.sqlite3"),
+)
+RATE_PER_MINUTE = int(os.environ.get("STUDY_SYNC_RATE", 50))   # Pedidos ao Google por minuto
+REFRESH_SECONDS = 60      # Intervalo entre sondagens de versão de cada planilha
+LOOP_SECONDS = 1.0        # Pausa do laço principal quando não há nada a fazer
+MAX_ATTEMPTS = 5          # Tentativas de uma gravação antes de marcá-la como falha
+POLL_SECONDS = 1.0        # No app: intervalo mínimo entre consultas ao espelho
+STARTUP_WAIT_SECONDS = 30 # No app: espera pela primeira cópia de um espelho vazio
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    spreadsheet_id TEXT PRIMARY KEY, url TEXT NOT NULL, role TEXT NOT NULL,
+    title TEXT, drive_version TEXT, revision INTEGER NOT NULL DEFAULT 0, synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS worksheets (
+    spreadsheet_id TEXT NOT NULL, title TEXT NOT NULL, position INTEGER NOT NULL, rows TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, title)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spreadsheet_id TEXT NOT NULL, worksheet TEXT NOT NULL, op TEXT NOT NULL, payload TEXT NOT NULL,
+    created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending', last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, id);
+"""
+
+
+class SyncStore:
+    """Espelho das planilhas e caixa de saída, compartilhados pelos dois processos."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    # --- planilhas ---
+    def register(self, url, role="content"):
+        """Inclui a planilha na lista do worker (role: "content" ou "trilha")."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sheets (spreadsheet_id, url, role) VALUES (?, ?, ?)",
+                (extract_id_from_url(url), url, role),
+            )
+
+    def sheets(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT spreadsheet_id, url, role, drive_version, revision, synced_at FROM sheets"
+            ).fetchall()
+        return [dict(zip(("spreadsheet_id", "url", "role", "drive_version", "revision", "synced_at"), r))
+                for r in rows]
+
+    def revisions(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT spreadsheet_id, revision FROM sheets").fetchall())
+
+    def wait_synced(self, timeout, interval=0.2):
+        """Espera todas as planilhas terem uma primeira cópia no espelho; True se tiverem."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if all(self.revisions().values()):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def save_sheet(self, spreadsheet_id, title, drive_version, worksheets):
+        """Troca o conteúdo espelhado da planilha e incrementa a revisão."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM worksheets WHERE spreadsheet_id=?", (spreadsheet_id,))
+            self._conn.executemany(
+                "INSERT INTO worksheets VALUES (?, ?, ?, ?)",
+                [(spreadsheet_id, ws_title, pos, json.dumps(rows, ensure_ascii=False))
+                 for pos, (ws_title, rows) in enumerate(worksheets)],
+            )
+            self._conn.execute(
+                """UPDATE sheets SET title=?, drive_version=?, revision=revision + 1, synced_at=?
+                   WHERE spreadsheet_id=?""",
+                (title, drive_version, time.time(), spreadsheet_id),
+            )
+
+    def touch_sheet(self, spreadsheet_id):
+        """Registra uma sondagem sem mudança de versão."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sheets SET synced_at=? WHERE spreadsheet_id=?", (time.time(), spreadsheet_id))
+
+    def load_sheet(self, spreadsheet_id):
+        """(título, [(aba, linhas)]) na ordem original das abas."""
+        with self._lock:
+            row = self._conn.execute("SELECT title FROM sheets WHERE spreadsheet_id=?", (spreadsheet_id,)).fetchone()
+            worksheets = self._conn.execute(
+                "SELECT title, rows FROM worksheets WHERE spreadsheet_id=? ORDER BY position", (spreadsheet_id,)
+            ).fetchall()
+        return (row[0] if row else None), [(title, json.loads(rows)) for title, rows in worksheets]
+
+    # --- caixa de saída ---
+    def enqueue(self, spreadsheet_id, worksheet, op, payload):
+        """Guarda uma gravação para o worker; devolve o id da operação."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (spreadsheet_id, worksheet, op, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (spreadsheet_id, worksheet, op, json.dumps(payload, ensure_ascii=False, default=str), time.time()),
+            )
+            return cursor.lastrowid
+
+    def pending(self, spreadsheet_id=None, due_only=False):
+        """Operações pendentes em ordem de chegada."""
+        query = "SELECT id, spreadsheet_id, worksheet, op, payload, attempts FROM outbox WHERE status='pending'"
+        params = []
+        if spreadsheet_id is not None:
+            query += " AND spreadsheet_id=?"
+            params.append(spreadsheet_id)
+        if due_only:
+            query += " AND next_attempt<=?"
+            params.append(time.time())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [
+            {"id": r[0], "spreadsheet_id": r[1], "worksheet": r[2], "op": r[3],
+             "payload": json.loads(r[4]), "attempts": r[5]}
+            for r in rows
+        ]
+
+    def mark_done(self, ids):
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE outbox SET status='done', last_error=NULL WHERE id=?", [(i,) for i in ids])
+
+    def mark_retry(self, ids, error, max_attempts=MAX_ATTEMPTS):
+        """Conta uma tentativa; com espera crescente, até virar 'failed'."""
+        now = time.time()
+        with self._lock, self._conn:
+            for op_id in ids:
+                attempts = self._conn.execute("SELECT attempts FROM outbox WHERE id=?", (op_id,)).fetchone()[0] + 1
+                status = "failed" if attempts >= max_attempts else "pending"
+                self._conn.execute(
+                    "UPDATE outbox SET attempts=?, next_attempt=?, status=?, last_error=? WHERE id=?",
+                    (attempts, now + min(300, 2 ** attempts), status, str(error)[:500], op_id),
+                )
+
+    def outbox_counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class RateLimiter:
+    """Balde de fichas: no máximo `per_minute` pedidos por minuto, com rajada."""
+
+    def __init__(self, per_minute=RATE_PER_MINUTE, clock=time.monotonic, sleep=time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 6.0)   # Rajada de até 10 s de cota
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self.waited = 0.0
+
+    def acquire(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self.tokens < 1:
+            wait = (1 - self.tokens) / self.rate
+            self.waited += wait
+            self._sleep(wait)
+            self.tokens = 1
+            self._last = self._clock()
+        self.tokens -= 1
+
+
+def mirror_value(value):
+    """Número quando o texto formatado volta igual (ex.: "12"); senão o texto."""
+    if not isinstance(value, str) or not value.strip():
+        return value
+    number = numericise(value)
+    if number is not value and formatted_value(number) == value:
+        return number
+    return value
+
+
+# --- LADO DO WORKER ---
+class SyncWorker:
+    """Esvazia a caixa de saída e mantém o espelho em dia, sob o limite de cota."""
+
+    def __init__(self, client, store, limiter=None, refresh_seconds=REFRESH_SECONDS):
+        self.client = client
+        self.store = store
+        self.limiter = limiter or RateLimiter()
+        self.refresh_seconds = refresh_seconds
+        self.stats = {"requests": 0, "writes": 0, "write_errors": 0, "downloads": 0, "probes": 0}
+        self._handles = {}
+        self._probed_at = {}
+
+    def _call(self, fn, *args, **kwargs):
+        self.limiter.acquire()
+        self.stats["requests"] += 1
+        return fn(*args, **kwargs)
+
+    def _spreadsheet(self, spreadsheet_id):
+        if spreadsheet_id not in self._handles:
+            self._handles[spreadsheet_id] = self._call(self.client.open_by_key, spreadsheet_id)
+        return self._handles[spreadsheet_id]
+
+    # --- gravações ---
+    def drain(self):
+        """Envia as gravações pendentes; devolve as planilhas alteradas."""
+        groups = OrderedDict()
+        for op in self.store.pending(due_only=True):
+            groups.setdefault((op["spreadsheet_id"], op["worksheet"]), []).append(op)
+
+        changed = set()
+        blocked = set()
+        for (spreadsheet_id, title), ops in groups.items():
+            if spreadsheet_id in blocked:
+                continue
+            done = self._push(spreadsheet_id, title, ops)
+            if done:
+                changed.add(spreadsheet_id)
+            if done < len(ops):
+                blocked.add(spreadsheet_id)   # Mantém a ordem: o resto espera a próxima volta
+        return changed
+
+    def _push(self, spreadsheet_id, title, ops):
+        """Grava as operações de uma aba em ordem; devolve quantas foram enviadas."""
+        i = 0
+        try:
+            spreadsheet = self._spreadsheet(spreadsheet_id)
+            worksheet = None
+            while i < len(ops):
+                op = ops[i]
+                if op["op"] == "add_worksheet":
+                    try:
+                        worksheet = self._call(spreadsheet.worksheet, title)
+                    except Exception:
+                        worksheet = self._call(spreadsheet.add_worksheet, title=title, **op["payload"])
+                    self.store.mark_done([op["id"]])
+                    i += 1
+                    continue
+                if worksheet is None:
+                    worksheet = self._call(spreadsheet.worksheet, title)
+
+                run = [op]
+                if op["op"] == "update_cell":
+                    while i + len(run) < len(ops) and ops[i + len(run)]["op"] == "update_cell":
+                        run.append(ops[i + len(run)])
+                    self._write_cells(worksheet, [o["payload"] for o in run])
+                elif op["op"] == "update":
+                    self._call(worksheet.update, values=op["payload"]["values"], range_name=op["payload"]["range"])
+                elif op["op"] == "batch_update":
+                    options = {}
+                    if op["payload"].get("value_input_option"):
+                        options["value_input_option"] = op["payload"]["value_input_option"]
+                    self._call(worksheet.batch_update, op["payload"]["data"], **options)
+                elif op["op"] == "append_row":
+                    self._call(worksheet.append_row, op["payload"]["values"])
+                else:
+                    raise ValueError(f"Operação desconhecida: {op['op']}")
+                self.store.mark_done([o["id"] for o in run])
+                self.stats["writes"] += len(run)
+                i += len(run)
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            self._handles.pop(spreadsheet_id, None)
+            self.store.mark_retry([o["id"] for o in ops[i:]], e)
+        return i
+
+    def _write_cells(self, worksheet, cells):
+        """Várias update_cell seguidas num único batch_update."""
+        from gspread.utils import rowcol_to_a1
+        data = [{"range": rowcol_to_a1(c["row"], c["col"]), "values": [[c["value"]]]} for c in cells]
+        self._call(worksheet.batch_update, data, value_input_option="USER_ENTERED")
+
+    # --- leituras ---
+    def probe(self, spreadsheet_id):
+        """Versão da planilha no Drive (um GET leve de metadados)."""
+        self.stats["probes"] += 1
+        response = self._call(
+            self.client.http_client.request, "get",
+            f"{DRIVE_FILES_URL}{spreadsheet_id}", params={"fields": "version", "supportsAllDrives": True},
+        )
+        return str(response.json().get("version"))
+
+    def download(self, spreadsheet_id, version):
+        """Baixa todas as abas num só pedido e grava no espelho."""
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        titles = [ws.title for ws in self._call(spreadsheet.worksheets)]
+        quoted = ["'" + t.replace("'", "''") + "'" for t in titles]
+        response = self._call(spreadsheet.values_batch_get, quoted, params={"valueRenderOption": "FORMATTED_VALUE"})
+        grids = [(title, vr.get("values", [])) for title, vr in zip(titles, response.get("valueRanges", []))]
+        self.store.save_sheet(spreadsheet_id, spreadsheet.title, version, grids)
+        self.stats["downloads"] += 1
+
+    def refresh(self, force=(), now=None):
+        """Sonda as planilhas vencidas (ou forçadas) e baixa as que mudaram."""
+        now = time.monotonic() if now is None else now
+        for sheet in self.store.sheets():
+            sid = sheet["spreadsheet_id"]
+            due = now - self._probed_at.get(sid, float("-inf")) >= self.refresh_seconds
+            if not (due or sid in force) or self.store.pending(sid):
+                continue
+            self._probed_at[sid] = now
+            try:
+                version = self.probe(sid)
+                if sheet["revision"] and version == sheet["drive_version"]:
+                    self.store.touch_sheet(sid)
+                    continue
+                self.download(sid, version)
+            except Exception as e:
+                self._handles.pop(sid, None)
+                print(f"[sync] falha ao atualizar {sid}: {e}", flush=True)
+
+    def run_once(self):
+        changed = self.drain()
+        self.refresh(force=changed)
+        return changed
+
+    def run_forever(self, stop=None, loop_seconds=LOOP_SECONDS):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.run_once()
+            stop.wait(loop_seconds)
+
+
+def build_client(store):
+    """Cliente do Sheets do worker: backend falso (STUDY_BACKEND=fake) ou conta de serviço."""
+    if os.environ.get("STUDY_BACKEND") == "fake":
+        import fake_backend
+        sheets = store.sheets()
+        content = [s["url"] for s in sheets if s["role"] == "content"]
+        trilha = next((s["url"] for s in sheets if s["role"] == "trilha"), None)
+        return fake_backend.backend_from_env(content, trilha).client()
+
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    raw = os.environ.get("gcp_service_account")
+    if not raw:
+        raise RuntimeError("Defina gcp_service_account com a conta de serviço do Google.")
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(raw), SCOPE)
+    return gspread.authorize(creds)
+
+
+# --- LADO DO APP ---
+class MirrorBackend(SheetBackend):
+    """Planilhas lidas do espelho local; gravações vão para a caixa de saída.
+
+    As leituras não tocam a rede. A cada chamada (no máximo uma vez por
+    POLL_SECONDS) as planilhas cuja revisão mudou são recarregadas no lugar,
+    com as gravações ainda pendentes reaplicadas por cima.
+    """
+
+    def __init__(self, store, poll_seconds=POLL_SECONDS):
+        super().__init__()
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self._loaded = {}   # planilha -> revisão carregada
+        self._local = {}    # planilha -> última gravação local (id na caixa de saída)
+        self._last_poll = float("-inf")
+        self.poll()
+
+    def api_call(self, method):
+        super().api_call(method)
+        self.poll()
+
+    def poll(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_poll < self.poll_seconds:
+                return
+            self._last_poll = now
+            for sid, revision in self.store.revisions().items():
+                if revision and revision != self._loaded.get(sid):
+                    self._load(sid, revision)
+
+    def _load(self, spreadsheet_id, revision):
+        title, worksheets = self.store.load_sheet(spreadsheet_id)
+        sheet = self.spreadsheets.get(spreadsheet_id)
+        if sheet is None:
+            sheet = self.create_spreadsheet(spreadsheet_id, title)
+        sheet.title = title or sheet.title
+
+        # Atualiza no lugar: abas já entregues ao app continuam válidas
+        fresh = {}
+        for ws_title, rows in worksheets:
+            grid = [[mirror_value(v) for v in row] for row in rows]
+            ws = sheet.worksheets.get(ws_title)
+            if ws is None:
+                ws = sheet.add(ws_title, grid)
+            else:
+                ws.rows = grid
+            fresh[ws_title] = ws
+        sheet.worksheets = fresh
+
+        last = 0
+        for op in self.store.pending(spreadsheet_id):
+            if op["op"] == "add_worksheet":
+                if op["worksheet"] not in sheet.worksheets:
+                    sheet.add(op["worksheet"])
+            elif op["worksheet"] in sheet.worksheets:
+                apply_write(sheet.worksheets[op["worksheet"]], op["op"], op["payload"])
+            last = op["id"]
+        sheet.touch()
+        self._loaded[spreadsheet_id] = revision
+        self._local[spreadsheet_id] = last
+
+    def on_write(self, spreadsheet_id, worksheet_title, op, payload):
+        op_id = self.store.enqueue(spreadsheet_id, worksheet_title, op, payload)
+        with self._lock:
+            self._local[spreadsheet_id] = op_id
+
+    def version_of(self, sheet):
+        # Revisão do espelho + última gravação local: estável entre processos,
+        # então serve de chave para os snapshots em disco
+        return f"{self._loaded.get(sheet.id, 0)}.{self._local.get(sheet.id, 0)}"
+
+
+def acquire_worker_lock(db_path=DEFAULT_PATH):
+    """Trava exclusiva do espelho: um só worker grava e sincroniza cada um.
+
+    Devolve o arquivo da trava (vale enquanto ele estiver aberto) ou None se
+    outro processo já a tem.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return True  # Sem flock (Windows): vale a disciplina de quem inicia
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    handle = open(db_path + ".lock", "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def start_worker_process(db_path=DEFAULT_PATH):
+    """Sobe `python sync_worker.py` ao lado do app e o encerra junto com ele.
+
+    Se outro worker já cuida do espelho, o novo processo sai logo após
+    tentar a trava.
+    """
+    import atexit
+
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--db", db_path])
+    atexit.register(process.terminate)
+    return process
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza as planilhas com o espelho local do app.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="caminho do espelho SQLite")
+    parser.add_argument("--rate", type=int, default=RATE_PER_MINUTE, help="pedidos ao Google por minuto")
+    parser.add_argument("--refresh", type=float, default=REFRESH_SECONDS, help="segundos entre sondagens")
+    parser.add_argument("--once", action="store_true", help="uma única passada e sai")
+    args = parser.parse_args(argv)
+
+    lock = acquire_worker_lock(args.db)
+    if lock is None:
+        print("[sync] outro worker já sincroniza este espelho; saindo", flush=True)
+        return
+    store = SyncStore(args.db)
+    while not store.sheets():
+        print("[sync] aguardando o app registrar as planilhas...", flush=True)
+        time.sleep(2)
+    worker = SyncWorker(build_client(store), store, RateLimiter(args.rate), args.refresh)
+    print(f"[sync] {len(store.sheets())} planilhas, até {args.rate} pedidos/min", flush=True)
+    if args.once:
+        worker.run_once()
+    else:
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            pass
+    print(f"[sync] {worker.stats} caixa de saída: {store.outbox_counts()}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Ambiente dos testes: backends falsos e dados locais descartáveis.
+
+As variáveis são definidas antes de qualquer import do app, que lê o
+backend e os diretórios na importação.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="estudo-tests-")
+os.environ.update({
+    "STUDY_BACKEND": "fake",
+    "STUDY_AI_BACKEND": "fake",
+    "STUDY_FAKE_LATENCY_MS": "0",
+    "STUDY_FAKE_AI_LATENCY_MS": "0",
+    "STUDY_FAKE_AI_ITEM_MS": "0",
+    "STUDY_SNAPSHOTS": "0",
+    "STUDY_SNAPSHOT_DIR": os.path.join(_workdir, "snapshots"),
+    "STUDY_ANALYTICS_DB": os.path.join(_workdir, "analytics.sqlite3"),
+})
+for name in ("STUDY_FAKE_QUOTA", "STUDY_SHEETS", "app_password"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """app.py importado em modo bare (roda o script uma vez, sem servidor)."""
+    import streamlit.logger
+    from streamlit import config
+
+    config.set_option("logger.level", "error")
+    streamlit.logger.set_log_level("error")
+    import app as app_module
+    return app_module
@@ -0,0 +1,38 @@
+"""AnalyticsStore.rebuild: mesma contagem do sync incremental, numa transação só."""
+import pandas as pd
+import pytest
+
+from analytics import AnalyticsStore
+
+TAB = pd.DataFrame({
+    "Assunto": ["a", "b", "a"],
+    "Resultado": ["Acertei", "Errei", ""],
+    "Data": ["2026-10-18 10:00:00", "2026-10-19 09:00:00", ""],
+})
+
+
+def rollup(store):
+    return store._conn.execute("SELECT * FROM rollup ORDER BY 1, 2, 3, 4").fetchall()
+
+
+def test_rebuild_matches_incremental_sync():
+    store = AnalyticsStore(":memory:")
+    store.sync_tab("Direito", "Tema 1", TAB, "v1")
+    expected = rollup(store)
+
+    assert store.rebuild([("Direito", "Tema 1", TAB, "v1")]) == 3
+    assert rollup(store) == expected
+
+
+def test_failed_rebuild_keeps_the_previous_rollups():
+    store = AnalyticsStore(":memory:")
+    store.sync_tab("Direito", "Tema 1", TAB, "v1")
+    expected = rollup(store)
+
+    def tabs():
+        yield "Direito", "Tema 1", TAB.assign(Resultado="Errei"), "v2"
+        yield "Direito", "Tema 2", None, "v2"  # Aba inválida no meio da reconstrução
+
+    with pytest.raises(Exception):
+        store.rebuild(tabs())
+    assert rollup(store) == expected
@@ -0,0 +1,119 @@
+"""Correção em lote: prompt, leitura da resposta e fallback por item no FakeModelServer."""
+import json
+
+import pytest
+
+from batch_grading import build_batch_prompt, extract_batch_items, parse_batch_response
+
+ITEMS = [
+    {"id": str(i), "question": f"Pergunta {i}?", "reference": f"gabarito número {i} sobre o tema",
+     "answer": f"resposta parcial {i}"}
+    for i in range(1, 6)
+]
+
+
+def reply(*entries):
+    return json.dumps({"resultados": list(entries)})
+
+
+def test_prompt_embeds_every_item_in_order():
+    prompt = build_batch_prompt(ITEMS)
+    embedded = extract_batch_items(prompt)
+
+    assert [item["id"] for item in embedded] == ["1", "2", "3", "4", "5"]
+    assert embedded[0] == {"id": "1", "pergunta": "Pergunta 1?", "gabarito": "gabarito número 1 sobre o tema",
+                           "resposta": "resposta parcial 1"}
+
+
+def test_parse_maps_results_by_id():
+    content = "```json\n" + reply({"id": "2", "nota": 85.6, "feedback": "Bom."}, {"id": 1, "nota": 40}) + "\n```"
+    assert parse_batch_response(content, ["1", "2"]) == {"1": (40, "Sem feedback."), "2": (86, "Bom.")}
+
+
+def test_parse_leaves_out_missing_and_unknown_items():
+    content = reply({"id": "1", "nota": 70, "feedback": "ok"}, {"id": "99", "nota": 10, "feedback": "x"})
+    assert parse_batch_response(content, ["1", "2"]) == {"1": (70, "ok")}
+
+
+def test_parse_keeps_the_first_of_duplicate_ids():
+    content = reply({"id": "1", "nota": 70, "feedback": "primeira"}, {"id": "1", "nota": 10, "feedback": "segunda"})
+    assert parse_batch_response(content, ["1"]) == {"1": (70, "primeira")}
+
+
+@pytest.mark.parametrize("entry", [
+    {"id": "1"},
+    {"id": "1", "nota": "alta"},
+    {"id": "1", "nota": None},
+    {"id": "1", "nota": float("inf")},
+    "1: 80",
+])
+def test_parse_skips_malformed_items(entry):
+    content = json.dumps({"resultados": [entry, {"id": "2", "nota": 150}]})
+    assert parse_batch_response(content, ["1", "2"]) == {"2": (100, "Sem feedback.")}
+
+
+@pytest.mark.parametrize("content", [
+    "", None, "NOTA: 80", "{not json}", '{"resultados": null}', '{"resultados": {"id": "1"}}', "[]",
+])
+def test_parse_malformed_response_returns_nothing(content):
+    assert parse_batch_response(content, ["1"]) == {}
+
+
+@pytest.fixture
+def model(app):
+    """Servidor falso do app, com contadores zerados e o disjuntor fechado."""
+    server = app.get_fake_model_server()
+    server.stats.update({"requests": 0, "items": 0, "errors": 0, "by_path": {}})
+    yield server
+    app.ai_breaker("correção").record_success()
+
+
+def queued():
+    return [dict(item, score=None, feedback="", tier=None) for item in ITEMS]
+
+
+def test_batches_are_graded_in_one_request_each(app, model):
+    items = queued()
+    progress = []
+    app.grade_in_batches(items, 2, on_batch=lambda done, total: progress.append((done, total)))
+
+    assert model.stats["requests"] == 3
+    assert model.stats["items"] == 5
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert {item["tier"] for item in items} == {"lote"}
+    assert all(0 <= item["score"] <= 100 for item in items)
+
+
+def test_items_left_out_of_the_batch_are_graded_one_by_one(app, model, monkeypatch):
+    original = model.chat_completion
+
+    def flaky(prompt):
+        content = original(prompt)
+        if extract_batch_items(prompt) is None:
+            return content  # Correção individual: resposta normal
+        results = json.loads(content)["resultados"]
+        results = [r for r in results if r["id"] != "2"]      # Ausente
+        results[1]["nota"] = "muito boa"                       # Malformado (id 3)
+        results[0]["nota"] = 77
+        results.append(dict(results[0], nota=5))               # Repetido (id 1)
+        return reply(*results)
+
+    monkeypatch.setattr(model, "chat_completion", flaky)
+    items = queued()
+    app.grade_in_batches(items, 10)
+
+    tiers = {item["id"]: item["tier"] for item in items}
+    assert tiers == {"1": "lote", "2": "ia", "3": "ia", "4": "lote", "5": "lote"}
+    assert items[0]["score"] == 77
+    assert model.stats["requests"] == 3  # Um lote + dois pedidos individuais
+    assert all(item["score"] is not None for item in items)
+
+
+def test_failed_batch_falls_back_to_provisional_scores(app, model, monkeypatch):
+    monkeypatch.setattr(model, "fail_rate", 1.0)
+    items = queued()
+    app.grade_in_batches(items, 10)
+
+    assert {item["tier"] for item in items} == {"reserva"}
+    assert all(item["feedback"].startswith("Nota provisória") for item in items)
+    assert model.stats["errors"] == 1
@@ -0,0 +1,63 @@
+from circuit_breaker import ABERTO, FECHADO, MEIO_ABERTO, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(threshold=3, cooldown=60.0):
+    clock = Clock()
+    return CircuitBreaker("ia", failure_threshold=threshold, cooldown_seconds=cooldown, clock=clock), clock
+
+
+def test_opens_after_consecutive_failures():
+    breaker, _ = make()
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == FECHADO
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == ABERTO
+    assert not breaker.allow()
+    assert breaker.stats["rejected"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker, _ = make()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == FECHADO
+
+
+def test_single_trial_after_cooldown():
+    breaker, clock = make(threshold=1, cooldown=30.0)
+    breaker.record_failure()
+    assert breaker.retry_in() == 30.0
+
+    clock.now = 30.0
+    assert breaker.state == MEIO_ABERTO
+    assert breaker.allow()
+    assert not breaker.allow()  # Só uma chamada de teste por vez
+
+    breaker.record_success()
+    assert breaker.state == FECHADO
+    assert breaker.allow()
+
+
+def test_failed_trial_opens_again():
+    breaker, clock = make(threshold=3, cooldown=30.0)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 31.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == ABERTO
+    assert breaker.retry_in() == 30.0
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import google_sheets_auth
+from google_sheets_auth import TokenCache
+
+
+class Connector:
+    """Devolve tokens numerados com a validade pedida, contando as chamadas."""
+
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            return f"tok{self.calls}", time.time() + self.lifetime
+
+
+def test_token_is_reused_until_the_margin():
+    connector = Connector(lifetime=3600)
+    cache = TokenCache(fetch=connector, margin=300)
+
+    assert [cache.get() for _ in range(5)] == ["tok1"] * 5
+    assert connector.calls == 1
+    assert cache.stats["fetches"] == 1
+
+
+def test_concurrent_callers_share_one_fetch():
+    connector = Connector(lifetime=3600)
+    cache = TokenCache(fetch=connector, margin=300)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ["tok1"] * 8
+    assert connector.calls == 1
+
+
+def test_token_inside_margin_is_served_while_refreshing():
+    connector = Connector(lifetime=3600)
+    cache = TokenCache(fetch=connector, margin=300)
+    cache.get()
+    with cache._lock:
+        cache._expires_at = time.time() + 100  # Dentro da margem, ainda válido
+
+    assert cache.get() == "tok1"
+    deadline = time.time() + 2
+    while connector.calls < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert connector.calls == 2
+    assert cache.get() == "tok2"
+
+
+def test_refresher_backs_off_on_tokens_near_expiry(monkeypatch):
+    monkeypatch.setattr(google_sheets_auth, "RETRY_DELAY", 0.1)
+    monkeypatch.setattr(google_sheets_auth, "MAX_RETRY_DELAY", 0.4)
+    connector = Connector(lifetime=120)  # Sempre dentro da margem de 300 s
+    cache = TokenCache(fetch=connector, margin=300)
+    cache.get()
+
+    time.sleep(1.0)
+    # Esperas de 0.1, 0.2, 0.4, 0.4...: poucas chamadas, não milhares
+    assert 3 <= connector.calls <= 6
+    assert cache.stats["short_lived"] >= 2
+
+
+def test_credentials_fetch_the_token_on_first_use():
+    connector = Connector(lifetime=3600)
+    cache = TokenCache(fetch=connector, margin=300)
+    credentials = google_sheets_auth.ConnectorCredentials(cache)
+
+    assert connector.calls == 0  # Montar o cliente não chama o conector
+    assert not credentials.valid
+    credentials.refresh(request=None)  # O que o google-auth faz antes do primeiro pedido
+    assert credentials.token == "tok1" and credentials.valid
+    assert google_sheets_auth.ConnectorCredentials(cache).token == "tok1"
+    assert connector.calls == 1
@@ -0,0 +1,52 @@
+from memory_budget import LRUBudget
+
+
+def test_evicts_least_recently_used_over_budget():
+    evicted = []
+    budget = LRUBudget(100, on_evict=lambda key, value: evicted.append(key))
+    budget.touch("a", "A", 40)
+    budget.touch("b", "B", 40)
+    budget.get("a")  # "a" passa a ser o mais recente
+
+    assert budget.touch("c", "C", 40) == ["b"]
+    assert evicted == ["b"]
+    assert budget.keys() == ["a", "c"]
+    assert budget.total_bytes == 80
+    assert budget.stats == {"evictions": 1, "evicted_bytes": 40}
+
+
+def test_newest_item_is_kept_even_above_budget():
+    budget = LRUBudget(10)
+    budget.touch("a", "A", 5)
+    assert budget.touch("big", "B", 50) == ["a"]
+    assert "big" in budget
+    assert len(budget) == 1
+
+
+def test_size_is_measured_only_for_new_values():
+    budget = LRUBudget(100)
+    sizes = []
+    budget.touch("a", "A", lambda: sizes.append(1) or 30)
+    budget.touch("a", size=lambda: sizes.append(1) or 99)
+
+    assert sizes == [1]
+    assert budget.get("a") == "A"
+    assert budget.total_bytes == 30
+
+    budget.touch("a", "A2", lambda: sizes.append(1) or 50)
+    assert sizes == [1, 1]
+    assert budget.get("a") == "A2"
+    assert budget.total_bytes == 50
+
+
+def test_pop_skips_on_evict_and_discard_calls_it():
+    evicted = []
+    budget = LRUBudget(100, on_evict=lambda key, value: evicted.append(key))
+    budget.touch("a", "A", 10)
+    budget.touch("b", "B", 10)
+
+    assert budget.pop("a") == "A"
+    assert evicted == []
+    budget.discard(["b", "missing"])
+    assert evicted == ["b"]
+    assert len(budget) == 0
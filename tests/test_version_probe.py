@@ -0,0 +1,135 @@
+"""Caminho da sondagem de versão: quando o app baixa a aba de novo e quando não."""
+import pytest
+
+TAB = "Teste Versão"
+
+
+@pytest.fixture
+def sheet(app):
+    """Planilha de conteúdo com uma aba só dos testes (o aquecedor não a conhece)."""
+    url = app.SHEETS_MAPPING["Direito"]
+    spreadsheet = app.get_gspread_client().open_by_url(url)
+    try:
+        worksheet = spreadsheet.worksheet(TAB)
+    except Exception:
+        worksheet = spreadsheet.add_worksheet(title=TAB, rows=10, cols=6)
+    worksheet.update(
+        values=[["Assunto", "Pergunta", "Resposta", "Resultado", "Data", "Minha_Resposta"],
+                ["A", "P1", "R1", "", "", ""]],
+        range_name="A1:F2",
+    )
+    app.SHEET_REGISTRY.expire(url)
+    return url
+
+
+@pytest.fixture
+def fetches(app, monkeypatch):
+    """Conta as leituras completas da aba dos testes."""
+    calls = []
+    load_columns = app.load_columns
+
+    def counting(spreadsheet, worksheet_title, *args, **kwargs):
+        if worksheet_title == TAB:
+            calls.append(worksheet_title)
+        return load_columns(spreadsheet, worksheet_title, *args, **kwargs)
+
+    monkeypatch.setattr(app, "load_columns", counting)
+    return calls
+
+
+def test_unchanged_version_is_not_refetched(app, sheet, fetches):
+    first = app.load_worksheet_data(sheet, TAB)
+    app.SHEET_REGISTRY.expire(sheet)  # Sonda de novo: o Drive responde a mesma versão
+    second = app.load_worksheet_data(sheet, TAB)
+
+    assert len(fetches) == 1
+    assert second.equals(first)
+    assert app.SHEET_REGISTRY.entry(sheet).stats["probes"] >= 2
+
+
+def test_write_generation_forces_refetch(app, sheet, fetches):
+    app.load_worksheet_data(sheet, TAB)
+    before = app.current_sheet_version(sheet, app.get_sheet_version(sheet))
+
+    app.mark_sheet_written(app.spreadsheet_id_from_url(sheet))
+    after = app.current_sheet_version(sheet, app.get_sheet_version(sheet))
+    app.load_worksheet_data(sheet, TAB)
+
+    assert after != before
+    assert after.rpartition(":")[0] == before.rpartition(":")[0]  # Sem nova sondagem no Drive
+    assert len(fetches) == 2
+
+
+def test_failed_probe_falls_back_to_time_window(app, sheet, fetches, monkeypatch):
+    def unavailable(sheet_url):
+        raise RuntimeError("Drive indisponível")
+
+    monkeypatch.setattr(app, "probe_sheet_version", unavailable)
+    now = 1_000_000.0
+    monkeypatch.setattr(app.time, "time", lambda: now)
+    ttl = app.SHEET_REGISTRY.entry(sheet).policy.ttl
+
+    assert app.get_sheet_version(sheet) is None
+    version = app.current_sheet_version(sheet, None)
+    assert version == f"t{int(now // ttl)}:{app.write_generation(sheet)}"
+
+    app.load_worksheet_data(sheet, TAB)
+    app.load_worksheet_data(sheet, TAB)
+    assert len(fetches) == 1  # Mesma janela: mesmo cache
+
+    now += ttl
+    app.SHEET_REGISTRY.expire(sheet)
+    app.load_worksheet_data(sheet, TAB)
+    assert len(fetches) == 2  # Janela seguinte: baixa de novo
+
+
+@pytest.fixture
+def fail_once(monkeypatch):
+    """Faz um método do sheet_model falhar uma vez e depois voltar ao normal."""
+    import sheet_model
+
+    def install(cls, name):
+        original = getattr(sheet_model, cls).__dict__[name]
+        calls = {"n": 0}
+
+        def flaky(self, *args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise sheet_model.SheetAPIError("Erro 503: backend indisponível")
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(getattr(sheet_model, cls), name, flaky)
+        return calls
+    return install
+
+
+def test_failed_fetch_is_not_cached(app, sheet, fail_once):
+    fail_once("Spreadsheet", "values_batch_get")
+
+    assert app.load_worksheet_data(sheet, TAB) is None
+    app.SHEET_REGISTRY.expire(sheet)  # Mesma versão no Drive: antes a falha ficava no cache
+    df = app.load_worksheet_data(sheet, TAB)
+
+    assert df is not None and df["Pergunta"].tolist() == ["P1"]
+
+
+def test_failed_titles_are_not_cached(app, sheet, fail_once):
+    fail_once("Spreadsheet", "worksheets")
+    app.mark_sheet_written(app.spreadsheet_id_from_url(sheet))  # Versão nova, fora do cache
+
+    assert app.get_worksheet_titles(sheet) == []
+    assert TAB in app.get_worksheet_titles(sheet)
+
+
+def test_failed_trilha_and_log_are_not_cached(app, fail_once):
+    app.mark_sheet_written(app.spreadsheet_id_from_url(app.TRILHA_SHEET_URL))
+    fail_once("Spreadsheet", "values_batch_get")
+    log_reads = fail_once("Worksheet", "get_all_records")
+
+    assert app.get_trilha_data() == (None, None)
+    app.get_study_logs()
+    df, _ = app.get_trilha_data()
+    app.get_study_logs()
+
+    assert df is not None and not df.empty
+    assert log_reads["n"] == 2  # A segunda leitura do log foi à planilha